@@ -1,7 +1,13 @@
-import cx_Oracle
+import argparse
 import json
 import re
 import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -14,22 +20,17 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_SERVICE_NAME = os.getenv("DB_SERVICE_NAME")
 
-# Ensure environment variables are set
-if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_SERVICE_NAME]):
-    raise ValueError("Missing one or more required environment variables for DB connection.")
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+TIMESTAMP_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})?$")
 
-# Database connection details
-dsn_tns = cx_Oracle.makedsn(DB_HOST, DB_PORT, service_name=DB_SERVICE_NAME)
-connection = cx_Oracle.connect(user=DB_USER, password=DB_PASSWORD, dsn=dsn_tns)
-cursor = connection.cursor()
+# Batches buffered per table between the JSON reader and its loader thread
+QUEUE_BATCHES = 4
+# Batch errors printed per table; the rest are only counted
+MAX_REPORTED_ERRORS = 10
 
-# Load data from JSON file
-with open("new_data.json", "r") as file:
-    data = json.load(file)
-
-import re
 
 def format_value(value):
+    """Render a value as an Oracle SQL literal (for ad-hoc scripts; the loader binds values instead)."""
     if value is None:
         return "NULL"
     elif isinstance(value, str):
@@ -48,25 +49,334 @@ def format_value(value):
         raise ValueError(f"Unsupported data type: {type(value)}")
 
 
-# Iterate through tables and insert data
-for table_name, rows in data.items():
-    print(f"Inserting data into table: {table_name}")
-    for row in rows:
-        columns = ", ".join(row.keys())
-        values = ", ".join(format_value(value) for value in row.values())
-        insert_query = f"INSERT INTO {table_name} ({columns}) VALUES ({values})"
+def convert_value(value):
+    """Convert a JSON value to the Python type bound for Oracle (ISO dates/timestamps become datetimes)."""
+    if isinstance(value, str):
         try:
-            cursor.execute(insert_query)
-        except cx_Oracle.DatabaseError as e:
-            error, = e.args
-            print(f"Error inserting into table {table_name}: {error.message}")
-            print(f"Query: {insert_query}")
-    
-    print(f"Data inserted successfully for table: {table_name}")
-
-# Commit the transaction
-connection.commit()
-
-# Close the connection
-cursor.close()
-connection.close()
+            if DATE_PATTERN.match(value):
+                return datetime.strptime(value, "%Y-%m-%d")
+            if TIMESTAMP_PATTERN.match(value):
+                # Timezone info is dropped, as the literal loader did
+                return datetime.fromisoformat(value.split("+")[0].split("Z")[0])
+        except ValueError:
+            pass  # Looks like a date but is not one (2024-02-30): bound as the string it is
+    return value
+
+
+class JSONTableStream:
+    """
+    Incremental reader for the {"table": [row, ...], ...} export.
+
+    Rows are decoded one at a time from fixed-size chunks, so memory use does
+    not depend on the size of the file.
+    """
+
+    def __init__(self, file, chunk_size=1 << 20):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of the JSON export")
+        self.pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A bare number that runs into the end of the buffer may be cut off ("1." of "1.5")
+            truncated = end == len(self.buffer) or (
+                isinstance(value, (int, float)) and self.buffer[end] not in ",]} \t\r\n"
+            )
+            if truncated and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        """Yield (table_name, row) in file order."""
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            table_name = self._value()
+            self._expect(":")
+            self._expect("[")
+            if self._peek() == "]":
+                self.pos += 1
+            else:
+                while True:
+                    yield table_name, self._value()
+                    if self._peek() == ",":
+                        self.pos += 1
+                        continue
+                    self._expect("]")
+                    break
+            if self._peek() == ",":
+                self.pos += 1
+                continue
+            self._expect("}")
+            return
+
+
+# Helper: Parent tables of each table, from the foreign keys in schema.json
+def table_dependencies(schema):
+    return {
+        table: {parent for parent in details.get("foreign_keys", {}).values() if parent != table}
+        for table, details in schema.items()
+    }
+
+
+# Helper: Tables grouped into levels; every table only depends on tables in earlier levels
+def dependency_levels(schema):
+    dependencies = table_dependencies(schema)
+    levels = []
+    placed = set()
+    while len(placed) < len(dependencies):
+        level = [
+            table for table, parents in dependencies.items()
+            if table not in placed and parents <= placed | (parents - dependencies.keys())
+        ]
+        if not level:
+            raise ValueError(f"Foreign key cycle between tables: {sorted(set(dependencies) - placed)}")
+        levels.append(sorted(level))
+        placed.update(level)
+    return levels
+
+
+class TableReport:
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.seconds = 0.0
+
+
+def insert_batches(pool, table_name, columns, batches, report):
+    """Insert batches of row tuples with executemany and bind variables, collecting batch errors."""
+    insert_query = (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(f':{i + 1}' for i in range(len(columns)))})"
+    )
+    connection = pool.acquire()
+    cursor = connection.cursor()
+    offset = 0
+    try:
+        for batch in batches:
+            cursor.executemany(insert_query, batch, batcherrors=True)
+            errors = cursor.getbatcherrors()
+            for error in errors:
+                if len(report.errors) < MAX_REPORTED_ERRORS:
+                    report.errors.append(f"row {offset + error.offset}: {error.message}")
+            report.failed += len(errors)
+            report.inserted += len(batch) - len(errors)
+            offset += len(batch)
+            connection.commit()
+    finally:
+        cursor.close()
+        pool.release(connection)
+
+
+class BulkLoader:
+    """
+    Load the JSON export into Oracle with array DML.
+
+    Tables are read in file order. A table starts loading once every parent
+    table it references has finished; tables without pending parents load in
+    parallel. A table whose parent has not appeared in the file yet is spooled
+    to a temporary file and loaded after the parent.
+    """
+
+    def __init__(self, pool, schema, batch_size=1000, workers=4):
+        self.pool = pool
+        self.schema = schema
+        self.batch_size = batch_size
+        self.dependencies = table_dependencies(schema)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.futures = {}
+        self.reports = {}
+        self.spooled = {}
+        self.tables = None
+
+    def _columns(self, table_name, first_row):
+        if table_name in self.schema:
+            return self.schema[table_name]["columns"]
+        return list(first_row.keys())
+
+    def _load_table(self, table_name, columns, batches):
+        parents = [self.futures[parent] for parent in self.dependencies.get(table_name, ()) if parent in self.futures]
+        wait(parents)
+        report = self.reports[table_name]
+        start_time = time.time()
+        insert_batches(self.pool, table_name, columns, batches, report)
+        report.seconds = time.time() - start_time
+        return report
+
+    def _start(self, table_name, columns, batches):
+        self.reports[table_name] = TableReport(table_name)
+        self.futures[table_name] = self.executor.submit(self._load_table, table_name, columns, batches)
+
+    def _to_tuple(self, columns, row):
+        return tuple(convert_value(row.get(column)) for column in columns)
+
+    def load(self, path, tables=None):
+        """Load every table in the export, or only the names in `tables` when given."""
+        self.tables = set(tables) if tables is not None else None
+        with open(path, "r") as file:
+            current = None
+            for table_name, row in JSONTableStream(file):
+                if self.tables is not None and table_name not in self.tables:
+                    continue
+                if current is None or table_name != current[0]:
+                    self._finish_stream_table(current)
+                    current = self._begin_stream_table(table_name, row)
+                self._add_stream_row(current, row)
+            self._finish_stream_table(current)
+
+        # Spooled tables, parents first
+        for level in dependency_levels(self.schema) + [sorted(set(self.spooled) - set(self.schema))]:
+            for table_name in level:
+                if table_name in self.spooled:
+                    columns, spool_path = self.spooled.pop(table_name)
+                    self._start(table_name, columns, self._read_spool(columns, spool_path))
+
+        wait(list(self.futures.values()))
+        self.executor.shutdown()
+        for future in self.futures.values():
+            future.result()  # Re-raise connection-level failures
+        return list(self.reports.values())
+
+    def _begin_stream_table(self, table_name, first_row):
+        print(f"Inserting data into table: {table_name}")
+        columns = self._columns(table_name, first_row)
+        pending = [
+            parent for parent in self.dependencies.get(table_name, ())
+            if parent not in self.futures and (self.tables is None or parent in self.tables)
+        ]
+        if pending:
+            spool = tempfile.NamedTemporaryFile("w", suffix=f".{table_name}.jsonl", delete=False)
+            print(f"Spooling {table_name} until its parent tables are loaded: {', '.join(pending)}")
+            return [table_name, columns, None, spool, []]
+        batch_queue = queue.Queue(maxsize=QUEUE_BATCHES)
+        self._start(table_name, columns, iter(batch_queue.get, None))
+        return [table_name, columns, batch_queue, None, []]
+
+    def _put(self, table_name, batch_queue, item):
+        # Never block forever on a loader thread that has already failed
+        while True:
+            try:
+                batch_queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                future = self.futures[table_name]
+                if future.done():
+                    future.result()
+                    raise RuntimeError(f"Loader for {table_name} stopped before reading all rows")
+
+    def _add_stream_row(self, current, row):
+        table_name, columns, batch_queue, spool, batch = current
+        if spool is not None:
+            spool.write(json.dumps(row) + "\n")
+            return
+        batch.append(self._to_tuple(columns, row))
+        if len(batch) >= self.batch_size:
+            self._put(table_name, batch_queue, batch)
+            current[4] = []
+
+    def _finish_stream_table(self, current):
+        if current is None:
+            return
+        table_name, columns, batch_queue, spool, batch = current
+        if spool is not None:
+            spool.close()
+            self.spooled[table_name] = (columns, spool.name)
+            return
+        if batch:
+            self._put(table_name, batch_queue, batch)
+        self._put(table_name, batch_queue, None)
+
+    def _read_spool(self, columns, spool_path):
+        try:
+            with open(spool_path, "r") as spool:
+                batch = []
+                for line in spool:
+                    batch.append(self._to_tuple(columns, json.loads(line)))
+                    if len(batch) >= self.batch_size:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+        finally:
+            os.remove(spool_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load the JSON export into Oracle.")
+    parser.add_argument("--file", default="new_data.json")
+    parser.add_argument("--schema", default="schema.json")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per executemany call")
+    parser.add_argument("--workers", type=int, default=4, help="Tables loaded in parallel")
+    args = parser.parse_args()
+
+    # Ensure environment variables are set
+    if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_SERVICE_NAME]):
+        raise ValueError("Missing one or more required environment variables for DB connection.")
+
+    with open(args.schema, "r") as f:
+        schema = json.load(f)
+
+    import cx_Oracle  # Only loading needs the driver; format_value and friends are used without it
+
+    # One pooled session per loader thread
+    dsn_tns = cx_Oracle.makedsn(DB_HOST, DB_PORT, service_name=DB_SERVICE_NAME)
+    pool = cx_Oracle.SessionPool(
+        DB_USER, DB_PASSWORD, dsn_tns, min=1, max=args.workers, increment=1, threaded=True
+    )
+    start_time = time.time()
+    try:
+        reports = BulkLoader(pool, schema, batch_size=args.batch_size, workers=args.workers).load(args.file)
+    finally:
+        pool.close()
+
+    for report in reports:
+        print(f"{report.table_name}: {report.inserted} rows inserted, {report.failed} failed "
+              f"in {report.seconds:.1f}s")
+        for error in report.errors:
+            print(f"  {error}")
+        if report.failed > len(report.errors):
+            print(f"  ... and {report.failed - len(report.errors)} more errors")
+    print(f"Load finished in {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,9 @@ import cx_Oracle
 import json
 from flask import Flask, request, jsonify
 from transformers import T5ForConditionalGeneration, AutoTokenizer
-from rapidfuzz import fuzz, process
-import inflect
 import re
 from typing import Dict
+from schema_index import SchemaIndex
 import logging
 from flask_cors import CORS
 from dotenv import load_dotenv
@@ -29,22 +28,13 @@ MODEL_PATH =os.getenv("MODEL_PATH")
 CORS_ORIGIN = os.getenv("CORS_ORIGIN")
 print(f"Model Path: {MODEL_PATH}")
 
-# Load schema from a file
-with open("schema.json", "r") as f:
-    schema = json.load(f)
+# Load schema from a file and build the schema-linking index once at startup
+schema_index = SchemaIndex("schema.json")
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": CORS_ORIGIN}})
 
-# Inflect engine for plural/singular variations
-inflect_engine = inflect.engine()
-
-# Define stop words to exclude
-STOP_WORDS = {
-    "is", "as", "list", "all", "get", "retrieve", "find", "to", "for",
-    "on", "by", "in", "and", "of", "the", "from", "assigned"
-}
 # Helper: Execute SQL query on Oracle DB
 # Create a connection pool during app initialization
 dsn_tns = cx_Oracle.makedsn(DB_HOST, DB_PORT, service_name=DB_SERVICE_NAME)
@@ -55,48 +45,9 @@ model = T5ForConditionalGeneration.from_pretrained(MODEL_PATH)
 tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
 logging.info("Model and tokenizer loaded successfully.")
 
-# Helper: Generate variations for singular/plural forms
-def generate_variations(word):
-    return {word, inflect_engine.singular_noun(word) or word, inflect_engine.plural(word)}
-
-# Helper: Traverse relationships to find related tables
-def traverse_relationships(table, schema, relevant_tables):
-    if table not in schema:
-        return
-    foreign_keys = schema[table].get("foreign_keys", {})
-    for related_table in foreign_keys.values():
-        if related_table not in relevant_tables:
-            relevant_tables.add(related_table)
-            traverse_relationships(related_table, schema, relevant_tables)
-
-# Main logic to find relevant tables
-def find_relevant_tables(prompt, schema):
-    prompt_words = [word for word in re.findall(r'\w+', prompt.lower()) if word not in STOP_WORDS]
-
-    table_map = {}
-    column_map = {}
-    for table, details in schema.items():
-        for variation in generate_variations(table.lower()):
-            table_map[variation] = table
-        for column in details.get("columns", []):
-            for variation in generate_variations(column.lower()):
-                column_map[variation] = table
-
-    matched_tables = set()
-    for word in prompt_words:
-        table_match = process.extractOne(word, table_map.keys(), scorer=fuzz.token_set_ratio)
-        if table_match and table_match[1] > 60:
-            matched_tables.add(table_map[table_match[0]])
-
-        column_match = process.extractOne(word, column_map.keys(), scorer=fuzz.token_set_ratio)
-        if column_match and column_match[1] > 60:
-            matched_tables.add(column_map[column_match[0]])
-
-    relevant_tables = set(matched_tables)
-    for table in matched_tables:
-        traverse_relationships(table, schema, relevant_tables)
-
-    return relevant_tables
+# Main logic to find relevant tables; the index rebuilds itself if schema.json changes
+def find_relevant_tables(prompt):
+    return schema_index.find_relevant_tables(prompt)
 
 # Helper: Generate SQL query using T5 model
 def generate_sql_query(prompt: str, context: Dict) -> str:
@@ -157,7 +108,8 @@ def generate_and_execute():
             return jsonify({"error": "Prompt cannot be empty."}), 400
 
         # Step 1: Find relevant tables
-        relevant_tables = find_relevant_tables(prompt, schema)
+        relevant_tables = find_relevant_tables(prompt)
+        schema = schema_index.schema
         context = {table: schema[table] for table in relevant_tables}
 
         # Step 2: Generate SQL query using the T5 model
@@ -0,0 +1,307 @@
+"""
+ASGI entry point for the /generate-and-execute pipeline.
+
+Run with:  uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Schema linking, T5 inference and Oracle execution each run on their own
+thread pool, sized independently, so a slow Oracle query never holds a thread
+that could be serving model results. The event loop only parses requests,
+enforces the request deadline and watches for clients that disconnect, in
+which case the remaining stages of their pipeline are cancelled, along with
+any Oracle call still running for them.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import server
+from db_pool import CallGroup, current_calls
+from metrics import CONTENT_TYPE, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, STAGE_SECONDS, render_metrics
+from response_formats import ARROW_STREAM, negotiate_format, render
+
+SCHEMA_WORKERS = int(os.getenv("ASGI_SCHEMA_WORKERS", "2"))
+INFERENCE_WORKERS = int(os.getenv("ASGI_INFERENCE_WORKERS", "8"))
+DB_WORKERS = int(os.getenv("ASGI_DB_WORKERS", "10"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("ASGI_REQUEST_TIMEOUT_SECONDS", "120"))
+MAX_BODY_BYTES = int(os.getenv("ASGI_MAX_BODY_BYTES", str(1024 * 1024)))
+
+schema_executor = ThreadPoolExecutor(max_workers=SCHEMA_WORKERS, thread_name_prefix="schema")
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="oracle")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# Helper: Run a blocking call on a pool thread, in the request's context so its sessions join its CallGroup
+async def run_in(executor, func, *args):
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(context.run, func, *args))
+
+
+async def generate_and_execute(data):
+    if not isinstance(data, dict) or "prompt" not in data:
+        raise HTTPError(400, "Missing 'prompt' in the request body.")
+    prompt = data["prompt"].strip()
+    if not prompt:
+        raise HTTPError(400, "Prompt cannot be empty.")
+
+    # Step 1: Find relevant tables
+    relevant_tables = await run_in(schema_executor, server.find_relevant_tables, prompt)
+    schema = server.schema_index.schema
+    context = {table: schema[table] for table in relevant_tables}
+
+    # Step 2: Generate SQL query using the T5 model
+    start_time = time.time()
+    generated_query = await run_in(inference_executor, server.generate_sql_query, prompt, context)
+    logging.info(f"Generation took {time.time() - start_time:.3f} seconds")
+
+    # Validate the SQL locally so malformed output never takes a session from the pool,
+    # then let the governor check its plan and cap its rows
+    endpoint = "page" if data.get("page_size") else "json"
+    try:
+        generated_query = server.validate_generated_query(generated_query)
+        routed_query, rollup = server.route_to_rollup(prompt, generated_query)
+        plan = await run_in(db_executor, server.govern_query, prompt, routed_query, endpoint)
+    except server.SQLValidationError as e:
+        server.forget_generated_query(prompt, context, generated_query)
+        raise HTTPError(422, str(e))
+    except server.PoolTimeout as e:
+        raise HTTPError(503, str(e))
+
+    # Step 3: Execute the SQL query; a query that fails is not kept in the prompt cache
+    next_cursor = None
+    try:
+        if data.get("page_size"):
+            page_size = max(1, min(int(data["page_size"]), server.PAGE_SIZE_MAX))
+            execution_result, next_cursor = await run_in(
+                db_executor, server.execute_sql_page, plan["source_sql"], page_size, None, plan["row_limit"]
+            )
+        else:
+            execution_result = await run_in(db_executor, server.execute_sql_query, plan["sql"])
+    except server.PoolTimeout as e:
+        raise HTTPError(503, str(e))  # The pool was busy; the query itself may be fine
+    except server.QueryTimeout as e:
+        server.forget_generated_query(prompt, context, generated_query)
+        raise HTTPError(504, str(e))
+    except Exception:
+        server.forget_generated_query(prompt, context, generated_query)
+        raise
+    server.record_successful_query(prompt, context, generated_query, plan)
+
+    response = {
+        "prompt": prompt,
+        "generated_query": generated_query,
+        "execution_result": execution_result,
+    }
+    if plan["row_limit"] is not None:
+        response["row_limit"] = plan["row_limit"]
+    if rollup is not None:
+        response["rollup"] = rollup
+    if data.get("page_size"):
+        response["next_cursor"] = next_cursor
+    # Result shaping touches every row, so it stays off the event loop too
+    response = await run_in(db_executor, server.determine_rendering_type, response)
+    response["description"] = await run_in(inference_executor, server.create_desc_query_result, prompt, execution_result)
+    return response
+
+
+async def generate_and_execute_batch(data):
+    try:
+        prompts, unique = server.batch_prompts(data)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+
+    # Step 1: Find relevant tables for every prompt
+    schema = server.schema_index.schema
+    contexts = {}
+    for key, prompt in unique.items():
+        relevant_tables = await run_in(schema_executor, server.find_relevant_tables, prompt)
+        contexts[key] = {table: schema[table] for table in relevant_tables}
+
+    # Steps 2 and 3: every prompt is generated at once, so the batcher decodes the cache misses together,
+    # and each query executes as soon as its SQL is ready, BATCH_EXECUTE_CONCURRENCY at a time
+    executing = asyncio.Semaphore(server.BATCH_EXECUTE_CONCURRENCY)
+
+    async def answer(key):
+        prompt, context = unique[key], contexts[key]
+        generated_query = None
+        try:
+            generated_query = await run_in(inference_executor, server.generate_sql_query, prompt, context)
+            async with executing:
+                return await run_in(db_executor, server.execute_batch_item, prompt, context, generated_query)
+        except Exception as e:
+            return server.batch_error(prompt, e, generated_query)
+
+    results = dict(zip(unique, await asyncio.gather(*(answer(key) for key in unique))))
+    for key, result in results.items():
+        if "execution_result" in result:
+            result["description"] = await run_in(
+                inference_executor, server.create_desc_query_result, unique[key], result["execution_result"]
+            )
+    # Step 4: One result per requested prompt, in request order
+    return {"results": [results[server.normalize_prompt(prompt)] for prompt in prompts]}
+
+
+async def ready(data):
+    if server.ready.is_set():
+        return {"status": "ready"}
+    if server.startup_error is not None:
+        raise HTTPError(503, f"Startup failed: {server.startup_error}")
+    raise HTTPError(503, "Server is starting up.")
+
+
+ROUTES = {
+    ("POST", "/generate-and-execute"): generate_and_execute,
+    ("POST", "/generate-and-execute/batch"): generate_and_execute_batch,
+    ("GET", "/ready"): ready,
+}
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large.")
+        if not message.get("more_body"):
+            return body
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+def cors_headers():
+    if not server.CORS_ORIGIN:
+        return []
+    return [
+        (b"access-control-allow-origin", server.CORS_ORIGIN.encode("latin-1")),
+        (b"access-control-allow-headers", b"content-type"),
+        (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+    ]
+
+
+async def send_body(send, status, body, content_type, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ] + list(headers) + cors_headers(),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, payload):
+    with STAGE_SECONDS.time(stage="serialization"):
+        body = server.app.json.dumps(payload).encode("utf-8")
+    await send_body(send, status, body, b"application/json")
+
+
+# Helper: Successful results in the negotiated format and content encoding
+async def send_rendered(send, payload, media_type, accept_encoding):
+    # Encoding and compressing a large result is CPU work, so it runs off the event loop
+    body, headers = await run_in(db_executor, render, payload, media_type, accept_encoding)
+    headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+    content_type = next(value for name, value in headers if name == b"content-type")
+    await send_body(send, 200, body, content_type, [header for header in headers if header[0] != b"content-type"])
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for executor in (schema_executor, inference_executor, db_executor):
+                    executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    request_headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+    if method == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": cors_headers()})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    if (method, path) == ("GET", "/metrics"):
+        await send_body(send, 200, render_metrics().encode("utf-8"), CONTENT_TYPE.encode("latin-1"))
+        return
+
+    handler = ROUTES.get((method, path))
+    if handler is None:
+        await send_json(send, 404, {"error": f"No route for {method} {path}"})
+        return
+    if not server.ready.is_set() and handler is not ready:
+        await send_json(send, 503, {"error": "Server is starting up."})
+        return
+
+    start_time = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    calls = CallGroup()
+    try:
+        try:
+            body = await read_body(receive)
+            if body is None:
+                return  # Client went away before sending the request
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                raise HTTPError(400, "Request body must be valid JSON.")
+            try:
+                requested = data.get("format") if isinstance(data, dict) else None
+                media_type = negotiate_format(request_headers.get("accept"), requested)
+            except ValueError as e:
+                raise HTTPError(406, str(e))
+            if handler is generate_and_execute_batch and media_type == ARROW_STREAM:
+                raise HTTPError(406, "Arrow responses hold a single result; use json or columnar for batches.")
+
+            # The pipeline runs with its own CallGroup, so giving up on it also cancels its Oracle calls
+            context = contextvars.copy_context()
+            context.run(current_calls.set, calls)
+            pipeline = asyncio.get_running_loop().create_task(
+                asyncio.wait_for(handler(data), REQUEST_TIMEOUT_SECONDS), context=context
+            )
+            disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+            done, _ = await asyncio.wait({pipeline, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+            if pipeline not in done:
+                # Abandoned request: stop before any remaining stage is started
+                pipeline.cancel()
+                calls.cancel()
+                logging.info(f"Client disconnected, cancelled {method} {path}")
+                return
+            disconnect.cancel()
+            await send_rendered(send, pipeline.result(), media_type, request_headers.get("accept-encoding"))
+        except HTTPError as e:
+            await send_json(send, e.status, {"error": e.message})
+        except asyncio.TimeoutError:
+            calls.cancel()
+            logging.error(f"Timed out after {REQUEST_TIMEOUT_SECONDS}s in {path}")
+            await send_json(send, 504, {"error": "Request timed out."})
+        except Exception as e:
+            logging.error(f"Error in {path}: {e}")
+            await send_json(send, 500, {"error": str(e)})
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        REQUEST_SECONDS.observe(time.perf_counter() - start_time, endpoint=path)
@@ -0,0 +1,92 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import GENERATED_TOKENS, STAGE_SECONDS
+
+
+class GenerationBatcher:
+    """
+    Dynamic micro-batching scheduler for T5 generation.
+
+    Request threads submit input texts and block on a Future; a single worker
+    thread collects whatever arrives within `max_wait_ms` of the first request
+    (up to `max_batch_size`), runs one padded `model.generate` for the batch and
+    hands each decoded output back to the request that asked for it.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=8, max_wait_ms=10, max_length=512, stopping_criteria=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.stopping_criteria = stopping_criteria
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, float(max_wait_ms)) / 1000.0
+        self.max_length = max_length
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="generation-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, input_text):
+        """Queue one input text and return a Future for its decoded output."""
+        future = Future()
+        self._queue.put((input_text, future))
+        return future
+
+    def generate(self, input_text, timeout=None):
+        """Blocking helper: submit and wait for the decoded output."""
+        return self.submit(input_text).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Requests abandoned by their caller are dropped before we spend a decode on them
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                outputs = self._generate_batch([text for text, _ in batch])
+            except Exception as e:
+                logging.error(f"Batched generation failed for {len(batch)} prompts: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def _generate_batch(self, input_texts):
+        start_time = time.time()
+        with STAGE_SECONDS.time(stage="tokenization"):
+            inputs = self.tokenizer(
+                input_texts,
+                return_tensors="pt",
+                max_length=self.max_length,
+                truncation=True,
+                padding=True,
+            )
+        outputs = self.model.generate(
+            inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            max_length=self.max_length,
+            stopping_criteria=self.stopping_criteria,
+        )
+        # Decoder start and padding are pad tokens, so counting the rest counts generated tokens
+        for count in (outputs != self.tokenizer.pad_token_id).sum(dim=1).tolist():
+            GENERATED_TOKENS.observe(count)
+        decoded = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        logging.info(f"Generated batch of {len(input_texts)} in {time.time() - start_time:.3f} seconds")
+        return decoded
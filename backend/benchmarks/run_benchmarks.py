@@ -0,0 +1,330 @@
+"""
+Offline microbenchmarks for the backend hot paths.
+
+Run from backend/:  python -m benchmarks.run_benchmarks
+
+No Oracle and no real model are needed: results come from an in-memory
+SQLite copy of new_data.json and generation uses a tiny random T5 (see
+standins.py). Every run is appended to a JSONL history file and compared
+with the median of the previous runs, so a regression shows up before a
+deploy rather than after.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.standins import load_sqlite, tiny_t5, wide_result
+
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), "history.jsonl")
+
+# Benchmarks register a setup function that returns (callable, operations per call)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Environment:
+    """Inputs shared by the benchmarks, built lazily so --only skips what it does not need."""
+
+    def __init__(self, args):
+        self.args = args
+        with open(args.schema, "r") as f:
+            self.schema = json.load(f)
+        with open(args.prompts, "r") as f:
+            self.prompts = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        self._database = None
+        self._model = None
+        self._schema_index = None
+
+    @property
+    def database(self):
+        if self._database is None:
+            self._database = load_sqlite(self.schema, self.args.data)
+        return self._database
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = tiny_t5(self.schema, self.prompts)
+        return self._model
+
+    @property
+    def schema_index(self):
+        if self._schema_index is None:
+            from schema_index import SchemaIndex
+
+            self._schema_index = SchemaIndex(self.args.schema)
+        return self._schema_index
+
+    def wide_result(self):
+        return wide_result(self.database, self.args.table, self.args.rows)
+
+    def contexts(self):
+        schema = self.schema_index.schema
+        return [
+            {table: schema[table] for table in self.schema_index.find_relevant_tables(prompt)}
+            for prompt in self.prompts
+        ]
+
+
+@benchmark("schema_linking.find_relevant_tables")
+def bench_find_relevant_tables(env):
+    index = env.schema_index
+    prompts = env.prompts
+
+    def run():
+        for prompt in prompts:
+            index.find_relevant_tables(prompt)
+    return run, len(prompts)
+
+
+@benchmark("result_shaping.determine_rendering_type")
+def bench_determine_rendering_type(env):
+    from result_shaping import determine_rendering_type
+
+    result = env.wide_result()
+
+    def run():
+        # The function replaces columns/rows in place, so each call gets a fresh wrapper
+        determine_rendering_type({"execution_result": {"columns": result["columns"], "rows": result["rows"]}})
+    return run, len(result["rows"])
+
+
+@benchmark("result_shaping.shape_rows")
+def bench_shape_rows(env):
+    from result_shaping import ResultShape, determine_rendering_type
+
+    result = env.wide_result()
+    shape = ResultShape(result["description"])
+    rows = result["rows"]
+
+    def run():
+        # The rowfactory work done during the fetch plus classification; compare with determine_rendering_type
+        determine_rendering_type({"execution_result": shape.result(shape.shape_rows(rows))})
+    return run, len(rows)
+
+
+@benchmark("result_shaping.format_if_date")
+def bench_format_if_date(env):
+    from result_shaping import format_if_date
+
+    rows = env.wide_result()["rows"]
+
+    def run():
+        for row in rows:
+            for value in row:
+                format_if_date(value)
+    return run, sum(len(row) for row in rows)
+
+
+@benchmark("add_data.format_value")
+def bench_format_value(env):
+    from add_data import format_value
+
+    with open(env.args.data, "r") as f:
+        data = json.load(f)
+    values = [value for rows in data.values() for row in rows for value in row.values()]
+
+    def run():
+        for value in values:
+            format_value(value)
+    return run, len(values)
+
+
+@benchmark("prompt_index.lookup")
+def bench_prompt_index_lookup(env):
+    from prompt_index import PromptIndex, T5PromptEncoder
+
+    model, tokenizer = env.model
+    index = PromptIndex(T5PromptEncoder(model, tokenizer, fingerprint="benchmarks"), threshold=1.01)
+    contexts = env.contexts()
+    index.rebuild((prompt, context, "SELECT 1 FROM dual") for prompt, context in zip(env.prompts, contexts))
+    # Embeddings of recent prompts are reused after the warm-up call, so this times the cosine search;
+    # the threshold above 1 makes every lookup scan its whole context without stopping at a match
+    queries = [(f"please {prompt}", context) for prompt, context in zip(env.prompts, contexts)]
+
+    def run():
+        for prompt, context in queries:
+            index.lookup(prompt, context)
+    return run, len(queries)
+
+
+@benchmark("model.tokenize")
+def bench_tokenize(env):
+    from inference import format_sql_prompt
+
+    _, tokenizer = env.model
+    input_texts = [format_sql_prompt(prompt, context) for prompt, context in zip(env.prompts, env.contexts())]
+
+    def run():
+        for input_text in input_texts:
+            tokenizer(input_text, return_tensors="pt", max_length=512, truncation=True)
+    return run, len(input_texts)
+
+
+@benchmark("model.generate_per_token")
+def bench_generate(env):
+    import torch
+    from inference import format_sql_prompt
+
+    model, tokenizer = env.model
+    tokens = env.args.generate_tokens
+    inputs = tokenizer(format_sql_prompt(env.prompts[0], env.contexts()[0]), return_tensors="pt",
+                       max_length=512, truncation=True)
+
+    def run():
+        # min_new_tokens keeps a random model from stopping early, so every call decodes the same length
+        with torch.inference_mode():
+            model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"],
+                           max_new_tokens=tokens, min_new_tokens=tokens)
+    return run, tokens
+
+
+@benchmark("json.serialize_response")
+def bench_serialize(env):
+    from flask import Flask
+
+    from result_shaping import determine_rendering_type
+
+    app = Flask("benchmarks")
+    result = env.wide_result()
+    response = determine_rendering_type({
+        "prompt": env.prompts[0],
+        "generated_query": f"SELECT * FROM {env.args.table}",
+        "execution_result": {"columns": result["columns"], "rows": result["rows"]},
+    })
+
+    def run():
+        app.json.dumps(response)
+    return run, len(result["rows"])
+
+
+def measure(run, operations, repeat):
+    """Seconds per operation for each of `repeat` calls."""
+    samples = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start_time) / operations)
+    return samples
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def baseline(history, name, runs, settings, machine):
+    """Median of the last `runs` results for `name` measured with the same settings on the same kind of machine."""
+    values = [
+        entry["results"][name] for entry in history
+        if name in entry.get("results", {}) and entry.get("settings") == settings and entry.get("machine") == machine
+    ]
+    values = values[-runs:]
+    return statistics.median(values) if values else None
+
+
+def format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline microbenchmarks for the backend hot paths.")
+    parser.add_argument("--schema", default="schema.json")
+    parser.add_argument("--data", default="new_data.json")
+    parser.add_argument("--prompts", default="prompts.txt")
+    parser.add_argument("--table", default="vessels", help="Table repeated into the wide result set")
+    parser.add_argument("--rows", type=int, default=5000, help="Rows in the wide result set")
+    parser.add_argument("--generate-tokens", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", action="append", default=[], help="Run benchmarks whose name contains this")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--no-history", action="store_true", help="Do not append this run to the history")
+    parser.add_argument("--baseline-runs", type=int, default=5,
+                        help="Earlier runs with the same settings and machine the baseline median covers")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    env = Environment(args)
+    history = load_history(args.history)
+    settings = {"table": args.table, "rows": args.rows, "generate_tokens": args.generate_tokens}
+    machine = platform.machine()
+    results = {}
+    regressions = []
+    print(f"{'benchmark':45} {'median/op':>12} {'min/op':>12} {'baseline':>12} {'change':>8}")
+    for name, setup in BENCHMARKS.items():
+        if args.only and not any(part in name for part in args.only):
+            continue
+        # The app's debug prints are not the subject here
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                run, operations = setup(env)
+            except ImportError as e:
+                skipped = e
+            else:
+                skipped = None
+                run()  # Warm-up
+                samples = measure(run, operations, args.repeat)
+        if skipped is not None:
+            print(f"{name:45} skipped: {skipped}")
+            continue
+        median = statistics.median(samples)
+        results[name] = median
+        previous = baseline(history, name, args.baseline_runs, settings, machine)
+        change = ""
+        if previous:
+            ratio = median / previous - 1
+            change = f"{ratio:+.1%}"
+            if ratio > args.threshold:
+                regressions.append(name)
+                change += " !"
+        print(f"{name:45} {format_seconds(median):>12} {format_seconds(min(samples)):>12} "
+              f"{format_seconds(previous) if previous else '-':>12} {change:>8}")
+
+    if not args.no_history and results:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": machine,
+            "settings": settings,
+            "results": results,
+        }
+        with open(args.history, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    if regressions:
+        print(f"Slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
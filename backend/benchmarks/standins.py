@@ -0,0 +1,126 @@
+"""
+Local stand-ins for Oracle and the T5 model so the benchmarks run anywhere.
+
+- An in-memory SQLite database loaded from new_data.json, returning rows the
+  way cx_Oracle does: upper-case column names, datetime objects for
+  timestamps and a cursor.description with named type codes.
+- A tiny randomly initialized T5 with a word-level tokenizer built from the
+  schema and the prompt corpus. Its output is noise, but its tokenize and
+  generate code paths are the real ones.
+"""
+import json
+import re
+import sqlite3
+from datetime import datetime
+
+TIMESTAMP_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}:\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:\d{2})?$")
+
+SQL_WORDS = [
+    "select", "from", "where", "and", "or", "join", "on", "group", "by", "order", "count", "sum", "avg",
+    "max", "min", "as", "desc", "asc", "fetch", "first", "rows", "only", "not", "null", "is", "in", "like",
+    "*", ",", ".", "(", ")", "=", "<", ">", "'", ";",
+]
+
+
+class TypeCode:
+    """Named like cx_Oracle's DB_TYPE_* objects, which is all result_shaping.column_kind reads."""
+
+    def __init__(self, name):
+        self.name = name
+
+
+DB_TYPE_NUMBER = TypeCode("DB_TYPE_NUMBER")
+DB_TYPE_TIMESTAMP = TypeCode("DB_TYPE_TIMESTAMP")
+DB_TYPE_VARCHAR = TypeCode("DB_TYPE_VARCHAR")
+
+
+def _type_code(values):
+    value = next((value for value in values if value is not None), None)
+    if isinstance(value, datetime):
+        return DB_TYPE_TIMESTAMP
+    if isinstance(value, (int, float)):
+        return DB_TYPE_NUMBER
+    return DB_TYPE_VARCHAR
+
+
+def _sqlite_value(value):
+    if isinstance(value, str) and TIMESTAMP_PATTERN.match(value):
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def load_sqlite(schema, data_path="new_data.json"):
+    """In-memory SQLite copy of the JSON export, one table per schema.json table."""
+    connection = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+    with open(data_path, "r") as f:
+        data = json.load(f)
+    for table, details in schema.items():
+        columns = details["columns"]
+        rows = [[_sqlite_value(row.get(column)) for column in columns] for row in data.get(table, [])]
+        # Declared types only matter for timestamps, which come back as datetime like cx_Oracle's
+        types = {
+            column: "timestamp" if any(isinstance(row[i], datetime) for row in rows) else ""
+            for i, column in enumerate(columns)
+        }
+        connection.execute(f"CREATE TABLE {table} ({', '.join(f'{c} {types[c]}' for c in columns)})")
+        connection.executemany(
+            f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})",
+            rows,
+        )
+    return connection
+
+
+def run_query(connection, sql):
+    """Execute `sql` and return {"columns", "rows", "description"}; description is typed from the values."""
+    cursor = connection.execute(sql)
+    columns = [column[0].upper() for column in cursor.description]
+    rows = cursor.fetchall()
+    description = [
+        (column, _type_code(row[i] for row in rows), None, None, None, None, None)
+        for i, column in enumerate(columns)
+    ]
+    return {"columns": columns, "rows": rows, "description": description}
+
+
+def wide_result(connection, table, row_count):
+    """SELECT * from `table`, repeated up to `row_count` rows."""
+    result = run_query(connection, f"SELECT * FROM {table}")
+    rows = result["rows"]
+    result["rows"] = [rows[i % len(rows)] for i in range(row_count)] if rows else []
+    return result
+
+
+def tiny_t5(schema, prompts, seed=0):
+    """A 2-layer T5 with random weights and a word-level tokenizer; returns (model, tokenizer)."""
+    import torch
+    from tokenizers import Tokenizer, normalizers, pre_tokenizers, processors
+    from tokenizers.models import WordLevel
+    from transformers import PreTrainedTokenizerFast, T5Config, T5ForConditionalGeneration
+
+    words = set(SQL_WORDS)
+    for prompt in prompts:
+        words.update(re.findall(r"\w+|[^\w\s]", prompt.lower()))
+    for table, details in schema.items():
+        words.add(table.lower())
+        words.update(column.lower() for column in details.get("columns", []))
+    vocab = {token: i for i, token in enumerate(["<pad>", "</s>", "<unk>"] + sorted(words))}
+
+    backend = Tokenizer(WordLevel(vocab, unk_token="<unk>"))
+    backend.normalizer = normalizers.Lowercase()
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(single="$A </s>", special_tokens=[("</s>", 1)])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, pad_token="<pad>", eos_token="</s>", unk_token="<unk>")
+
+    torch.manual_seed(seed)
+    config = T5Config(
+        vocab_size=len(vocab), d_model=64, d_kv=16, d_ff=128, num_layers=2, num_decoder_layers=2,
+        num_heads=4, decoder_start_token_id=0, pad_token_id=0, eos_token_id=1,
+    )
+    model = T5ForConditionalGeneration(config)
+    model.eval()
+    return model, tokenizer
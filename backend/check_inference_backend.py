@@ -0,0 +1,76 @@
+import argparse
+import logging
+import sys
+import time
+
+import torch
+
+from inference import INFERENCE_BACKENDS, format_sql_prompt, load_model
+from result_cache import normalize_sql
+from schema_index import SchemaIndex
+
+logging.basicConfig(level=logging.INFO)
+
+
+def load_prompts(path):
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def generate_all(model, tokenizer, input_texts, max_length):
+    outputs = []
+    latencies = []
+    for input_text in input_texts:
+        start_time = time.perf_counter()
+        inputs = tokenizer(input_text, return_tensors="pt", max_length=512, truncation=True)
+        with torch.inference_mode():
+            generated = model.generate(inputs["input_ids"], max_length=max_length)
+        outputs.append(tokenizer.decode(generated[0], skip_special_tokens=True).strip())
+        latencies.append(time.perf_counter() - start_time)
+    return outputs, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare SQL generated by an optimized inference backend against the fp32 model."
+    )
+    parser.add_argument("--model-path", required=True)
+    parser.add_argument("--backend", required=True, choices=[b for b in INFERENCE_BACKENDS if b != "fp32"])
+    parser.add_argument("--prompts", default="prompts.txt", help="One prompt per line")
+    parser.add_argument("--schema", default="schema.json")
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--min-match", type=float, default=0.95, help="Minimum fraction of identical SQL")
+    args = parser.parse_args()
+
+    schema_index = SchemaIndex(args.schema)
+    prompts = load_prompts(args.prompts)
+    input_texts = []
+    for prompt in prompts:
+        context = {table: schema_index.schema[table] for table in schema_index.find_relevant_tables(prompt)}
+        input_texts.append(format_sql_prompt(prompt, context))
+
+    model, tokenizer = load_model(args.model_path, "fp32")
+    reference, reference_latencies = generate_all(model, tokenizer, input_texts, args.max_length)
+    del model
+
+    model, tokenizer = load_model(args.model_path, args.backend)
+    candidate, candidate_latencies = generate_all(model, tokenizer, input_texts, args.max_length)
+
+    matches = 0
+    for prompt, expected, actual in zip(prompts, reference, candidate):
+        if normalize_sql(expected) == normalize_sql(actual):
+            matches += 1
+        else:
+            print(f"MISMATCH {prompt!r}\n  fp32:        {expected}\n  {args.backend + ':':<12} {actual}")
+
+    match_rate = matches / len(prompts) if prompts else 1.0
+    fp32_mean = sum(reference_latencies) / max(len(reference_latencies), 1)
+    candidate_mean = sum(candidate_latencies) / max(len(candidate_latencies), 1)
+    print(f"Prompts: {len(prompts)}  identical SQL: {matches} ({match_rate:.1%})")
+    print(f"Mean latency fp32: {fp32_mean * 1000:.1f} ms  {args.backend}: {candidate_mean * 1000:.1f} ms  "
+          f"speedup: {fp32_mean / candidate_mean if candidate_mean else 0:.2f}x")
+    return 0 if match_rate >= args.min_match else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,10 @@
+import argparse
 import cx_Oracle
+import json
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -12,267 +17,485 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_SERVICE_NAME = os.getenv("DB_SERVICE_NAME")
 
-# Ensure environment variables are set
-if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_SERVICE_NAME]):
-    raise ValueError("Missing one or more required environment variables for DB connection.")
-
-# Connect to Oracle Database using cx_Oracle
-dsn_tns = cx_Oracle.makedsn(DB_HOST, DB_PORT, service_name=DB_SERVICE_NAME)
-connection = cx_Oracle.connect(user=DB_USER, password=DB_PASSWORD, dsn=dsn_tns)
-cursor = connection.cursor()
-
-# Drop existing tables
-drop_table_queries = [
-    "DROP TABLE financials CASCADE CONSTRAINTS",
-    "DROP TABLE assets CASCADE CONSTRAINTS",
-    "DROP TABLE assets_maintenance CASCADE CONSTRAINTS",
-    "DROP TABLE cradles CASCADE CONSTRAINTS",
-    "DROP TABLE vessels CASCADE CONSTRAINTS",
-    "DROP TABLE inventory CASCADE CONSTRAINTS",
-    "DROP TABLE trolleys CASCADE CONSTRAINTS",
-    "DROP TABLE lifts CASCADE CONSTRAINTS",
-    "DROP TABLE work_orders CASCADE CONSTRAINTS",
-    "DROP TABLE wheels_load CASCADE CONSTRAINTS",
-    "DROP TABLE rails CASCADE CONSTRAINTS",
-    "DROP TABLE wheels_temperature CASCADE CONSTRAINTS",
+# Column definitions per table, parents before children
+TABLES = {
+    "assets": [
+        "id VARCHAR2(100) NOT NULL",
+        "assetType VARCHAR2(100)",
+        "name VARCHAR2(100)",
+        "description VARCHAR2(255)",
+        "status VARCHAR2(50)",
+        "createdAt TIMESTAMP",
+        "updatedAt TIMESTAMP",
+    ],
+    "financials": [
+        "id VARCHAR2(100) NOT NULL",
+        "recordDate DATE NOT NULL",
+        "dockingFees NUMBER DEFAULT 0 NOT NULL",
+        "onDockingFees NUMBER DEFAULT 0 NOT NULL",
+        "undockingFees NUMBER DEFAULT 0 NOT NULL",
+        "maintenanceFees NUMBER DEFAULT 0 NOT NULL",
+        "otherServiceFees NUMBER DEFAULT 0 NOT NULL",
+        "totalRevenue NUMBER DEFAULT 0 NOT NULL",
+        "laborCosts NUMBER DEFAULT 0 NOT NULL",
+        "dockOperationCosts NUMBER DEFAULT 0 NOT NULL",
+        "equipmentCosts NUMBER DEFAULT 0 NOT NULL",
+        "administrativeCosts NUMBER DEFAULT 0 NOT NULL",
+        "totalExpenses NUMBER DEFAULT 0 NOT NULL",
+        "netProfitLoss NUMBER DEFAULT 0 NOT NULL",
+        "assetId VARCHAR2(100)",
+    ],
+    "cradles": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "cradleName VARCHAR2(100)",
+        "capacity NUMBER",
+        "maxShipLength NUMBER",
+        "status VARCHAR2(50)",
+        "location VARCHAR2(100)",
+        "lastMaintenanceDate TIMESTAMP",
+        "nextMaintenanceDue TIMESTAMP",
+        "operationalSince TIMESTAMP",
+        "notes VARCHAR2(255)",
+        "occupancy VARCHAR2(100)",
+        "currentLoad NUMBER",
+        "structuralStress VARCHAR2(50)",
+        "wearLevel VARCHAR2(50)",
+        "assetId VARCHAR2(100)",
+    ],
+    "vessels": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "vesselName VARCHAR2(100)",
+        "vesselType VARCHAR2(50)",
+        "weight NUMBER",
+        "length NUMBER",
+        "width NUMBER",
+        "draft NUMBER",
+        "status VARCHAR2(50)",
+        "lastMaintenanceDate TIMESTAMP",
+        "nextMaintenanceDue TIMESTAMP",
+        "birthingArea VARCHAR2(100)",
+        "operationalSince TIMESTAMP",
+        "ownerCompany VARCHAR2(100)",
+        "notes VARCHAR2(255)",
+        "assignedCradle VARCHAR2(100)",
+        "transferCompleted VARCHAR2(50)",
+        "estimatedTimeToDestination VARCHAR2(50)",
+        "bearingTemperature NUMBER",
+        "assetId VARCHAR2(100)",
+    ],
+    "inventory": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "lastUpdated TIMESTAMP",
+        "name VARCHAR2(100)",
+        "location VARCHAR2(100)",
+        "quantity NUMBER",
+        "assetId VARCHAR2(100)",
+    ],
+    "rails": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "railName VARCHAR2(100)",
+        "length NUMBER",
+        "capacity NUMBER",
+        "status VARCHAR2(50)",
+        "lastInspectionDate TIMESTAMP",
+        "nextInspectionDue TIMESTAMP",
+        "operationalSince TIMESTAMP",
+        "notes VARCHAR2(255)",
+        "assetId VARCHAR2(100)",
+    ],
+    "trolleys": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "trolleyName VARCHAR2(100)",
+        "wheelCount NUMBER",
+        "railId VARCHAR2(100)",
+        "assignedVesselId VARCHAR2(100)",
+        "status VARCHAR2(50)",
+        "lastMaintenanceDate TIMESTAMP",
+        "nextMaintenanceDue TIMESTAMP",
+        "notes VARCHAR2(255)",
+        "maxCapacity NUMBER",
+        "currentLoad NUMBER",
+        "speed NUMBER",
+        "location VARCHAR2(255)",
+        "utilizationRate VARCHAR2(50)",
+        "averageTransferTime VARCHAR2(50)",
+        "assetId VARCHAR2(100)",
+    ],
+    "lifts": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "liftName VARCHAR2(100)",
+        "platformLength NUMBER",
+        "platformWidth NUMBER",
+        "maxShipDraft NUMBER",
+        "location VARCHAR2(255)",
+        "status VARCHAR2(50)",
+        "lastMaintenanceDate TIMESTAMP",
+        "nextMaintenanceDue TIMESTAMP",
+        "operationalSince TIMESTAMP",
+        "assignedVesselId VARCHAR2(100)",
+        "notes VARCHAR2(255)",
+        "currentLoad NUMBER",
+        "historicalUsageHours NUMBER",
+        "maxCapacity NUMBER",
+        "utilizationRate VARCHAR2(50)",
+        "averageTransferTime VARCHAR2(50)",
+        "assetId VARCHAR2(100)",
+    ],
+    "assets_maintenance": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "assetId VARCHAR2(100)",
+        "description VARCHAR2(255)",
+        "datePerformed TIMESTAMP",
+        "performedBy VARCHAR2(255)",
+        "nextDueDate TIMESTAMP",
+        "assetName VARCHAR2(100)",
+        "historicalUsageHours NUMBER",
+        "remainingLifespanHours NUMBER",
+        "statusSummary VARCHAR2(255)",
+        "shipsInTransfer NUMBER",
+        "operationalLifts NUMBER",
+        "operationalTrolleys NUMBER",
+    ],
+    "work_orders": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "workType VARCHAR2(50)",
+        "assignedTo VARCHAR2(100)",
+        "startDate TIMESTAMP",
+        "endDate TIMESTAMP",
+        "status VARCHAR2(50)",
+        "notes VARCHAR2(255)",
+        "vesselName VARCHAR2(100)",
+        "vesselId VARCHAR2(100)",
+    ],
+    "wheels_load": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "trolley VARCHAR2(100)",
+        "wheel VARCHAR2(100)",
+        "currentLoad NUMBER",
+    ],
+    "wheels_temperature": [
+        "id VARCHAR2(100) NOT NULL",
+        "updatedAt TIMESTAMP",
+        "trolley VARCHAR2(100)",
+        "wheel VARCHAR2(100)",
+        "bearingTemperature NUMBER",
+    ],
+}
+
+# Every table is keyed on id (declared NOT NULL above so bare tables match the data dictionary)
+PRIMARY_KEYS = {table_name: "id" for table_name in TABLES}
+UNIQUE_KEYS = {"vessels": ["vesselName"]}
+
+# (constraint name, table, column, referenced table, referenced column)
+FOREIGN_KEYS = [
+    ("fkFinancialsAssetId", "financials", "assetId", "assets", "id"),
+    ("fkCradleAssetId", "cradles", "assetId", "assets", "id"),
+    ("fkVesselAssetId", "vessels", "assetId", "assets", "id"),
+    ("fkVesselAssignedCradle", "vessels", "assignedCradle", "cradles", "id"),
+    ("fkInventoryAssetId", "inventory", "assetId", "assets", "id"),
+    ("fkRailAssetId", "rails", "assetId", "assets", "id"),
+    ("fkTrolleyAssetId", "trolleys", "assetId", "assets", "id"),
+    ("fkTrolleyRailId", "trolleys", "railId", "rails", "id"),
+    ("fkTrolleyAssignedVesselId", "trolleys", "assignedVesselId", "vessels", "id"),
+    ("fkLiftAssetId", "lifts", "assetId", "assets", "id"),
+    ("fkLiftAssignedVesselId", "lifts", "assignedVesselId", "vessels", "id"),
+    ("fkMmaintenanceAssetId", "assets_maintenance", "assetId", "assets", "id"),
+    ("fkWorkOrderVesselId", "work_orders", "vesselId", "vessels", "id"),
+    ("fkWheelsLoadTrolleyId", "wheels_load", "trolley", "trolleys", "id"),
+    ("fkWheelsTempTrolley_id", "wheels_temperature", "trolley", "trolleys", "id"),
 ]
 
-for query in drop_table_queries:
+# Oracle does not index foreign key columns by itself; joins along them would full scan
+INDEXES = [(table_name, column) for _, table_name, column, _, _ in FOREIGN_KEYS]
+
+COLUMN_DEFINITION = re.compile(r"^(\w+) (\w+(?:\(\d+\))?)(?: DEFAULT (\S+))?( NOT NULL)?$")
+
+
+# Helper: Constraint name suffix for a table, e.g. assets_maintenance -> AssetsMaintenance
+def camel_case(name):
+    return "".join(part[0].upper() + part[1:] for part in name.split("_"))
+
+
+def primary_key_name(table_name):
+    return f"pk{camel_case(table_name)}"
+
+
+def unique_key_name(table_name, column):
+    return f"uk{camel_case(table_name)}{camel_case(column)}"
+
+
+def index_name(table_name, column):
+    return f"ix{camel_case(table_name)}{camel_case(column)}"
+
+
+def create_index_query(table_name, column):
+    return f"CREATE INDEX {index_name(table_name, column)} ON {table_name}({column})"
+
+
+def constraint_clauses(table_name):
+    clauses = [f"CONSTRAINT {primary_key_name(table_name)} PRIMARY KEY ({PRIMARY_KEYS[table_name]})"]
+    for column in UNIQUE_KEYS.get(table_name, []):
+        clauses.append(f"CONSTRAINT {unique_key_name(table_name, column)} UNIQUE ({column})")
+    return clauses
+
+
+def foreign_key_clause(name, column, parent_table, parent_column):
+    return f"CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {parent_table}({parent_column})"
+
+
+def create_table_query(table_name, with_constraints=True):
+    lines = list(TABLES[table_name])
+    if with_constraints:
+        lines += constraint_clauses(table_name)
+        lines += [
+            foreign_key_clause(name, column, parent_table, parent_column)
+            for name, child_table, column, parent_table, parent_column in FOREIGN_KEYS
+            if child_table == table_name
+        ]
+    return f"CREATE TABLE {table_name} (\n    " + ",\n    ".join(lines) + "\n)"
+
+
+# Helper: Normalized (name, type, nullable, default) as the data dictionary reports it
+def column_signature(definition):
+    name, data_type, default, not_null = COLUMN_DEFINITION.match(definition).groups()
+    if data_type == "TIMESTAMP":
+        data_type = "TIMESTAMP(6)"
+    return name.upper(), data_type, "N" if not_null else "Y", default
+
+
+def existing_table_signatures(cursor):
+    cursor.execute(
+        """
+        SELECT table_name, column_name, data_type, char_length, nullable, data_default
+        FROM user_tab_columns
+        ORDER BY table_name, column_id
+        """
+    )
+    signatures = {}
+    for table_name, column_name, data_type, char_length, nullable, data_default in cursor:
+        if data_type == "VARCHAR2":
+            data_type = f"VARCHAR2({char_length})"
+        default = data_default.strip() if data_default and data_default.strip().upper() != "NULL" else None
+        signatures.setdefault(table_name.lower(), []).append((column_name, data_type, nullable, default))
+    return signatures
+
+
+def changed_tables(cursor):
+    """Tables that are missing or whose columns differ from TABLES, in creation order."""
+    existing = existing_table_signatures(cursor)
+    return [
+        table_name for table_name, definitions in TABLES.items()
+        if existing.get(table_name.lower()) != [column_signature(definition) for definition in definitions]
+    ]
+
+
+def drop_table(cursor, table_name):
     try:
-        cursor.execute(query)
-        print(f"Table dropped successfully: {query.split()[2]}")
+        cursor.execute(f"DROP TABLE {table_name} CASCADE CONSTRAINTS")
+        print(f"Table dropped successfully: {table_name}")
     except cx_Oracle.DatabaseError as e:
         error, = e.args
-        if error.code != 942:  # Ignore table not found error
-            print(f"Error dropping table: {query.split()[2]} - {error.message}")
+        if error.code != 942:  # ORA-00942: table or view does not exist
+            raise
 
-create_table_queries = [
 
-    """
-    CREATE TABLE assets (
-        id VARCHAR2(100) PRIMARY KEY,
-        assetType VARCHAR2(100),
-        name VARCHAR2(100),
-        description VARCHAR2(255),
-        status VARCHAR2(50),
-        createdAt TIMESTAMP,
-        updatedAt TIMESTAMP
-    )
-    """,
-"""
-CREATE TABLE financials (
-    id VARCHAR2(100) PRIMARY KEY,
-    recordDate DATE NOT NULL,
-    dockingFees NUMBER DEFAULT 0 NOT NULL,              
-    onDockingFees NUMBER DEFAULT 0 NOT NULL,            
-    undockingFees NUMBER DEFAULT 0 NOT NULL,            
-    maintenanceFees NUMBER DEFAULT 0 NOT NULL,          
-    otherServiceFees NUMBER DEFAULT 0 NOT NULL,        
-
-    totalRevenue NUMBER DEFAULT 0 NOT NULL,  
-
-    laborCosts NUMBER DEFAULT 0 NOT NULL,              
-    dockOperationCosts NUMBER DEFAULT 0 NOT NULL,       
-    equipmentCosts NUMBER DEFAULT 0 NOT NULL,          
-    administrativeCosts NUMBER DEFAULT 0 NOT NULL,   
-
-    totalExpenses NUMBER DEFAULT 0 NOT NULL,  
-    netProfitLoss NUMBER DEFAULT 0 NOT NULL,   
-
-    assetId VARCHAR2(100),
-    CONSTRAINT fkFinancialsAssetId FOREIGN KEY (assetId) REFERENCES assets(id)
-)
-"""
-,
-    """
-    CREATE TABLE cradles (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        cradleName VARCHAR2(100),
-        capacity NUMBER,
-        maxShipLength NUMBER,
-        status VARCHAR2(50),
-        location VARCHAR2(100),
-        lastMaintenanceDate TIMESTAMP,
-        nextMaintenanceDue TIMESTAMP,
-        operationalSince TIMESTAMP,
-        notes VARCHAR2(255),
-        occupancy VARCHAR2(100),
-        currentLoad NUMBER,
-        structuralStress VARCHAR2(50),
-        wearLevel VARCHAR2(50),
-        assetId VARCHAR2(100),
-        CONSTRAINT fkCradleAssetId FOREIGN KEY (assetId) REFERENCES assets(id)
-    )
-    """,
-    """
-    CREATE TABLE vessels (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        vesselName VARCHAR2(100) UNIQUE,
-        vesselType VARCHAR2(50),
-        weight NUMBER,
-        length NUMBER,
-        width NUMBER,
-        draft NUMBER,
-        status VARCHAR2(50),
-        lastMaintenanceDate TIMESTAMP,
-        nextMaintenanceDue TIMESTAMP,
-        birthingArea VARCHAR2(100),
-        operationalSince TIMESTAMP,
-        ownerCompany VARCHAR2(100),
-        notes VARCHAR2(255),
-        assignedCradle VARCHAR2(100),
-        transferCompleted VARCHAR2(50),
-        estimatedTimeToDestination VARCHAR2(50),
-        bearingTemperature NUMBER,
-        assetId VARCHAR2(100),
-        CONSTRAINT fkVesselAssetId FOREIGN KEY (assetId) REFERENCES assets(id),
-        CONSTRAINT fkVesselAssignedCradle FOREIGN KEY (assignedCradle) REFERENCES cradles(id)
-    )
-    """,
-    """
-    CREATE TABLE inventory (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        lastUpdated TIMESTAMP,
-        name VARCHAR2(100),
-        location VARCHAR2(100),
-        quantity NUMBER,
-        assetId VARCHAR2(100),
-        CONSTRAINT fkInventoryAssetId FOREIGN KEY (assetId) REFERENCES assets(id)
-    )
-    """,
-    """
-    CREATE TABLE rails (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        railName VARCHAR2(100),
-        length NUMBER,
-        capacity NUMBER,
-        status VARCHAR2(50),
-        lastInspectionDate TIMESTAMP,
-        nextInspectionDue TIMESTAMP,
-        operationalSince TIMESTAMP,
-        notes VARCHAR2(255),
-        assetId VARCHAR2(100),
-        CONSTRAINT fkRailAssetId FOREIGN KEY (assetId) REFERENCES assets(id)
-    )
-    """,
-    """
-    CREATE TABLE trolleys (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        trolleyName VARCHAR2(100),
-        wheelCount NUMBER,
-        railId VARCHAR2(100),
-        assignedVesselId VARCHAR2(100),
-        status VARCHAR2(50),
-        lastMaintenanceDate TIMESTAMP,
-        nextMaintenanceDue TIMESTAMP,
-        notes VARCHAR2(255),
-        maxCapacity NUMBER,
-        currentLoad NUMBER,
-        speed NUMBER,
-        location VARCHAR2(255),
-        utilizationRate VARCHAR2(50),
-        averageTransferTime VARCHAR2(50),
-        assetId VARCHAR2(100),
-        CONSTRAINT fkTrolleyAssetId FOREIGN KEY (assetId) REFERENCES assets(id),
-        CONSTRAINT fkTrolleyRailId FOREIGN KEY (railId) REFERENCES rails(id),
-        CONSTRAINT fkTrolleyAssignedVesselId FOREIGN KEY (assignedVesselId) REFERENCES vessels(id)
+def create_table(cursor, table_name, with_constraints=True):
+    try:
+        cursor.execute(create_table_query(table_name, with_constraints))
+        print(f"Table created successfully: {table_name}")
+    except cx_Oracle.DatabaseError as e:
+        error, = e.args
+        print(f"Error creating table: {table_name} - {error.message}")
+
+
+def existing_constraints(cursor):
+    """Map of (table, type, column) and constraint names already in place, all upper case."""
+    cursor.execute(
+        """
+        SELECT c.table_name, c.constraint_type, c.constraint_name, cc.column_name
+        FROM user_constraints c
+        JOIN user_cons_columns cc ON cc.constraint_name = c.constraint_name
+        WHERE c.constraint_type IN ('P', 'U', 'R')
+        """
     )
-    """,
+    keys = set()
+    names = set()
+    for table_name, constraint_type, constraint_name, column_name in cursor:
+        keys.add((table_name, constraint_type, column_name))
+        names.add(constraint_name)
+    return keys, names
+
+
+def indexed_columns(cursor):
+    """(table, column) pairs, upper case, that lead an existing index."""
+    cursor.execute("SELECT table_name, column_name FROM user_ind_columns WHERE column_position = 1")
+    return set(cursor.fetchall())
+
+
+def missing_constraint_statements(cursor):
     """
-    CREATE TABLE lifts (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        liftName VARCHAR2(100),
-        platformLength NUMBER,
-        platformWidth NUMBER,
-        maxShipDraft NUMBER,
-        location VARCHAR2(255),
-        status VARCHAR2(50),
-        lastMaintenanceDate TIMESTAMP,
-        nextMaintenanceDue TIMESTAMP,
-        operationalSince TIMESTAMP,
-        assignedVesselId VARCHAR2(100),
-        notes VARCHAR2(255),
-        currentLoad NUMBER,
-        historicalUsageHours NUMBER,
-        maxCapacity NUMBER,
-        utilizationRate VARCHAR2(50),
-        averageTransferTime VARCHAR2(50),
-        assetId VARCHAR2(100),
-        CONSTRAINT fkLiftAssetId FOREIGN KEY (assetId) REFERENCES assets(id),
-        CONSTRAINT fkLiftAssignedVesselId FOREIGN KEY (assignedVesselId) REFERENCES vessels(id)
-    )
-    """,
+    DDL for every constraint and index not yet in the data dictionary.
+
+    :return: (key and index statements grouped by table, foreign key statements grouped by child table)
     """
-    CREATE TABLE assets_maintenance (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        assetId VARCHAR2(100),
-        description VARCHAR2(255),
-        datePerformed TIMESTAMP,
-        performedBy VARCHAR2(255),
-        nextDueDate TIMESTAMP,
-        assetName VARCHAR2(100),
-        historicalUsageHours NUMBER,
-        remainingLifespanHours NUMBER,
-        statusSummary VARCHAR2(255),
-        shipsInTransfer NUMBER,
-        operationalLifts NUMBER,
-        operationalTrolleys NUMBER,
-        CONSTRAINT fkMmaintenanceAssetId FOREIGN KEY (assetId) REFERENCES assets(id)
-    )
-    """,
+    keys, names = existing_constraints(cursor)
+    indexed = indexed_columns(cursor)
+    key_statements = {}
+    for table_name in TABLES:
+        column = PRIMARY_KEYS[table_name]
+        if (table_name.upper(), "P", column.upper()) not in keys:
+            key_statements.setdefault(table_name, []).append(
+                f"ALTER TABLE {table_name} ADD CONSTRAINT {primary_key_name(table_name)} PRIMARY KEY ({column})"
+            )
+        for column in UNIQUE_KEYS.get(table_name, []):
+            if (table_name.upper(), "U", column.upper()) not in keys:
+                key_statements.setdefault(table_name, []).append(
+                    f"ALTER TABLE {table_name} ADD CONSTRAINT {unique_key_name(table_name, column)} UNIQUE ({column})"
+                )
+    for table_name, column in INDEXES:
+        if (table_name.upper(), column.upper()) not in indexed:
+            key_statements.setdefault(table_name, []).append(create_index_query(table_name, column))
+    foreign_key_statements = {}
+    for name, table_name, column, parent_table, parent_column in FOREIGN_KEYS:
+        if name.upper() not in names:
+            foreign_key_statements.setdefault(table_name, []).append(
+                f"ALTER TABLE {table_name} ADD {foreign_key_clause(name, column, parent_table, parent_column)}"
+            )
+    return key_statements, foreign_key_statements
+
+
+def run_statements(pool, table_name, statements):
+    connection = pool.acquire()
+    try:
+        cursor = connection.cursor()
+        # Foreign keys on sibling tables briefly lock the same parent
+        cursor.execute("ALTER SESSION SET ddl_lock_timeout = 60")
+        for statement in statements:
+            start_time = time.time()
+            cursor.execute(statement)
+            print(f"{statement} ({time.time() - start_time:.1f}s)")
+    finally:
+        pool.release(connection)
+    return table_name
+
+
+def build_constraints(pool, workers=4):
     """
-    CREATE TABLE work_orders (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        workType VARCHAR2(50),
-        assignedTo VARCHAR2(100),
-        startDate TIMESTAMP,
-        endDate TIMESTAMP,
-        status VARCHAR2(50),
-        notes VARCHAR2(255),
-        vesselName VARCHAR2(100),
-        vesselId VARCHAR2(100), 
-        CONSTRAINT fkWorkOrderVesselId FOREIGN KEY (vesselId) REFERENCES vessels(id)   
-    )
-    """,
+    Build missing primary key, unique and foreign key constraints and the foreign key indexes.
+
+    Statements for one table run in order on one session; different tables run in
+    parallel. Keys go first since foreign keys need the parent's primary key.
     """
-    CREATE TABLE wheels_load (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        trolley VARCHAR2(100),
-        wheel VARCHAR2(100),
-        currentLoad NUMBER,
-        CONSTRAINT fkWheelsLoadTrolleyId FOREIGN KEY (trolley) REFERENCES trolleys(id)
-    )
-    """,
+    connection = pool.acquire()
+    try:
+        key_statements, foreign_key_statements = missing_constraint_statements(connection.cursor())
+    finally:
+        pool.release(connection)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for phase in (key_statements, foreign_key_statements):
+            futures = [
+                executor.submit(run_statements, pool, table_name, statements)
+                for table_name, statements in phase.items()
+            ]
+            for future in futures:
+                future.result()
+
+
+def provision_full(connection):
+    """Drop every table and recreate it with its constraints and indexes active."""
+    cursor = connection.cursor()
+    for table_name in reversed(list(TABLES)):
+        drop_table(cursor, table_name)
+    for table_name in TABLES:
+        create_table(cursor, table_name)
+    for table_name, column in INDEXES:
+        try:
+            cursor.execute(create_index_query(table_name, column))
+            print(f"Index created successfully: {index_name(table_name, column)}")
+        except cx_Oracle.DatabaseError as e:
+            error, = e.args
+            print(f"Error creating index: {index_name(table_name, column)} - {error.message}")
+    cursor.close()
+
+
+def provision_fast(pool, data_file=None, schema_path="schema.json", workers=4):
     """
-    CREATE TABLE wheels_temperature (
-        id VARCHAR2(100) PRIMARY KEY,
-        updatedAt TIMESTAMP,
-        trolley VARCHAR2(100),
-        wheel VARCHAR2(100),
-        bearingTemperature NUMBER,
-        CONSTRAINT fkWheelsTempTrolley_id FOREIGN KEY (trolley) REFERENCES trolleys(id)
-    )
+    Recreate only the tables whose definition changed, bare; optionally bulk load
+    them, then build all missing constraints in parallel.
     """
-]
+    connection = pool.acquire()
+    try:
+        cursor = connection.cursor()
+        tables = changed_tables(cursor)
+        unchanged = [table_name for table_name in TABLES if table_name not in tables]
+        if unchanged:
+            print(f"Keeping unchanged tables: {', '.join(unchanged)}")
+        for table_name in reversed(tables):
+            drop_table(cursor, table_name)
+        for table_name in tables:
+            create_table(cursor, table_name, with_constraints=False)
+        cursor.close()
+    finally:
+        pool.release(connection)
+
+    if data_file and tables:
+        from add_data import BulkLoader
+
+        with open(schema_path, "r") as f:
+            schema = json.load(f)
+        start_time = time.time()
+        reports = BulkLoader(pool, schema, workers=workers).load(data_file, tables=tables)
+        for report in reports:
+            print(f"{report.table_name}: {report.inserted} rows inserted, {report.failed} failed")
+        print(f"Load finished in {time.time() - start_time:.1f}s")
 
-# Execute table creation queries
-for query in create_table_queries:
+    start_time = time.time()
+    build_constraints(pool, workers=workers)
+    print(f"Constraints built in {time.time() - start_time:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the Oracle tables.")
+    parser.add_argument("--fast", action="store_true",
+                        help="Only recreate changed tables, without constraints until after the load")
+    parser.add_argument("--load", metavar="FILE",
+                        help="With --fast: bulk load this JSON export into the recreated tables")
+    parser.add_argument("--schema", default="schema.json")
+    parser.add_argument("--workers", type=int, default=4, help="Sessions used for loading and DDL")
+    args = parser.parse_args()
+
+    # Ensure environment variables are set
+    if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_SERVICE_NAME]):
+        raise ValueError("Missing one or more required environment variables for DB connection.")
+
+    dsn_tns = cx_Oracle.makedsn(DB_HOST, DB_PORT, service_name=DB_SERVICE_NAME)
+    if not args.fast:
+        # Connect to Oracle Database using cx_Oracle
+        connection = cx_Oracle.connect(user=DB_USER, password=DB_PASSWORD, dsn=dsn_tns)
+        try:
+            provision_full(connection)
+        finally:
+            connection.close()
+        return
+
+    pool = cx_Oracle.SessionPool(
+        DB_USER, DB_PASSWORD, dsn_tns, min=1, max=args.workers + 1, increment=1, threaded=True
+    )
     try:
-        cursor.execute(query)
-        print(f"Table created successfully: {query.split()[2]}")
-    except cx_Oracle.DatabaseError as e:
-        error, = e.args
-        print(f"Error creating table: {query.split()[2]} - {error.message}")
+        provision_fast(pool, data_file=args.load, schema_path=args.schema, workers=args.workers)
+    finally:
+        pool.close()
+
 
-# Close connection
-cursor.close()
-connection.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Managed cx_Oracle session pool for the web tier.
+
+- Acquire waits at most `wait_timeout_ms` for a free session (PoolTimeout)
+  instead of blocking forever when a burst exhausts the pool.
+- Every session gets `callTimeout`, so a runaway generated query is
+  cancelled by the driver (QueryTimeout) and its session is dropped rather
+  than returned to the pool in an unknown state.
+- Statement cache size, cursor arraysize and prefetchrows are set here once
+  instead of at every call site.
+- warm() opens and pings sessions up front and parses known statements into
+  each session's statement cache, so the first requests do neither.
+- A caller that may abandon its work (asgi.py) sets a CallGroup in
+  `current_calls`; sessions handed out in that context are registered there
+  so CallGroup.cancel() interrupts their Oracle calls.
+"""
+import contextvars
+import logging
+import threading
+from contextlib import contextmanager
+
+import cx_Oracle
+
+from metrics import DROPPED_SESSIONS, POOL_ACQUIRE_TIMEOUTS, QUERY_TIMEOUTS, STAGE_SECONDS
+
+# ORA-24457: no free session within the pool's wait timeout
+POOL_TIMEOUT_CODES = {24457}
+# Session killed, not logged on, lost connection, or the call timeout broke the round trip
+BROKEN_SESSION_CODES = {28, 1012, 3113, 3114, 3135, 3156}
+# DPI-1067: call timeout exceeded, DPI-1080: connection closed by a call timeout
+CALL_TIMEOUT_PREFIXES = ("DPI-1067", "DPI-1080")
+
+
+class CallCancelled(Exception):
+    """The request that wanted this session was abandoned before the call started."""
+
+
+class CallGroup:
+    """Sessions in use for one request, so an abandoned request can cancel its Oracle calls."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def add(self, connection):
+        with self._lock:
+            if self.cancelled:
+                raise CallCancelled("The request was abandoned.")
+            self._connections.add(connection)
+
+    def discard(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+
+    def cancel(self):
+        """Interrupt the calls running on this group's sessions (they fail with ORA-01013) and refuse new ones."""
+        with self._lock:
+            self.cancelled = True
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.cancel()
+            except cx_Oracle.DatabaseError as e:
+                logging.warning(f"Could not cancel an abandoned Oracle call: {e}")
+        if connections:
+            logging.info(f"Cancelled Oracle calls on {len(connections)} sessions of an abandoned request")
+
+
+# The CallGroup of the request the current thread is working for, if its caller set one
+current_calls = contextvars.ContextVar("current_calls", default=None)
+
+
+class PoolTimeout(Exception):
+    """No session became free within the pool's wait timeout."""
+
+
+class QueryTimeout(Exception):
+    """An Oracle call ran longer than the call timeout and was cancelled."""
+
+
+def is_call_timeout(error):
+    return error.message.startswith(CALL_TIMEOUT_PREFIXES) or error.code == 3156
+
+
+def is_broken_session(error):
+    return is_call_timeout(error) or error.code in BROKEN_SESSION_CODES
+
+
+class OraclePool:
+    def __init__(
+        self,
+        user,
+        password,
+        dsn,
+        min_sessions=2,
+        max_sessions=10,
+        increment=1,
+        wait_timeout_ms=5000,
+        call_timeout_ms=30000,
+        stmtcachesize=50,
+        arraysize=500,
+        prefetchrows=500,
+        ping_interval=60,
+        idle_timeout=300,
+    ):
+        self.wait_timeout_ms = wait_timeout_ms
+        self.call_timeout_ms = call_timeout_ms
+        self.arraysize = arraysize
+        self.prefetchrows = prefetchrows
+        self.pool = cx_Oracle.SessionPool(
+            user,
+            password,
+            dsn,
+            min=min_sessions,
+            max=max_sessions,
+            increment=increment,
+            threaded=True,
+            getmode=cx_Oracle.SPOOL_ATTRVAL_TIMEDWAIT if wait_timeout_ms > 0 else cx_Oracle.SPOOL_ATTRVAL_WAIT,
+            wait_timeout=wait_timeout_ms,
+            timeout=idle_timeout,
+            stmtcachesize=stmtcachesize,
+            ping_interval=ping_interval,
+        )
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a session, waiting at most the pool's wait timeout; the wait is the pool_acquire stage."""
+        with self._lock:
+            self._waiting += 1
+        try:
+            with STAGE_SECONDS.time(stage="pool_acquire"):
+                connection = self.pool.acquire()
+        except cx_Oracle.DatabaseError as e:
+            error, = e.args
+            if error.code in POOL_TIMEOUT_CODES:
+                POOL_ACQUIRE_TIMEOUTS.inc()
+                raise PoolTimeout(
+                    f"All {self.pool.max} database sessions are busy; gave up after {self.wait_timeout_ms} ms."
+                ) from e
+            raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        connection.callTimeout = self.call_timeout_ms
+        return connection
+
+    def release(self, connection, broken=False):
+        if broken:
+            DROPPED_SESSIONS.inc()
+            try:
+                self.pool.drop(connection)
+            except cx_Oracle.DatabaseError as e:
+                logging.warning(f"Could not drop broken session: {e}")
+        else:
+            self.pool.release(connection)
+
+    def cursor(self, connection):
+        """A cursor with the pool's fetch tuning applied."""
+        cursor = connection.cursor()
+        cursor.arraysize = self.arraysize
+        cursor.prefetchrows = self.prefetchrows
+        return cursor
+
+    @contextmanager
+    def connection(self):
+        """
+        A pooled session for the `with` block. A call that hits the call timeout
+        raises QueryTimeout; sessions left unusable are dropped, not released.
+        """
+        connection = self.acquire()
+        broken = False
+        calls = current_calls.get()
+        try:
+            if calls is not None:
+                calls.add(connection)
+            yield connection
+        except cx_Oracle.DatabaseError as e:
+            error, = e.args
+            broken = is_broken_session(error)
+            if is_call_timeout(error):
+                QUERY_TIMEOUTS.inc()
+                raise QueryTimeout(
+                    f"Query exceeded the {self.call_timeout_ms / 1000:g} second limit and was cancelled."
+                ) from e
+            raise
+        finally:
+            if calls is not None:
+                calls.discard(connection)
+            self.release(connection, broken=broken)
+
+    def warm(self, sessions=None, statements=()):
+        """
+        Open and ping `sessions` sessions (default: the pool minimum) at once and
+        parse `statements` on each, so their cursors are in the statement cache.
+        """
+        sessions = min(sessions or self.pool.min, self.pool.max)
+        connections = []
+        parsed = 0
+        try:
+            for _ in range(sessions):
+                connection = self.pool.acquire()
+                connections.append(connection)
+                connection.ping()
+                cursor = connection.cursor()
+                try:
+                    for statement in statements:
+                        try:
+                            cursor.parse(statement)
+                            parsed += 1
+                        except cx_Oracle.DatabaseError:
+                            pass  # A stale cached query is not worth failing startup for
+                finally:
+                    cursor.close()
+        finally:
+            for connection in connections:
+                self.pool.release(connection)
+        logging.info(f"Warmed {len(connections)} database sessions, {parsed} statements parsed into their caches")
+
+    def session_counts(self):
+        """Occupancy for the POOL_SESSIONS gauge."""
+        return {
+            ("busy",): self.pool.busy,
+            ("open",): self.pool.opened,
+            ("max",): self.pool.max,
+            ("waiting",): self._waiting,
+        }
+
+    def close(self):
+        self.pool.close()
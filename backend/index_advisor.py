@@ -0,0 +1,217 @@
+import argparse
+import cx_Oracle
+import json
+import os
+from collections import Counter, defaultdict
+from dotenv import load_dotenv
+
+from create_db import INDEXES, PRIMARY_KEYS, UNIQUE_KEYS, create_index_query, index_name, indexed_columns
+from query_governor import explain
+from query_log import read_queries
+from sql_validator import KEYWORDS, PSEUDO_COLUMNS, SQLValidationError, _analyze, tokenize, validate_sql
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Database connection details from environment variables
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+DB_SERVICE_NAME = os.getenv("DB_SERVICE_NAME")
+
+# Keywords that switch the clause a column reference belongs to
+CLAUSES = {
+    "WHERE": "predicate", "HAVING": "predicate", "ON": "join",
+    "SELECT": None, "FROM": None, "JOIN": None, "GROUP": None, "ORDER": None, "FETCH": None,
+    "UNION": None, "INTERSECT": None, "MINUS": None, "SET": None, "VALUES": None,
+}
+
+
+def column_references(sql, schema):
+    """
+    (clause, table, column) for every schema column used in a WHERE/HAVING
+    predicate or a JOIN ... ON condition, with table and column in schema spelling.
+    """
+    tokens = tokenize(sql)
+    analysis = _analyze(tokens)
+    schema_columns = {
+        table.lower(): (table, {column.lower(): column for column in details.get("columns", [])})
+        for table, details in schema.items()
+    }
+    sources = [source for source in set(analysis.aliases.values()) if source in schema_columns]
+    references = set()
+    clause = None
+    stack = []
+    for i, (kind, text, _, _) in enumerate(tokens):
+        upper = text.upper()
+        if text == "(":
+            stack.append(clause)
+            continue
+        if text == ")":
+            clause = stack.pop() if stack else None
+            continue
+        if upper in CLAUSES:
+            clause = CLAUSES[upper]
+            continue
+        if clause is None or kind != "ident" or i in analysis.skip:
+            continue
+        lower = text.lower()
+        if upper in KEYWORDS or lower in PSEUDO_COLUMNS or lower in analysis.output_aliases:
+            continue
+        following = tokens[i + 1][1] if i + 1 < len(tokens) else None
+        if following in ("(", "."):
+            continue
+        if i >= 2 and tokens[i - 1][1] == ".":
+            qualifier = tokens[i - 2][1].lower()
+            candidates = [analysis.aliases.get(qualifier, qualifier)]
+        else:
+            candidates = sources
+        matches = [
+            source for source in candidates
+            if source in schema_columns and lower in schema_columns[source][1]
+        ]
+        if len(matches) == 1:
+            table, columns = schema_columns[matches[0]]
+            references.add((clause, table, columns[lower]))
+    return references
+
+
+def mine_query_log(paths, schema):
+    """
+    Count, per (table, column), the distinct logged queries that filter or join on it.
+
+    :return: (Counter of (table, column) -> queries, {(table, column): Counter of clause},
+              {(table, column): Counter of query text}, number of queries read)
+    """
+    usage = Counter()
+    clauses = defaultdict(Counter)
+    examples = defaultdict(Counter)
+    total = 0
+    for query in read_queries(paths):
+        try:
+            query, _ = validate_sql(query, schema, auto_correct=False)
+        except SQLValidationError:
+            continue
+        total += 1
+        seen = set()
+        for clause, table, column in column_references(query, schema):
+            clauses[(table, column)][clause] += 1
+            examples[(table, column)][query] += 1
+            seen.add((table, column))
+        usage.update(seen)
+    return usage, clauses, examples, total
+
+
+# Helper: Columns create_db.py already indexes, for proposals without a database connection
+def declared_indexed_columns():
+    indexed = {(table_name.upper(), column.upper()) for table_name, column in PRIMARY_KEYS.items()}
+    indexed.update((table_name.upper(), column.upper())
+                   for table_name, columns in UNIQUE_KEYS.items() for column in columns)
+    indexed.update((table_name.upper(), column.upper()) for table_name, column in INDEXES)
+    return indexed
+
+
+def propose_indexes(usage, indexed, min_queries=2):
+    return [
+        (table, column, count) for (table, column), count in usage.most_common()
+        if count >= min_queries and (table.upper(), column.upper()) not in indexed
+    ]
+
+
+def evaluate_index(connection, table, column, queries, keep=False):
+    """
+    Build the index INVISIBLE, explain each query without and with it, then
+    make it visible (`keep`) or drop it again.
+
+    :return: list of (query, plan before, plan after)
+    """
+    cursor = connection.cursor()
+    name = index_name(table, column)
+    cursor.execute(create_index_query(table, column) + " INVISIBLE")
+    results = []
+    try:
+        for n, query in enumerate(queries):
+            cursor.execute("ALTER SESSION SET optimizer_use_invisible_indexes = FALSE")
+            before = explain(cursor, query, f"advisor_{n}_before")
+            cursor.execute("ALTER SESSION SET optimizer_use_invisible_indexes = TRUE")
+            after = explain(cursor, query, f"advisor_{n}_after")
+            results.append((query, before, after))
+    finally:
+        cursor.execute("ALTER SESSION SET optimizer_use_invisible_indexes = FALSE")
+        if keep:
+            cursor.execute(f"ALTER INDEX {name} VISIBLE")
+            print(f"Index created successfully: {name}")
+        else:
+            cursor.execute(f"DROP INDEX {name}")
+        cursor.close()
+    return results
+
+
+def print_plan_report(results):
+    for query, (cost_before, rows_before, plan_before), (cost_after, rows_after, plan_after) in results:
+        print(f"  Query: {query}")
+        print(f"    Cost {cost_before} -> {cost_after}, estimated rows {rows_before} -> {rows_after}")
+        if plan_before == plan_after:
+            print("    Plan unchanged")
+            continue
+        print("    Before:")
+        for line in plan_before:
+            print(f"      {line}")
+        print("    After:")
+        for line in plan_after:
+            print(f"      {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Propose indexes for the columns logged generated queries filter and join on."
+    )
+    parser.add_argument("logs", nargs="+", help="QUERY_LOG_PATH JSONL files or server log output")
+    parser.add_argument("--schema", default="schema.json")
+    parser.add_argument("--min-queries", type=int, default=2,
+                        help="Distinct logged queries that must use a column before it is proposed")
+    parser.add_argument("--samples", type=int, default=3, help="Most frequent queries explained per proposal")
+    parser.add_argument("--explain", action="store_true",
+                        help="Compare EXPLAIN PLAN with and without each proposed index (built INVISIBLE, then dropped)")
+    parser.add_argument("--create", action="store_true", help="Keep the proposed indexes (implies --explain)")
+    args = parser.parse_args()
+
+    with open(args.schema, "r") as f:
+        schema = json.load(f)
+
+    usage, clauses, examples, total = mine_query_log(args.logs, schema)
+    print(f"Read {total} valid generated queries")
+    for (table, column), count in usage.most_common():
+        kinds = ", ".join(f"{clause} x{n}" for clause, n in clauses[(table, column)].most_common())
+        print(f"  {table}.{column}: {count} queries ({kinds})")
+
+    connection = None
+    if args.explain or args.create:
+        # Ensure environment variables are set
+        if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_SERVICE_NAME]):
+            raise ValueError("Missing one or more required environment variables for DB connection.")
+        dsn_tns = cx_Oracle.makedsn(DB_HOST, DB_PORT, service_name=DB_SERVICE_NAME)
+        connection = cx_Oracle.connect(user=DB_USER, password=DB_PASSWORD, dsn=dsn_tns)
+        indexed = indexed_columns(connection.cursor())
+    else:
+        indexed = declared_indexed_columns()
+
+    try:
+        proposals = propose_indexes(usage, indexed, min_queries=args.min_queries)
+        if not proposals:
+            print("No missing indexes for the logged queries")
+            return
+        print("Proposed indexes:")
+        for table, column, count in proposals:
+            print(f"{create_index_query(table, column)};  -- used by {count} queries")
+            if connection is not None:
+                queries = [query for query, _ in examples[(table, column)].most_common(args.samples)]
+                print_plan_report(evaluate_index(connection, table, column, queries, keep=args.create))
+    finally:
+        if connection is not None:
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
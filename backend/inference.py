@@ -0,0 +1,103 @@
+import copy
+import json
+import logging
+import os
+import threading
+
+# torch and transformers are imported on first use so importing format_sql_prompt stays cheap
+INFERENCE_BACKENDS = ("fp32", "int8", "bf16", "onnx")
+
+
+# Helper: Build the model input for a prompt and its schema context
+def format_sql_prompt(prompt, context):
+    return f"Generate Oracle DB query for the prompt based on the prompt and context.{prompt} Context: {json.dumps(context)}"
+
+
+# Helper: Whether this host can run bf16 matmuls natively
+def bf16_supported():
+    import torch
+
+    if torch.cuda.is_available():
+        return torch.cuda.is_bf16_supported()
+    check = getattr(torch.cpu, "_is_avx512_bf16_supported", None)
+    return bool(check and check())
+
+
+class ThreadLocalTokenizer:
+    """
+    A tokenizer that gives every calling thread its own copy.
+
+    A fast tokenizer changes its padding and truncation settings in place on
+    each call, so two threads calling one instance fail with "Already
+    borrowed". The wrapped tokenizer itself is only ever copied.
+    """
+
+    def __init__(self, tokenizer):
+        self._tokenizer = tokenizer
+        self._local = threading.local()
+
+    def _own(self):
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = self._local.tokenizer = copy.deepcopy(self._tokenizer)
+        return tokenizer
+
+    def __call__(self, *args, **kwargs):
+        return self._own()(*args, **kwargs)
+
+    def __len__(self):
+        return len(self._tokenizer)
+
+    def __getattr__(self, name):
+        return getattr(self._own(), name)
+
+
+def _load_onnx(model_path, export_dir):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise RuntimeError("The 'onnx' inference backend needs optimum[onnxruntime] installed.") from e
+
+    export_dir = export_dir or os.path.join(model_path, "onnx")
+    if os.path.exists(os.path.join(export_dir, "config.json")):
+        return ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+    logging.info(f"Exporting {model_path} to ONNX Runtime graph at {export_dir}...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+def load_model(model_path, backend="fp32", onnx_export_dir=None):
+    """
+    Load the T5 model and tokenizer for the selected inference backend.
+
+    - fp32: the plain T5ForConditionalGeneration
+    - int8: Linear layers dynamically quantized to int8
+    - bf16: weights cast to bfloat16, falling back to fp32 on hosts without bf16 support
+    - onnx: exported once to an ONNX Runtime graph and reused from `onnx_export_dir`
+
+    :return: (model, tokenizer)
+    """
+    import torch
+    from transformers import AutoTokenizer, T5ForConditionalGeneration
+
+    backend = (backend or "fp32").lower()
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {INFERENCE_BACKENDS}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    if backend == "onnx":
+        return _load_onnx(model_path, onnx_export_dir), tokenizer
+
+    model = T5ForConditionalGeneration.from_pretrained(model_path)
+    model.eval()
+    if backend == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif backend == "bf16":
+        if bf16_supported():
+            model = model.to(torch.bfloat16)
+        else:
+            logging.warning("bf16 is not supported on this host, using fp32 instead")
+            backend = "fp32"
+    logging.info(f"Loaded model from {model_path} with the {backend} inference backend")
+    return model, tokenizer
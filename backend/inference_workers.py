@@ -0,0 +1,204 @@
+"""
+Inference worker processes that share one copy of the T5 weights.
+
+Run with:  python inference_workers.py --workers 4 --address /tmp/sql-inference.sock
+
+The parent process loads the model once and moves its tensors into shared
+memory, then forks the workers, so every worker decodes from that single copy
+instead of holding its own. Workers accept connections on one local socket
+(multiprocessing.connection) and each runs its own GenerationBatcher; the web
+tier connects with RemoteGenerator by setting INFERENCE_WORKERS_ADDRESS.
+
+multiprocessing.connection unpickles what it receives, so a TCP address is
+only accepted together with INFERENCE_WORKERS_AUTHKEY; a Unix socket is
+created readable by its owner only.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from dotenv import load_dotenv
+
+from batcher import GenerationBatcher
+from inference import INFERENCE_BACKENDS, format_sql_prompt, load_model
+
+# Load environment variables from .env file
+load_dotenv()
+
+MODEL_PATH = os.getenv("MODEL_PATH")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "fp32")
+ONNX_EXPORT_DIR = os.getenv("ONNX_EXPORT_DIR") or None
+GENERATION_MAX_BATCH_SIZE = int(os.getenv("GENERATION_MAX_BATCH_SIZE", "8"))
+GENERATION_MAX_WAIT_MS = float(os.getenv("GENERATION_MAX_WAIT_MS", "10"))
+INFERENCE_WORKERS_AUTHKEY = (os.getenv("INFERENCE_WORKERS_AUTHKEY") or "").encode("utf-8") or None
+
+logging.basicConfig(level=logging.INFO)
+
+
+# Helper: "/path/to.sock" is a Unix socket, "host:port" a TCP address; TCP needs an authkey
+def parse_address(address, authkey=None):
+    if ":" in address and "/" not in address:
+        if not authkey:
+            raise ValueError(
+                f"Refusing TCP address {address} without INFERENCE_WORKERS_AUTHKEY: anyone who can reach "
+                "the port could run code in the workers. Set the authkey or use a Unix socket path."
+            )
+        host, port = address.rsplit(":", 1)
+        return host, int(port)
+    return address
+
+
+class RemoteGenerator:
+    """
+    Web-tier client for the inference workers.
+
+    Keeps up to `max_connections` open connections; each call borrows one, so
+    that many generations can be in flight at once and the workers batch them.
+    """
+
+    def __init__(self, address, authkey=None, max_connections=8, timeout=120):
+        self.address = parse_address(address, authkey)
+        self.authkey = authkey
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def _connect(self):
+        return Client(self.address, authkey=self.authkey)
+
+    def generate(self, input_text):
+        """Send one input text to a worker and return its decoded output."""
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                connection.send(("generate", input_text))
+                if not connection.poll(self.timeout):
+                    raise TimeoutError(f"No answer from inference worker after {self.timeout}s")
+                status, payload = connection.recv()
+            except BaseException:
+                connection.close()  # Never reuse a connection in an unknown state
+                raise
+            self._idle.put(connection)
+        if status != "ok":
+            raise RuntimeError(f"Inference worker failed: {payload}")
+        return payload
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def serve_connection(connection, batcher):
+    try:
+        while True:
+            command, input_text = connection.recv()
+            if command != "generate":
+                connection.send(("error", f"Unknown command {command!r}"))
+                continue
+            try:
+                connection.send(("ok", batcher.generate(input_text)))
+            except Exception as e:
+                connection.send(("error", str(e)))
+    except (EOFError, OSError):
+        pass  # Client went away
+    finally:
+        connection.close()
+
+
+def worker_main(listener, model, tokenizer, threads, max_batch_size, max_wait_ms):
+    import torch
+    from transformers import StoppingCriteriaList
+    from speculative import StatementComplete
+
+    torch.set_num_threads(threads)
+    stopping = StoppingCriteriaList([StatementComplete(tokenizer)])
+    batcher = GenerationBatcher(
+        model, tokenizer, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, stopping_criteria=stopping
+    )
+    # Warm up before taking connections so no client pays for kernel initialization
+    batcher.generate(format_sql_prompt("List all vessels", {}))
+    logging.info(f"Inference worker {os.getpid()} ready with {threads} torch threads")
+    while True:
+        try:
+            connection = listener.accept()
+        except (OSError, multiprocessing.AuthenticationError) as e:
+            logging.warning(f"Rejected inference connection: {e}")
+            continue
+        threading.Thread(target=serve_connection, args=(connection, batcher), daemon=True).start()
+
+
+def load_shared_model(model_path, backend, onnx_export_dir=None):
+    """Load the model once in the parent with its tensors in shared memory."""
+    model, tokenizer = load_model(model_path, backend, onnx_export_dir=onnx_export_dir)
+    if backend == "onnx":
+        # ONNX Runtime sessions keep their weights outside torch; forked workers only share them copy-on-write
+        logging.warning("The onnx backend cannot move its weights to shared memory")
+    else:
+        model.share_memory()
+    return model, tokenizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve T5 generation from worker processes sharing one model.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--address", default=os.getenv("INFERENCE_WORKERS_ADDRESS", "/tmp/sql-inference.sock"))
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, choices=INFERENCE_BACKENDS)
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Torch threads per worker; defaults to the CPU count split across workers")
+    args = parser.parse_args()
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    address = parse_address(args.address, INFERENCE_WORKERS_AUTHKEY)
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)  # Stale socket from an earlier run
+
+    # Nothing may run inference in the parent before forking, or the workers can inherit a locked thread pool
+    model, tokenizer = load_shared_model(args.model_path, args.backend, ONNX_EXPORT_DIR)
+    previous_umask = os.umask(0o077) if isinstance(address, str) else None
+    try:
+        listener = Listener(address, authkey=INFERENCE_WORKERS_AUTHKEY, backlog=64)
+    finally:
+        if previous_umask is not None:
+            os.umask(previous_umask)
+    context = multiprocessing.get_context("fork")
+
+    def start_worker():
+        process = context.Process(
+            target=worker_main,
+            args=(listener, model, tokenizer, threads, GENERATION_MAX_BATCH_SIZE, GENERATION_MAX_WAIT_MS),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    workers = [start_worker() for _ in range(args.workers)]
+    logging.info(f"Started {args.workers} inference workers on {args.address}")
+    try:
+        while True:
+            time.sleep(1)
+            for i, process in enumerate(workers):
+                if not process.is_alive():
+                    logging.error(f"Inference worker {process.pid} exited with {process.exitcode}, restarting")
+                    workers[i] = start_worker()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in workers:
+            process.terminate()
+        listener.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Histograms, gauges and counters register themselves on creation and
+`render_metrics()` produces the body for a scrape of /metrics.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a fast schema-linking call up to a slow generate or Oracle query
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, label_values, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, label_values, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down. `function` makes it computed at scrape
+    time instead; it returns a number, or a {label values tuple: number} dict
+    for a labelled gauge.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        self.function = function
+
+    def _samples(self):
+        if self.function is not None:
+            try:
+                values = self.function()
+            except Exception:
+                return []  # The source is not available yet, e.g. during startup
+            if not isinstance(values, dict):
+                values = {(): values}
+            return [("", key, (), value) for key, value in sorted(values.items())]
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the `with` block."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", key, (("le", _format_value(float(bound))),), cumulative))
+            samples.append(("_sum", key, (), total))
+            samples.append(("_count", key, (), count))
+        return samples
+
+
+def render_metrics():
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Pipeline metrics shared by server.py, asgi.py, batcher.py, speculative.py, db_pool.py, query_governor.py
+# and prompt_index.py
+STAGE_SECONDS = Histogram(
+    "text2sql_stage_seconds",
+    "Latency of each pipeline stage: schema_linking, prompt_index, tokenization, generate, governor, pool_acquire, "
+    "execute, fetch, rendering_detection, description, serialization, compression.",
+    ["stage"],
+)
+GENERATED_TOKENS = Histogram(
+    "text2sql_generated_tokens",
+    "Tokens generated per SQL query by the in-process model.",
+    buckets=(8, 16, 32, 64, 128, 256, 512),
+)
+REQUEST_SECONDS = Histogram("text2sql_request_seconds", "End-to-end request latency per endpoint.", ["endpoint"])
+REQUESTS_IN_FLIGHT = Gauge("text2sql_requests_in_flight", "Requests currently being handled.")
+POOL_SESSIONS = Gauge("text2sql_pool_sessions", "Oracle session pool occupancy: busy, open and max sessions, and threads waiting to acquire one.", ["state"])
+POOL_ACQUIRE_TIMEOUTS = Counter(
+    "text2sql_pool_acquire_timeouts_total", "Session acquires that gave up after the pool wait timeout."
+)
+QUERY_TIMEOUTS = Counter("text2sql_query_timeouts_total", "Oracle calls cancelled by the call timeout.")
+DROPPED_SESSIONS = Counter("text2sql_pool_dropped_sessions_total", "Sessions dropped from the pool as unusable.")
+GOVERNOR_DECISIONS = Counter(
+    "text2sql_governor_decisions_total",
+    "Query governor outcomes: passed, capped (endpoint row cap), limited (plan over limits) or rejected.",
+    ["action"],
+)
+PROMPT_INDEX_LOOKUPS = Counter(
+    "text2sql_prompt_index_lookups_total",
+    "Prompt cache misses looked up in the semantic prompt index: hit (stored SQL reused) or miss (decoded).",
+    ["result"],
+)
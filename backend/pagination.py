@@ -0,0 +1,162 @@
+import base64
+import hashlib
+import hmac
+import json
+
+from create_db import PRIMARY_KEYS
+from sql_validator import tokenize
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+# Helper: Encode page state as an opaque, signed cursor token
+def encode_cursor(state, secret):
+    payload = json.dumps(state, separators=(",", ":"), default=str).encode("utf-8")
+    signature = hmac.new(secret, payload, hashlib.sha256).digest()
+    return f"{_b64encode(payload)}.{_b64encode(signature)}"
+
+
+# Helper: Decode and verify a cursor token produced by encode_cursor
+def decode_cursor(token, secret):
+    try:
+        payload_part, signature_part = token.split(".", 1)
+        payload = _b64decode(payload_part)
+        signature = _b64decode(signature_part)
+    except (AttributeError, ValueError) as e:
+        raise InvalidCursor("Malformed cursor.") from e
+    expected = hmac.new(secret, payload, hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected):
+        raise InvalidCursor("Cursor signature does not match.")
+    try:
+        return json.loads(payload)
+    except ValueError as e:
+        raise InvalidCursor("Malformed cursor.") from e
+
+
+# Top-level words that make ID unusable as a keyset: several rows per ID, or an order/limit of the query's own
+KEYSET_BLOCKERS = {
+    "JOIN", "GROUP", "HAVING", "ORDER", "DISTINCT", "UNIQUE", "UNION", "INTERSECT", "MINUS", "FETCH", "OFFSET",
+    "CONNECT", "WITH", "FOR",
+}
+
+
+# Helper: (index, upper-case text) of the tokens outside any parentheses
+def _top_level(tokens):
+    depth = 0
+    for i, (_, text, _, _) in enumerate(tokens):
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif depth == 0:
+            yield i, text.upper()
+
+
+# Helper: Split a select list's tokens on its top-level commas
+def _select_items(tokens):
+    items, item, depth = [], [], 0
+    for token in tokens:
+        if token[1] == "(":
+            depth += 1
+        elif token[1] == ")":
+            depth -= 1
+        if token[1] == "," and depth == 0:
+            items.append(item)
+            item = []
+        else:
+            item.append(token)
+    items.append(item)
+    return items
+
+
+def keyset_column(query, columns):
+    """
+    The qualified primary key ("alias.id") to page a query on, or None.
+
+    Keyset paging on ID is only exact when the query reads a single table
+    whose primary key is id, returns that id as its ID column and imposes no
+    order, grouping or row limit of its own; anything else pages by OFFSET.
+    """
+    if "ID" not in columns:
+        return None
+    tokens = tokenize(query)
+    top = list(_top_level(tokens))
+    words = [text for _, text in top]
+    if not words or words[0] != "SELECT" or words.count("FROM") != 1 or KEYSET_BLOCKERS & set(words):
+        return None
+    select_end = next(i for i, text in top if text == "FROM")
+    # FROM table [alias] [WHERE ...]: no comma list, subquery or partition clause
+    table_ref = tokens[select_end + 1:]
+    where = next((n for n, token in enumerate(table_ref) if token[1].upper() == "WHERE"), len(table_ref))
+    table_ref = table_ref[:where]
+    if not 1 <= len(table_ref) <= 2 or any(token[0] != "ident" for token in table_ref):
+        return None
+    table = table_ref[0][1].lower()
+    if PRIMARY_KEYS.get(table, "").lower() != "id":
+        return None
+    qualifier = table_ref[-1][1]
+    names = {table, qualifier.lower()}
+    # The ID column must be the table's id, not another expression aliased to it
+    for item in _select_items(tokens[1:select_end]):
+        texts = [token[1].lower() for token in item]
+        if texts in (["*"], ["id"]) or (len(texts) == 3 and texts[0] in names and texts[1:] in ([".", "*"], [".", "id"])):
+            continue
+        if texts and texts[-1] == "id":
+            return None
+    return f"{qualifier}.id"
+
+
+def page_query(query, page_size, offset=0, last_id=None, keyset=None, column_count=0, row_cap=None):
+    """
+    Add paging to a generated SELECT so Oracle returns a single page.
+
+    Keyset pages (`keyset` from keyset_column) filter and order on the
+    primary key. Other queries page by OFFSET, ordered by every column of
+    the select list after any ORDER BY of their own, so a page always holds
+    the same rows. The query is extended rather than wrapped, so select
+    lists with duplicate column names (joins) keep working.
+
+    One row more than `page_size` is requested so the caller can tell
+    whether another page exists without a separate COUNT. With `row_cap`
+    (the governor's limit for paged results) no page reads past that many
+    rows in total, so the last page simply has no next one.
+
+    :return: (paged_sql, bind_variables)
+    """
+    page_rows = page_size + 1
+    if row_cap is not None:
+        page_rows = max(0, min(page_rows, int(row_cap) - offset))
+    binds = {"page_rows": page_rows}
+    tokens = tokenize(query)
+    top = dict(_top_level(tokens))
+    if keyset:
+        if last_id is not None:
+            binds["last_id"] = last_id
+            where = next((i for i, text in top.items() if text == "WHERE"), None)
+            if where is None:
+                query = f"{query} WHERE {keyset} > :last_id"
+            else:
+                condition = query[tokens[where][3]:]
+                query = f"{query[:tokens[where][2]]}WHERE ({condition.strip()}) AND {keyset} > :last_id"
+        return f"{query} ORDER BY {keyset} FETCH FIRST :page_rows ROWS ONLY", binds
+
+    binds["page_offset"] = offset
+    order = ", ".join(str(position) for position in range(1, column_count + 1))
+    if {"FETCH", "OFFSET"} & set(top.values()):
+        # The query limits its own rows: page within that result
+        query = f"SELECT * FROM ({query}) page_q"
+        if order:
+            query += f" ORDER BY {order}"
+    elif order:
+        query += f", {order}" if "ORDER" in top.values() else f" ORDER BY {order}"
+    return f"{query} OFFSET :page_offset ROWS FETCH NEXT :page_rows ROWS ONLY", binds
@@ -0,0 +1,184 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+# Quoted values are kept verbatim when normalizing a prompt: 'Active' and 'active' may select different rows
+QUOTED_VALUE = re.compile(r"('[^']*'|\"[^\"]*\")")
+
+
+# Helper: Normalize a prompt so trivially different phrasings share a cache entry
+def normalize_prompt(prompt):
+    parts = QUOTED_VALUE.split(prompt)
+    # split() with a group puts the quoted values at the odd positions
+    prompt = "".join(part if i % 2 else re.sub(r"\s+", " ", part.lower()) for i, part in enumerate(parts)).strip()
+    return prompt.rstrip(" ?.!;")
+
+
+# Helper: Stable hash of the schema context sent to the model
+def context_hash(context):
+    return hashlib.sha256(json.dumps(context, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    """
+    Prompt-to-SQL cache in front of the model.
+
+    Entries are keyed on the normalized prompt plus a hash of the schema
+    context, evicted LRU once `max_entries` is reached and expired after
+    `ttl_seconds`. When `path` is set the cache is loaded from that JSON file
+    and written back at most every `save_seconds` (and at exit) so it survives
+    restarts without a file write per request. Identical requests arriving
+    while a generation is already running wait for that result instead of
+    starting their own.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, path=None, save_seconds=30):
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self.path = path
+        self.save_seconds = float(save_seconds)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, generated_query)
+        self._in_flight = {}  # key -> Future
+        self.hits = 0
+        self.misses = 0
+        if self.path:
+            self._load()
+            atexit.register(self.save)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(prompt, context):
+        return f"{normalize_prompt(prompt)}|{context_hash(context)}"
+
+    def get(self, key):
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        self._maybe_save()
+
+    def values(self):
+        """Cached generated queries that have not expired yet."""
+        now = time.time()
+        with self._lock:
+            return [value for expires_at, value in self._entries.values() if expires_at >= now]
+
+    def invalidate(self, prompt, context):
+        """Drop the entry for a prompt, e.g. after its SQL failed to execute."""
+        with self._lock:
+            removed = self._entries.pop(self.make_key(prompt, context), None)
+            if removed is not None:
+                self._dirty = True
+        if removed is not None:
+            self._maybe_save()
+
+    def get_or_generate(self, prompt, context, generate):
+        """
+        Return the cached SQL for (prompt, context) or call `generate()` once.
+
+        :param generate: Zero-argument callable producing the generated SQL
+        """
+        if not self.enabled:
+            return generate()
+
+        key = self.make_key(prompt, context)
+        with self._lock:
+            cached = self._get_locked(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            logging.info("Waiting for in-flight generation of an identical prompt")
+            return future.result()
+
+        try:
+            value = generate()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not load prompt cache from {self.path}: {e}")
+            return
+        now = time.time()
+        for key, expires_at, value in stored:
+            if expires_at >= now:
+                self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        logging.info(f"Loaded {len(self._entries)} prompt cache entries from {self.path}")
+
+    def _maybe_save(self):
+        if self.path and time.monotonic() - self._saved_at >= self.save_seconds:
+            self.save()
+
+    def save(self):
+        """Write the cache to `path` if it changed since the last save."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                stored = [[key, expires_at, value] for key, (expires_at, value) in self._entries.items()]
+                self._dirty = False
+                self._saved_at = time.monotonic()
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(stored, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.error(f"Could not persist prompt cache to {self.path}: {e}")
@@ -0,0 +1,316 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import inflect
+import numpy as np
+
+from metrics import PROMPT_INDEX_LOOKUPS, STAGE_SECONDS
+from prompt_cache import context_hash, normalize_prompt
+
+# Numbers and quoted values in a prompt; a paraphrase must mention exactly the same ones
+PROMPT_LITERAL = re.compile(r"'[^']*'|\"[^\"]*\"|\b\d+(?:[.,]\d+)*\b")
+PROMPT_TOKEN = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:[.,]\d+)*|[a-z][a-z0-9_]*")
+# Words that select the opposite rows or measure when a paraphrase drops or flips them; the embedding barely
+# tells them apart
+POLARITY_WORDS = {
+    "not", "no", "non", "without", "never", "none", "nor", "except", "excluding", "exclude", "other",
+    "active", "inactive", "enabled", "disabled", "open", "closed", "paid", "unpaid", "available", "unavailable",
+    "occupied", "vacant", "empty", "full", "complete", "incomplete", "completed", "pending", "valid", "invalid",
+    "assigned", "unassigned", "used", "unused", "scheduled", "unscheduled", "approved", "rejected", "docked",
+    "undocked", "profit", "loss", "positive", "negative", "income", "expense", "revenue", "cost",
+}
+# Words that pick which end of an order, which side of a bound, which period or which aggregate
+COMPARISON_WORDS = {
+    "highest", "lowest", "most", "least", "max", "min", "maximum", "minimum", "top", "bottom", "largest",
+    "smallest", "biggest", "greatest", "fewest", "best", "worst", "more", "less", "fewer", "greater", "higher",
+    "lower", "larger", "smaller", "first", "last", "latest", "earliest", "newest", "oldest", "recent",
+    "ascending", "descending", "increasing", "decreasing", "before", "after", "since", "until", "previous",
+    "next", "average", "total", "count", "sum",
+}
+# Prepositions that only compare in front of a number: "under 100", but not "under maintenance"
+NUMERIC_COMPARISON_WORDS = {"above", "below", "over", "under", "exceeding", "beyond", "within", "between"}
+inflect_engine = inflect.engine()
+
+
+# Helper: The literals of a prompt as a sorted, hashable key
+def prompt_literals(prompt):
+    return "|".join(sorted(literal.lower() for literal in PROMPT_LITERAL.findall(prompt)))
+
+
+def prompt_terms(prompt):
+    """
+    Literals plus the polarity and comparison words of a prompt, singularized, as one key. Only prompts with
+    equal keys may share SQL; other wording ("show cradles under maintenance", "which cradles are in
+    maintenance") is left to the embedding.
+    """
+    text = re.sub(r"\bcannot\b", "can not", re.sub(r"n't\b", " not", prompt.lower()))
+    tokens = PROMPT_TOKEN.findall(text)
+    guards = set()
+    for i, token in enumerate(tokens):
+        word = token
+        if word not in POLARITY_WORDS and word not in COMPARISON_WORDS and word not in NUMERIC_COMPARISON_WORDS:
+            word = inflect_engine.singular_noun(word) or word
+        if word in POLARITY_WORDS or word in COMPARISON_WORDS:
+            guards.add(word)
+        elif word in NUMERIC_COMPARISON_WORDS and i + 1 < len(tokens) and tokens[i + 1][0].isdigit():
+            guards.add(word)
+    return prompt_literals(prompt) + "#" + " ".join(sorted(guards))
+
+
+class T5PromptEncoder:
+    """Unit-length prompt embeddings: the T5 encoder's last hidden state, mean-pooled over the prompt tokens."""
+
+    def __init__(self, model, tokenizer, fingerprint, max_length=128):
+        self.model = model
+        # Lookups and adds come from several threads: pass an inference.ThreadLocalTokenizer
+        self.tokenizer = tokenizer
+        # Stored with the index; a different model means the stored vectors have to be recomputed
+        self.fingerprint = fingerprint
+        self.max_length = max_length
+        self._encoder = model.get_encoder() if hasattr(model, "get_encoder") else model.encoder
+
+    def __call__(self, prompts):
+        import torch
+
+        inputs = self.tokenizer(
+            [normalize_prompt(prompt) for prompt in prompts],
+            return_tensors="pt",
+            padding=True,
+            max_length=self.max_length,
+            truncation=True,
+        )
+        with torch.inference_mode():
+            hidden = self._encoder(input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"])[0]
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        vectors = pooled.float().cpu().numpy()
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class PromptIndex:
+    """
+    Embedding index of prompts whose generated SQL executed successfully.
+
+    A new prompt is embedded once and compared with every stored prompt for
+    the same schema context in one matrix-vector product; the best match at
+    or above `threshold` that mentions the same numbers, quoted values,
+    negation/polarity and comparison words (prompt_terms) gives its SQL back
+    without decoding. The encoder was trained for text-to-SQL, not
+    similarity, so it can score "active" and "inactive" or "highest" and
+    "lowest" prompts as near duplicates; the term check keeps those apart
+    while the embedding matches the rest of the wording.
+
+    The default `threshold` of 0.95 is not calibrated. To set it, take
+    prompt pairs from the query log labeled same/different SQL, compute
+    their similarity with the encoder and pick the lowest value with no
+    different-SQL pair above it. Vectors live in one preallocated
+    float32 matrix that grows by doubling, so adding a prompt is an append.
+
+    When `path` is set the index is saved there (an .npz file) at most every
+    `save_seconds` and loaded at startup; prompts stored without a vector, or
+    with vectors from a different encoder, are embedded by rebuild() in
+    batches instead of re-embedding everything.
+    """
+
+    def __init__(self, encoder, threshold=0.95, max_entries=10000, path=None, save_seconds=60):
+        self.encoder = encoder
+        self.threshold = float(threshold)
+        self.max_entries = int(max_entries)
+        self.path = path
+        self.save_seconds = float(save_seconds)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._entries = []  # [key, normalized prompt, context hash, prompt_terms, generated_query]
+        self._positions = {}  # key -> row in _entries and _vectors
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._context_ids = np.zeros(0, dtype=np.int32)  # Row -> id of its context hash in _context_keys
+        self._context_keys = {}
+        self._pending = []  # entries loaded without a usable vector, embedded by rebuild()
+        # Vectors of recent lookups, so recording a prompt that just missed does not embed it again
+        self._recent = OrderedDict()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        if self.path:
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(prompt, context_key):
+        return f"{normalize_prompt(prompt)}|{context_key}"
+
+    def _embed(self, prompt):
+        key = normalize_prompt(prompt)
+        with self._lock:
+            vector = self._recent.get(key)
+        if vector is None:
+            vector = self.encoder([prompt])[0]
+            with self._lock:
+                self._recent[key] = vector
+                while len(self._recent) > 256:
+                    self._recent.popitem(last=False)
+        return vector
+
+    def lookup(self, prompt, context):
+        """The SQL of the most similar stored prompt for this context, or None below the threshold."""
+        if not self._entries:
+            PROMPT_INDEX_LOOKUPS.inc(result="miss")
+            return None
+        with STAGE_SECONDS.time(stage="prompt_index"):
+            vector = self._embed(prompt)
+            context_key = context_hash(context)
+            terms = prompt_terms(prompt)
+            match = None
+            with self._lock:
+                context_id = self._context_keys.get(context_key)
+                if context_id is not None:
+                    count = len(self._entries)
+                    scores = self._vectors[:count] @ vector
+                    scores[self._context_ids[:count] != context_id] = -1.0
+                    candidates = np.flatnonzero(scores >= self.threshold)
+                    for row in candidates[np.argsort(-scores[candidates])]:
+                        entry = self._entries[row]
+                        if entry[3] == terms:
+                            match = (entry[1], entry[4], float(scores[row]))
+                            break
+        if match is None:
+            PROMPT_INDEX_LOOKUPS.inc(result="miss")
+            return None
+        PROMPT_INDEX_LOOKUPS.inc(result="hit")
+        logging.info(f"Reusing the SQL of similar prompt {match[0]!r} (similarity {match[2]:.3f}) for {prompt!r}")
+        return match[1]
+
+    def add(self, prompt, context, generated_query):
+        """Index a prompt whose SQL executed successfully, replacing any earlier SQL for it."""
+        if not generated_query:
+            return
+        vector = self._embed(prompt)
+        context_key = context_hash(context)
+        key = self.make_key(prompt, context_key)
+        entry = [key, normalize_prompt(prompt), context_key, prompt_terms(prompt), generated_query]
+        with self._lock:
+            self._put_locked(entry, vector)
+        self._maybe_save()
+
+    def _put_locked(self, entry, vector):
+        position = self._positions.get(entry[0])
+        if position is not None:
+            self._entries[position] = entry
+            self._vectors[position] = vector
+            self._dirty = True
+            return
+        if len(self._entries) >= self.max_entries:
+            self._remove_locked(0)  # Oldest first
+        if not self._entries and self._vectors.shape[1] != len(vector):
+            self._vectors = np.zeros((0, len(vector)), dtype=np.float32)
+        count = len(self._entries)
+        if count == self._vectors.shape[0]:
+            capacity = max(64, 2 * count)
+            grown = np.zeros((capacity, len(vector)), dtype=np.float32)
+            grown[:count] = self._vectors[:count]
+            self._vectors = grown
+            self._context_ids = np.resize(self._context_ids, capacity)
+        self._vectors[count] = vector
+        self._context_ids[count] = self._context_keys.setdefault(entry[2], len(self._context_keys))
+        self._entries.append(entry)
+        self._positions[entry[0]] = count
+        self._dirty = True
+
+    def _remove_locked(self, position):
+        count = len(self._entries)
+        self._vectors[position:count - 1] = self._vectors[position + 1:count]
+        self._context_ids[position:count - 1] = self._context_ids[position + 1:count]
+        del self._entries[position]
+        self._positions = {entry[0]: row for row, entry in enumerate(self._entries)}
+        self._dirty = True
+
+    def discard(self, generated_query):
+        """Drop every prompt stored with this SQL, e.g. after it failed to execute."""
+        with self._lock:
+            rows = [row for row, entry in enumerate(self._entries) if entry[4] == generated_query]
+            for row in reversed(rows):
+                self._remove_locked(row)
+        if rows:
+            self._maybe_save()
+
+    def rebuild(self, records=(), batch_size=32):
+        """
+        Embed the loaded entries that have no usable vector, plus any
+        (prompt, context, generated_query) `records` not indexed yet, in batches.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+        for prompt, context, generated_query in records:
+            context_key = context_hash(context)
+            key = self.make_key(prompt, context_key)
+            if key not in self._positions:
+                pending.append([key, normalize_prompt(prompt), context_key, prompt_terms(prompt), generated_query])
+        if not pending:
+            return 0
+        start_time = time.time()
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            vectors = self.encoder([entry[1] for entry in batch])
+            with self._lock:
+                for entry, vector in zip(batch, vectors):
+                    if entry[0] not in self._positions:
+                        self._put_locked(entry, vector)
+        logging.info(f"Embedded {len(pending)} prompts into the prompt index in {time.time() - start_time:.2f} seconds")
+        self.save()
+        return len(pending)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as stored:
+                entries = json.loads(str(stored["entries"]))
+                vectors = stored["vectors"]
+                fingerprint = str(stored["fingerprint"])
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Could not load prompt index from {self.path}: {e}")
+            return
+        entries = entries[-self.max_entries:]
+        for entry in entries:
+            entry[3] = prompt_terms(entry[1])  # Indexes saved before the content-word check stored literals only
+        vectors = vectors[-len(entries):] if entries else vectors[:0]
+        if fingerprint != self.encoder.fingerprint or len(vectors) != len(entries):
+            logging.info(f"Prompt index at {self.path} was built with another encoder; re-embedding its prompts")
+            self._pending = entries
+            return
+        for entry, vector in zip(entries, vectors):
+            self._put_locked(entry, vector)
+        self._dirty = False
+        logging.info(f"Loaded {len(self._entries)} prompt index entries from {self.path}")
+
+    def _maybe_save(self):
+        if self.path and time.monotonic() - self._saved_at >= self.save_seconds:
+            self.save()
+
+    def save(self):
+        """Write the index to `path` if it changed since the last save."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = list(self._entries)
+                vectors = self._vectors[:len(entries)].copy()
+                self._dirty = False
+                self._saved_at = time.monotonic()
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    np.savez(f, entries=np.array(json.dumps(entries)), vectors=vectors,
+                             fingerprint=np.array(self.encoder.fingerprint))
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.error(f"Could not persist prompt index to {self.path}: {e}")
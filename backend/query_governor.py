@@ -0,0 +1,215 @@
+"""
+EXPLAIN PLAN based governor for generated SQL.
+
+Before a generated statement runs, its plan is explained and checked
+against a cost and an estimated-cardinality limit:
+
+- SELECTs always end in FETCH FIRST <row cap> ROWS ONLY for the endpoint
+  that runs them, unless they already fetch fewer rows. The clause is added
+  to the statement itself: wrapping it in SELECT * FROM (...) would fail
+  with ORA-00918 for joins whose select list repeats a column name. Paged
+  endpoints run "source_sql" and apply the cap in pagination.page_query.
+- "limit" mode: a SELECT whose plan is still over a limit is rewritten with
+  the tighter `limit_rows` cap and explained again; if it is still over, or
+  it is not a SELECT, it is rejected.
+- "reject" mode: anything over a limit is rejected.
+- "off": no EXPLAIN, only the row caps.
+
+Decisions are cached per SQL text for `cache_ttl_seconds`, so a repeated
+query does not pay the EXPLAIN round trips every time. Only Oracle errors
+that mean the statement cannot be planned become (cached) rejections; call
+timeouts, lost sessions and other transient errors propagate unchanged, so
+OraclePool.connection() drops the session and the request can be retried.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import cx_Oracle
+
+from db_pool import is_broken_session
+from metrics import GOVERNOR_DECISIONS
+from sql_validator import SQLValidationError, tokenize
+
+GOVERNOR_MODES = ("limit", "reject", "off")
+# Errors that mean the statement itself cannot be planned: ORA-009xx parse and semantic errors, invalid
+# qualified names, CONNECT BY/GROUP BY/set operator mistakes, misplaced analytic functions
+PLAN_ERROR_CODES = set(range(900, 1000)) | {1747, 1788, 1789, 1791, 30483}
+
+_statement_ids = itertools.count()
+
+
+class QueryRejected(SQLValidationError):
+    """The generated statement's plan is over the governor's limits, or Oracle cannot explain it."""
+
+
+def read_plan(cursor, statement_id):
+    """Plan cost, cardinality and operation lines of an explained statement, removed from plan_table."""
+    cursor.execute(
+        """
+        SELECT id, LPAD(' ', 2 * depth) || operation || NVL2(options, ' ' || options, '')
+               || NVL2(object_name, ' ' || object_name, ''), cost, cardinality
+        FROM plan_table
+        WHERE statement_id = :statement_id
+        ORDER BY id
+        """,
+        statement_id=statement_id,
+    )
+    rows = cursor.fetchall()
+    cursor.execute("DELETE FROM plan_table WHERE statement_id = :statement_id", statement_id=statement_id)
+    cost = rows[0][2] if rows else None
+    cardinality = rows[0][3] if rows else None
+    return cost, cardinality, [row[1] for row in rows]
+
+
+def explain(cursor, sql, statement_id):
+    """Plan cost, cardinality and operation lines for `sql` from EXPLAIN PLAN."""
+    cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {sql}")
+    return read_plan(cursor, statement_id)
+
+
+# Helper: (tokens, index of the top-level FETCH or None, n of a plain FETCH FIRST/NEXT n ROWS ONLY or None)
+def _fetch_clause(sql):
+    tokens = tokenize(sql)
+    depth = 0
+    for i, (kind, text, _, _) in enumerate(tokens):
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif depth == 0 and text.upper() == "FETCH":
+            clause = tokens[i + 1:i + 5]
+            words = [token[1].upper() for token in clause]
+            if (len(clause) == 4 and words[0] in ("FIRST", "NEXT") and clause[1][0] == "number"
+                    and words[2] in ("ROW", "ROWS") and words[3] == "ONLY"):
+                return tokens, i, int(float(clause[1][1]))
+            return tokens, i, None
+    return tokens, None, None
+
+
+# Helper: n of a top-level FETCH FIRST/NEXT n ROWS ONLY, or None
+def existing_row_limit(sql):
+    return _fetch_clause(sql)[2]
+
+
+# Helper: The SELECT with Oracle stopping after `row_cap` rows
+def limit_rows(sql, row_cap):
+    sql = sql.strip().rstrip(";").rstrip()
+    tokens, fetch, existing = _fetch_clause(sql)
+    if fetch is None:
+        return f"{sql} FETCH FIRST {int(row_cap)} ROWS ONLY"
+    if existing is not None:
+        count = tokens[fetch + 2]
+        return f"{sql[:count[2]]}{min(existing, int(row_cap))}{sql[count[3]:]}"
+    # PERCENT, WITH TIES or a bind variable: only a wrapper can cap those
+    return f"SELECT * FROM ({sql}) governed_q FETCH FIRST {int(row_cap)} ROWS ONLY"
+
+
+def is_select(sql):
+    tokens = tokenize(sql)
+    return bool(tokens) and tokens[0][1].upper() in ("SELECT", "WITH")
+
+
+class QueryGovernor:
+    def __init__(self, mode="limit", max_cost=100000, max_cardinality=1000000, limit_rows=1000,
+                 cache_size=1024, cache_ttl_seconds=300):
+        if mode not in GOVERNOR_MODES:
+            raise ValueError(f"Unknown governor mode {mode!r}; expected one of {', '.join(GOVERNOR_MODES)}")
+        self.mode = mode
+        self.max_cost = max_cost
+        self.max_cardinality = max_cardinality
+        self.limit_rows = limit_rows
+        self.cache_size = cache_size
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _over_limits(self, cost, cardinality):
+        reasons = []
+        if self.max_cost and cost is not None and cost > self.max_cost:
+            reasons.append(f"cost {cost} > {self.max_cost}")
+        if self.max_cardinality and cardinality is not None and cardinality > self.max_cardinality:
+            reasons.append(f"estimated rows {cardinality} > {self.max_cardinality}")
+        return reasons
+
+    def _explain(self, pool, sql):
+        statement_id = f"governor_{next(_statement_ids)}"
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                try:
+                    cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {sql}")
+                except cx_Oracle.DatabaseError as e:
+                    error, = e.args
+                    if error.code not in PLAN_ERROR_CODES or is_broken_session(error):
+                        raise  # Transient: the pool sorts out timeouts and dead sessions
+                    raise QueryRejected(f"Database error: {error.message}") from e
+                cost, cardinality, _ = read_plan(cursor, statement_id)
+                connection.commit()  # plan_table rows are session-private; nothing else is pending
+            finally:
+                cursor.close()
+        return cost, cardinality
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.cache_ttl_seconds:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _store(self, key, decision):
+        with self._lock:
+            self._cache[key] = (time.monotonic(), decision)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def review(self, pool, sql, row_cap=None):
+        """
+        Decide how `sql` may run, explaining it on a session from `pool`.
+
+        :return: {"sql": statement to execute, "source_sql": `sql` as reviewed, without the cap,
+                  "cost", "cardinality", "row_limit": injected cap or None,
+                  "action": "passed", "capped" or "limited"}
+        :raises QueryRejected: when the plan is over the limits and cannot be limited
+        """
+        key = (sql, row_cap)
+        decision = self._cached(key)
+        if decision is None:
+            try:
+                decision = self._review(pool, sql, row_cap)
+            except QueryRejected as e:
+                decision = e
+            self._store(key, decision)
+        if isinstance(decision, QueryRejected):
+            GOVERNOR_DECISIONS.inc(action="rejected")
+            raise decision
+        GOVERNOR_DECISIONS.inc(action=decision["action"])
+        return dict(decision)
+
+    def _review(self, pool, sql, row_cap):
+        select = is_select(sql)
+        governed, row_limit, action = sql, None, "passed"
+        if select and row_cap:
+            existing = existing_row_limit(sql)
+            if existing is None or existing > row_cap:
+                governed, row_limit, action = limit_rows(sql, row_cap), row_cap, "capped"
+        if self.mode == "off":
+            return {"sql": governed, "source_sql": sql, "cost": None, "cardinality": None, "row_limit": row_limit,
+                    "action": action}
+
+        cost, cardinality = self._explain(pool, governed)
+        reasons = self._over_limits(cost, cardinality)
+        if reasons and self.mode == "limit" and select and (row_limit is None or row_limit > self.limit_rows):
+            governed, row_limit, action = limit_rows(sql, self.limit_rows), self.limit_rows, "limited"
+            cost, cardinality = self._explain(pool, governed)
+            reasons = self._over_limits(cost, cardinality)
+        if reasons:
+            raise QueryRejected(f"Query plan is over the execution limits ({'; '.join(reasons)}).")
+        return {"sql": governed, "source_sql": sql, "cost": cost, "cardinality": cardinality, "row_limit": row_limit,
+                "action": action}
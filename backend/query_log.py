@@ -0,0 +1,64 @@
+import json
+import os
+import re
+import threading
+import time
+
+# Line format of the server's own logging output, for logs written before QUERY_LOG_PATH existed
+LOGGED_QUERY = re.compile(r"Generated SQL query: (.+)$")
+
+
+class QueryLog:
+    """Append-only JSONL log of generated queries that executed successfully."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, prompt, generated_query, seconds=None, plan_cost=None):
+        record = {"time": time.time(), "prompt": prompt, "generated_query": generated_query}
+        if seconds is not None:
+            record["seconds"] = round(seconds, 4)
+        if plan_cost is not None:
+            record["plan_cost"] = plan_cost
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+def read_queries(paths):
+    """Yield generated_query text from JSONL query logs or plain server logs."""
+    for path in paths:
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    try:
+                        query = json.loads(line).get("generated_query")
+                    except ValueError:
+                        query = None
+                    if query:
+                        yield query
+                    continue
+                match = LOGGED_QUERY.search(line)
+                if match:
+                    yield match.group(1).strip()
+
+
+def read_prompts(path):
+    """Yield (prompt, generated_query) pairs from a JSONL query log."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        for line in f:
+            if not line.startswith("{"):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("prompt") and record.get("generated_query"):
+                yield record["prompt"], record["generated_query"]
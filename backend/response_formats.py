@@ -0,0 +1,186 @@
+"""
+Content negotiation for /generate-and-execute responses.
+
+The format comes from the request body's "format" field or the Accept header:
+
+- application/json: the response as it has always been, rows as lists
+- application/vnd.text2sql.columnar+json: execution_result holds one array
+  per column ("values") instead of one array per row
+- application/vnd.apache.arrow.stream: execution_result as an Arrow IPC
+  stream, with the rest of the response as JSON in the schema metadata
+  (needs pyarrow)
+
+JSON is encoded with orjson when it is installed. Bodies over
+RESPONSE_COMPRESSION_MIN_BYTES are compressed with brotli (when installed)
+or gzip, following Accept-Encoding.
+"""
+import datetime
+import decimal
+import gzip
+import json
+import os
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from metrics import STAGE_SECONDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Smaller bodies are sent uncompressed; compressing them costs more than it saves
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+# 1 (fastest) to 9 (smallest)
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+# 0 (fastest) to 11 (smallest)
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.text2sql.columnar+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# Values accepted in the request body's "format" field
+FORMAT_NAMES = {"json": JSON, "columnar": COLUMNAR_JSON, "arrow": ARROW_STREAM}
+
+
+def available_formats():
+    formats = [JSON, COLUMNAR_JSON]
+    if pyarrow is not None:
+        formats.append(ARROW_STREAM)
+    return formats
+
+
+def available_encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_format(accept_header, requested=None):
+    """
+    The media type to answer with. An explicit `requested` format name wins;
+    otherwise the best Accept match, falling back to plain JSON.
+    """
+    formats = available_formats()
+    if requested:
+        media_type = FORMAT_NAMES.get(str(requested).lower())
+        if media_type is None or media_type not in formats:
+            raise ValueError(f"Unsupported response format {requested!r}; available: "
+                             f"{', '.join(name for name, value in FORMAT_NAMES.items() if value in formats)}")
+        return media_type
+    accept = parse_accept_header(accept_header or "", MIMEAccept)
+    # An explicit */* or missing header keeps plain JSON, so existing clients see no change
+    if not accept or accept.best in ("*/*", "application/*"):
+        return JSON
+    return accept.best_match(formats, default=JSON)
+
+
+def negotiate_encoding(accept_encoding):
+    """"br", "gzip" or None for the request's Accept-Encoding header."""
+    accept = parse_accept_header(accept_encoding or "")
+    return accept.best_match(available_encodings())
+
+
+# Helper: Values the JSON encoders cannot write natively
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def dumps(payload):
+    """JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+# Helper: {"columns", "rows", ...} -> {"columns", "values", ...} with one list per column
+def to_columnar(execution_result):
+    if "rows" not in execution_result:
+        return execution_result  # Non-SELECT statements only carry a message
+    columns = execution_result.get("columns", [])
+    rows = execution_result["rows"]
+    columnar = {key: value for key, value in execution_result.items() if key != "rows"}
+    columnar["values"] = [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]
+    return columnar
+
+
+def _arrow_array(values):
+    try:
+        return pyarrow.array(values)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        # Mixed Python types in one column: send it as text rather than fail the response
+        return pyarrow.array([None if value is None else str(value) for value in values], type=pyarrow.string())
+
+
+def to_arrow(response):
+    """Arrow IPC stream bytes for the response's execution_result."""
+    execution_result = response.get("execution_result", {})
+    columnar = to_columnar(execution_result)
+    columns = columnar.get("columns", [])
+    metadata = {key: value for key, value in response.items() if key != "execution_result"}
+    metadata["execution_result"] = {key: value for key, value in columnar.items() if key != "values"}
+    table = pyarrow.table(
+        [_arrow_array(values) for values in columnar.get("values", [])],
+        names=columns,
+        metadata={b"response": dumps(metadata)},
+    )
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(response, media_type):
+    if media_type == ARROW_STREAM:
+        return to_arrow(response)
+    if media_type == COLUMNAR_JSON and "execution_result" in response:
+        response = dict(response, execution_result=to_columnar(response["execution_result"]))
+    elif media_type == COLUMNAR_JSON and "results" in response:
+        # Batch responses: each successful result is converted, per-prompt errors are left as they are
+        response = dict(response, results=[
+            dict(result, execution_result=to_columnar(result["execution_result"]))
+            if "execution_result" in result else result
+            for result in response["results"]
+        ])
+    return dumps(response)
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+    return body
+
+
+def render(response, media_type=JSON, accept_encoding=None):
+    """
+    Encode `response` as `media_type` (from negotiate_format), compressed per Accept-Encoding.
+
+    :return: (body bytes, list of (header, value) pairs)
+    """
+    with STAGE_SECONDS.time(stage="serialization"):
+        body = encode(response, media_type)
+    headers = [("Content-Type", media_type), ("Vary", "Accept, Accept-Encoding")]
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= RESPONSE_COMPRESSION_MIN_BYTES else None
+    if encoding:
+        with STAGE_SECONDS.time(stage="compression"):
+            body = compress(body, encoding)
+        headers.append(("Content-Encoding", encoding))
+    return body, headers
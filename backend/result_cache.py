@@ -0,0 +1,161 @@
+import logging
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# String literals are kept verbatim when normalizing SQL text
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+READ_TABLE = re.compile(r"\b(?:from|join)\s+([a-z_][\w$#]*(?:\.[a-z_][\w$#]*)?)", re.IGNORECASE)
+FROM_LIST = re.compile(
+    r"\bfrom\s+(.+?)(?:\bwhere\b|\bgroup\b|\border\b|\bhaving\b|\bjoin\b|\bunion\b|\bfetch\b|\boffset\b|\)|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+WRITE_TABLE = re.compile(
+    r"^\s*(?:insert\s+into|update|delete\s+from|delete|merge\s+into|truncate\s+table|drop\s+table|alter\s+table)"
+    r"\s+([a-z_][\w$#]*(?:\.[a-z_][\w$#]*)?)",
+    re.IGNORECASE,
+)
+
+
+# Helper: Collapse whitespace and case outside string literals so equivalent SQL shares a key
+def normalize_sql(query):
+    query = query.strip().rstrip(";").strip()
+    parts = []
+    last = 0
+    for literal in STRING_LITERAL.finditer(query):
+        parts.append(re.sub(r"\s+", " ", query[last:literal.start()]).lower())
+        parts.append(literal.group(0))
+        last = literal.end()
+    parts.append(re.sub(r"\s+", " ", query[last:]).lower())
+    return "".join(parts)
+
+
+def _table_name(name):
+    return name.split(".")[-1].lower()
+
+
+# Helper: Tables a SELECT reads, including comma-separated FROM lists
+def tables_read(query):
+    query = STRING_LITERAL.sub("''", query)
+    tables = {_table_name(name) for name in READ_TABLE.findall(query)}
+    for from_list in FROM_LIST.findall(query):
+        for item in from_list.split(","):
+            words = item.split()
+            if words and re.match(r"^[a-z_][\w$#.]*$", words[0], re.IGNORECASE):
+                tables.add(_table_name(words[0]))
+    return tables
+
+
+# Helper: Table a DML/DDL statement writes, or None if it cannot be determined
+def table_written(query):
+    match = WRITE_TABLE.match(STRING_LITERAL.sub("''", query))
+    return _table_name(match.group(1)) if match else None
+
+
+def _estimate_size(result):
+    size = sys.getsizeof(result["rows"])
+    for row in result["rows"]:
+        size += sys.getsizeof(row)
+        for value in row:
+            size += sys.getsizeof(value)
+    return size
+
+
+# Helper: A new container for a result; column_types is kept so a hit renders exactly like the miss did
+def _copy_result(result):
+    copy = {"columns": list(result["columns"]), "rows": result["rows"]}
+    if "column_types" in result:
+        copy["column_types"] = list(result["column_types"])
+    return copy
+
+
+class ResultCache:
+    """
+    Table-aware cache for SELECT results.
+
+    Entries are keyed on normalized SQL text and remember which tables the
+    query reads. Writes through the same execution path invalidate every
+    entry that reads the written table. Entries expire after `ttl_seconds`
+    and the least recently used ones are evicted to stay under `max_bytes`.
+    """
+
+    def __init__(self, ttl_seconds=30, max_bytes=64 * 1024 * 1024):
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, size, tables, result)
+        self._by_table = {}  # table -> set of keys
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, query):
+        key = normalize_sql(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry[3]
+        # Callers reshape the result dict, so hand out a copy of the container
+        return _copy_result(result)
+
+    def put(self, query, result):
+        key = normalize_sql(query)
+        size = _estimate_size(result)
+        if size > self.max_bytes:
+            return
+        tables = tables_read(key)
+        entry = (time.time() + self.ttl_seconds, size, tables, _copy_result(result))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.current_bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while self.current_bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_for(self, query):
+        """Drop entries reading the table written by a non-SELECT statement."""
+        table = table_written(query)
+        with self._lock:
+            if table is None:
+                # Unknown write target: be safe and drop everything
+                keys = list(self._entries)
+            else:
+                keys = list(self._by_table.get(table, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        if keys:
+            logging.info(f"Result cache invalidated {len(keys)} entries for table {table or '*'}")
+
+    def _remove(self, key):
+        _, size, tables, _ = self._entries.pop(key)
+        self.current_bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,158 @@
+import re
+from datetime import datetime
+
+from metrics import STAGE_SECONDS
+
+# "DD Mon YYYY", the display format for DATE and TIMESTAMP columns
+DATE_FORMAT = "%d %b %Y"
+
+
+def format_if_date(value):
+    if value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.strftime("%d %b %Y")  # Format as "DD Mon YYYY"
+    
+    # If the value is a string, try to parse it
+    try:
+        dt = datetime.strptime(value, "%a, %d %b %Y %H:%M:%S %Z")
+        return dt.strftime("%d %b %Y")
+    except ValueError:
+        return value  # Return the original value if parsing fails
+
+
+# Helper: Drop ID and UPDATEDAT columns, returning the kept names and their positions
+def filter_display_columns(columns):
+    # Identify ID columns and "UPDATEDAT"
+    id_columns = {col for col in columns if re.search(r'\bID\b', col, re.IGNORECASE)}
+    columns_to_remove = id_columns | {"UPDATEDAT"}  # Remove both ID columns and UPDATEDAT
+
+    filtered_columns = [col for col in columns if col not in columns_to_remove]
+    filtered_indexes = [i for i, col in enumerate(columns) if col not in columns_to_remove]
+    return filtered_columns, filtered_indexes
+
+# Helper: "date", "number" or "string" for a cursor.description type code
+def column_kind(type_code):
+    name = (getattr(type_code, "name", None) or getattr(type_code, "__name__", "") or "").upper()
+    if "DATE" in name or "TIMESTAMP" in name:
+        return "date"
+    if "NUMBER" in name or "BINARY_" in name or "INTEGER" in name or "FLOAT" in name:
+        return "number"
+    return "string"
+
+
+# Helper: Pick graph/text/table from the kinds of the displayed columns and the row count
+def classify_column_types(column_types, row_count):
+    number_count = sum(1 for kind in column_types if kind == "number")
+    string_count = len(column_types) - number_count
+
+    # Apply conditions to determine rendering type
+    if string_count == 1 and number_count >= 1:
+        return "graph"
+    elif len(column_types) <= 1 and row_count <= 1:
+        return "text"
+    return "table"
+
+
+# Helper: Pick graph/text/table from the (already filtered) first row and the row count
+def classify_rendering_type(filtered_columns, first_row, row_count):
+    # Determine column types from the first row; assume all rows have the same structure
+    column_types = ["number" if isinstance(value, (int, float)) else "string" for value in first_row]
+    return classify_column_types(column_types, row_count)
+
+
+class ResultShape:
+    """
+    Display plan for a result set, worked out once from cursor.description.
+
+    Keeps the columns filter_display_columns keeps and records their kinds.
+    `rowfactory` is meant for cursor.rowfactory: it drops the other columns and
+    formats DATE/TIMESTAMP values as rows are fetched, so no cell is sniffed
+    and no row is copied afterwards. It is None when there is nothing to do.
+    """
+
+    def __init__(self, description):
+        names = [column[0] for column in description]
+        self.columns, self.indexes = filter_display_columns(names)
+        self.column_types = [column_kind(description[i][1]) for i in self.indexes]
+        self.rowfactory = self._make_rowfactory(len(names))
+
+    def _make_rowfactory(self, width):
+        indexes = self.indexes
+        dates = [kind == "date" for kind in self.column_types]
+        if not any(dates):
+            if len(indexes) == width:
+                return None
+
+            def rowfactory(*values):
+                return [values[i] for i in indexes]
+            return rowfactory
+
+        plan = list(zip(indexes, dates))
+
+        def rowfactory(*values):
+            return [
+                values[i].strftime(DATE_FORMAT) if is_date and values[i] is not None else values[i]
+                for i, is_date in plan
+            ]
+        return rowfactory
+
+    def shape_rows(self, rows):
+        """Apply the row factory to rows that were fetched without it."""
+        if self.rowfactory is None:
+            return rows
+        rowfactory = self.rowfactory
+        return [rowfactory(*row) for row in rows]
+
+    def result(self, rows):
+        return {"columns": self.columns, "rows": rows, "column_types": self.column_types}
+
+def determine_rendering_type(response):
+    with STAGE_SECONDS.time(stage="rendering_detection"):
+        return _determine_rendering_type(response)
+
+
+def _determine_rendering_type(response):
+    """
+    Determines the rendering type based on the structure of execution results after removing ID and UPDATEDAT columns.
+
+    Conditions:
+    - If there is one string column and the rest are numeric -> "graph"
+    - If there are 2 or fewer total columns -> "text"
+    - Otherwise -> "table"
+
+    :param response: Dictionary containing execution results
+    :return: Updated dictionary with rendering_type
+    """
+    execution_result = response.get("execution_result", {})
+    columns = execution_result.get("columns", [])
+    rows = execution_result.get("rows", [])
+
+    if not columns or not rows:
+        response["rendering_type"] = "text"  # Default fallback if data is empty
+        return response
+
+    if "column_types" in execution_result:
+        # Shaped while fetching (ResultShape): already filtered and formatted, with known column types
+        response["type"] = classify_column_types(execution_result["column_types"], len(rows))
+        return response
+
+    # Filter columns and corresponding row values
+    filtered_columns, filtered_indexes = filter_display_columns(columns)
+    filtered_rows = [[format_if_date(row[i]) for i in filtered_indexes] for row in rows]
+
+    # Check if we have any valid columns left
+    if not filtered_columns:
+        response["rendering_type"] = "text"
+        return response
+
+    rendering_type = classify_rendering_type(filtered_columns, filtered_rows[0], len(filtered_rows))
+
+    # Update response with filtered data and rendering type
+    response["execution_result"]["columns"] = filtered_columns
+    response["execution_result"]["rows"] = filtered_rows
+    response["type"] = rendering_type
+
+    return response
@@ -0,0 +1,385 @@
+"""
+Monthly rollup of financials joined to assets, and routing of generated
+aggregate queries to it.
+
+financials_monthly holds one row per asset and month with the sum of every
+additive financials column (same column names), the row count and the
+asset's name and type. A refresh recomputes only the months from the
+rollup_watermarks recordDate onwards and MERGEs them in, so it touches a few
+rows instead of the whole table. Rows backdated into an earlier month are
+picked up by a full refresh:  python rollups.py --full
+
+rewrite_for_rollup() rewrites a generated SELECT to read the rollup when the
+answer is the same at month grain: SUM/AVG/COUNT of financials grouped or
+filtered by asset and by month-or-coarser expressions of recordDate.
+Anything else (row-level filters on measures, constants inside SUM/AVG,
+day-level dates, MIN/MAX, DISTINCT, subqueries, outer joins that can leave
+financials empty) is left alone.
+"""
+import argparse
+import datetime
+import logging
+import os
+import re
+import threading
+import time
+
+import cx_Oracle
+from dotenv import load_dotenv
+
+from create_db import TABLES
+from sql_validator import KEYWORDS, _analyze, _at, _is_ident, _matching_paren, _text, tokenize
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Database connection details from environment variables
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+DB_SERVICE_NAME = os.getenv("DB_SERVICE_NAME")
+
+ROLLUP_TABLE = "financials_monthly"
+WATERMARK_TABLE = "rollup_watermarks"
+
+# Additive financials columns; the rollup keeps their monthly sums under the same names
+MEASURES = [
+    "dockingFees", "onDockingFees", "undockingFees", "maintenanceFees", "otherServiceFees", "totalRevenue",
+    "laborCosts", "dockOperationCosts", "equipmentCosts", "administrativeCosts", "totalExpenses", "netProfitLoss",
+]
+
+ROLLUP_COLUMNS = [
+    "assetId VARCHAR2(100)",
+    "assetName VARCHAR2(100)",
+    "assetType VARCHAR2(100)",
+    "recordMonth DATE NOT NULL",
+    "recordCount NUMBER NOT NULL",
+] + [f"{measure} NUMBER DEFAULT 0 NOT NULL" for measure in MEASURES]
+
+CREATE_STATEMENTS = [
+    f"CREATE TABLE {ROLLUP_TABLE} (\n    " + ",\n    ".join(ROLLUP_COLUMNS) + "\n)",
+    # Also the MERGE lookup; a NULL assetId still makes (NULL, month) unique
+    f"CREATE UNIQUE INDEX uxFinancialsMonthlyAssetMonth ON {ROLLUP_TABLE}(assetId, recordMonth)",
+    f"""CREATE TABLE {WATERMARK_TABLE} (
+    rollupName VARCHAR2(100) NOT NULL,
+    lastRecordDate DATE,
+    refreshedAt TIMESTAMP,
+    CONSTRAINT pkRollupWatermarks PRIMARY KEY (rollupName)
+)""",
+]
+
+MERGE_ROLLUP = f"""
+MERGE INTO {ROLLUP_TABLE} r
+USING (
+    SELECT f.assetId, a.name AS assetName, a.assetType, TRUNC(f.recordDate, 'MM') AS recordMonth,
+           COUNT(*) AS recordCount, {", ".join(f"SUM(f.{measure}) AS {measure}" for measure in MEASURES)}
+    FROM financials f
+    LEFT JOIN assets a ON a.id = f.assetId
+    WHERE f.recordDate >= :since
+    GROUP BY f.assetId, a.name, a.assetType, TRUNC(f.recordDate, 'MM')
+) s
+ON (r.recordMonth = s.recordMonth AND DECODE(r.assetId, s.assetId, 1, 0) = 1)
+WHEN MATCHED THEN UPDATE SET
+    r.assetName = s.assetName, r.assetType = s.assetType, r.recordCount = s.recordCount,
+    {", ".join(f"r.{measure} = s.{measure}" for measure in MEASURES)}
+WHEN NOT MATCHED THEN INSERT (assetId, assetName, assetType, recordMonth, recordCount, {", ".join(MEASURES)})
+VALUES (s.assetId, s.assetName, s.assetType, s.recordMonth, s.recordCount, {", ".join(f"s.{measure}" for measure in MEASURES)})
+"""
+
+# Months that were recomputed but no longer have any financials rows
+DELETE_EMPTY_MONTHS = f"""
+DELETE FROM {ROLLUP_TABLE} r
+WHERE r.recordMonth >= :since
+  AND NOT EXISTS (
+    SELECT 1 FROM financials f
+    WHERE f.recordDate >= r.recordMonth AND f.recordDate < ADD_MONTHS(r.recordMonth, 1)
+      AND DECODE(f.assetId, r.assetId, 1, 0) = 1
+  )
+"""
+
+SAVE_WATERMARK = f"""
+MERGE INTO {WATERMARK_TABLE} w
+USING (SELECT :name AS rollupName, :last_record_date AS lastRecordDate FROM dual) s
+ON (w.rollupName = s.rollupName)
+WHEN MATCHED THEN UPDATE SET w.lastRecordDate = s.lastRecordDate, w.refreshedAt = SYSTIMESTAMP
+WHEN NOT MATCHED THEN INSERT (rollupName, lastRecordDate, refreshedAt)
+VALUES (s.rollupName, s.lastRecordDate, SYSTIMESTAMP)
+"""
+
+# Start of a full refresh, before any recordDate
+EPOCH = datetime.datetime(1900, 1, 1)
+
+
+def column_names(table_name):
+    return [definition.split()[0] for definition in TABLES[table_name]]
+
+
+def ensure_tables(cursor):
+    for statement in CREATE_STATEMENTS:
+        try:
+            cursor.execute(statement)
+        except cx_Oracle.DatabaseError as e:
+            error, = e.args
+            if error.code != 955:  # ORA-00955: name is already used by an existing object
+                raise
+
+
+def refresh_rollup(connection, full=False):
+    """
+    Recompute the rollup from the first day of the watermark's month onwards
+    (everything when `full`) and move the watermark to the newest recordDate.
+
+    :return: (first month recomputed, rows merged)
+    """
+    cursor = connection.cursor()
+    try:
+        since = EPOCH
+        if not full:
+            cursor.execute(f"SELECT lastRecordDate FROM {WATERMARK_TABLE} WHERE rollupName = :name", name=ROLLUP_TABLE)
+            row = cursor.fetchone()
+            if row and row[0] is not None:
+                since = datetime.datetime(row[0].year, row[0].month, 1)
+        cursor.execute(MERGE_ROLLUP, since=since)
+        merged = cursor.rowcount
+        cursor.execute(DELETE_EMPTY_MONTHS, since=since)
+        cursor.execute("SELECT MAX(recordDate) FROM financials")
+        last_record_date = cursor.fetchone()[0]
+        cursor.execute(SAVE_WATERMARK, name=ROLLUP_TABLE, last_record_date=last_record_date)
+        connection.commit()
+    finally:
+        cursor.close()
+    return since, merged
+
+
+class FinancialsRollup:
+    """Keeps the rollup fresh from a background thread and routes queries once it has data."""
+
+    def __init__(self, pool, refresh_seconds=3600):
+        self.pool = pool
+        self.refresh_seconds = refresh_seconds
+        self.refreshed_at = None
+        self._tables_ready = False
+
+    def refresh(self, full=False):
+        start_time = time.time()
+        with self.pool.connection() as connection:
+            if not self._tables_ready:
+                cursor = connection.cursor()
+                try:
+                    ensure_tables(cursor)
+                finally:
+                    cursor.close()
+                self._tables_ready = True
+            since, merged = refresh_rollup(connection, full=full)
+        self.refreshed_at = time.time()
+        logging.info(f"Refreshed {ROLLUP_TABLE} from {since:%Y-%m-%d}: {merged} rows merged "
+                     f"in {time.time() - start_time:.2f} seconds")
+
+    def start(self):
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logging.error(f"Refreshing {ROLLUP_TABLE} failed: {e}")
+                time.sleep(self.refresh_seconds)
+
+        threading.Thread(target=run, name="rollup-refresh", daemon=True).start()
+
+    def route(self, sql):
+        """The rollup version of `sql`, or None when it does not match or the rollup is not built yet."""
+        if self.refreshed_at is None:
+            return None
+        return rewrite_for_rollup(sql)
+
+
+FINANCIALS_COLUMNS = {column.lower() for column in column_names("financials")}
+MEASURE_COLUMNS = {measure.lower() for measure in MEASURES}
+# Date parts that are the same for every day of a month
+MONTH_TRUNC_UNITS = {"'MM'", "'MON'", "'MONTH'", "'RM'", "'Q'", "'YYYY'", "'YYY'", "'YY'", "'Y'", "'YEAR'",
+                     "'SYYYY'", "'IYYY'", "'IY'", "'I'"}
+MONTH_FORMAT = re.compile(r"^'(?:YYYY|YYY|YY|Y|RRRR|RR|MM|MONTH|MON|Q|FM|[-/ .,])+'$", re.IGNORECASE)
+REJECT_WORDS = {"UNION", "INTERSECT", "MINUS", "DISTINCT", "OVER", "CONNECT", "PIVOT", "UNPIVOT", "WITH"}
+
+
+# Helper: (alias or None, column) for "col" or "alias.col" spanning exactly `tokens`, else None
+def _column_ref(tokens):
+    if len(tokens) == 1 and tokens[0][0] == "ident":
+        return None, tokens[0][1].lower()
+    if len(tokens) == 3 and tokens[0][0] == "ident" and tokens[1][1] == "." and tokens[2][0] == "ident":
+        return tokens[0][1].lower(), tokens[2][1].lower()
+    return None
+
+
+def rewrite_for_rollup(sql):
+    """`sql` reading financials_monthly instead of financials, or None when the answer could differ."""
+    tokens = tokenize(sql)
+    if not tokens or tokens[0][1].upper() != "SELECT":
+        return None
+    words = [token[1].upper() for token in tokens]
+    if words.count("SELECT") != 1 or REJECT_WORDS.intersection(words):
+        return None
+    analysis = _analyze(tokens)
+    sources = set(analysis.aliases.values())
+    if "financials" not in sources or not sources <= {"financials", "assets"}:
+        return None
+    tables = [i for i, name in analysis.tables if name.lower() == "financials"]
+    if len(tables) != 1:
+        return None
+    if _financials_outer_joined(tokens, words, tables[0]):
+        return None
+    financial_aliases = {alias for alias, source in analysis.aliases.items() if source == "financials"}
+
+    def financials_column(reference):
+        """Lower-case financials column a (qualifier, column) pair names, or None for another table."""
+        qualifier, column = reference
+        if qualifier is not None:
+            return column if qualifier in financial_aliases else None
+        return column if column in FINANCIALS_COLUMNS else None
+
+    def linear_in_measures(span):
+        """
+        Whether `span` only adds and subtracts measure columns, i.e. sums per month add up. Numbers are
+        refused: a constant would be added once per asset-month instead of once per row.
+        """
+        if not span:
+            return False
+        j = 0
+        while j < len(span):
+            text = span[j][1]
+            if text in ("+", "-", "(", ")"):
+                j += 1
+                continue
+            width = 3 if _text(span, j + 1) == "." else 1
+            reference = _column_ref(span[j:j + width])
+            if reference is None or financials_column(reference) not in MEASURE_COLUMNS:
+                return False
+            j += width
+        return True
+
+    replacements = {}  # (first token, last token) -> replacement text
+    table = tables[0]
+    has_alias = _text(tokens, table + 1) == "AS" or _is_ident(_at(tokens, table + 1))
+    # Without an alias, "financials" stays usable as a qualifier
+    replacements[(table, table)] = ROLLUP_TABLE if has_alias else f"{ROLLUP_TABLE} financials"
+
+    has_aggregate = False
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i][0], tokens[i][1]
+        upper = text.upper()
+        if kind != "ident" or i in analysis.skip:
+            i += 1
+            continue
+        if _text(tokens, i + 1) == "(":
+            end = _matching_paren(tokens, i + 1)
+            inner = tokens[i + 2:end]
+            if upper in ("SUM", "AVG", "COUNT"):
+                has_aggregate = True
+                if any(token[1].upper() in ("SUM", "AVG", "COUNT", "MIN", "MAX") for token in inner):
+                    return None
+                if upper == "SUM" and len(inner) == 1 and inner[0][1] == "1":
+                    # SUM(1) counts rows, but unlike COUNT it is NULL when there are none
+                    replacements[(i, end)] = "SUM(recordCount)"
+                elif upper == "COUNT":
+                    reference = _column_ref(inner)
+                    counts_rows = (len(inner) == 1 and inner[0][1] in ("*", "1")) or (
+                        reference is not None and financials_column(reference) == "id")
+                    if not counts_rows:
+                        return None
+                    # COUNT is 0, not NULL, when no rollup row matches
+                    replacements[(i, end)] = "NVL(SUM(recordCount), 0)"
+                elif not linear_in_measures(inner):
+                    return None
+                elif upper == "AVG":
+                    # Exact because the measures are NOT NULL: every row counts towards the average
+                    argument = sql[inner[0][2]:inner[-1][3]]
+                    replacements[(i, end)] = f"(SUM({argument}) / SUM(recordCount))"
+                i = end + 1
+                continue
+            if upper in ("TRUNC", "EXTRACT", "TO_CHAR"):
+                span = _month_invariant_date(upper, inner)
+                reference = _column_ref(inner[span[0]:span[1] + 1]) if span else None
+                if reference is not None and financials_column(reference) == "recorddate":
+                    column_index = i + 2 + span[1]
+                    replacements[(column_index, column_index)] = "recordMonth"
+                    i = end + 1
+                    continue
+            i += 1  # Any other function: its arguments are checked token by token
+            continue
+        if upper in KEYWORDS or text.lower() in analysis.output_aliases:
+            i += 1
+            continue
+        if _text(tokens, i + 1) == ".":
+            reference = _column_ref(tokens[i:i + 3])
+            width = 3
+        else:
+            reference = (None, text.lower())
+            width = 1
+        column = financials_column(reference) if reference else None
+        if column is not None and column != "assetid":
+            return None  # A financials column outside an aggregate needs the raw rows
+        i += width
+    if not has_aggregate:
+        return None
+
+    for first, last in sorted(replacements, reverse=True):
+        sql = sql[:tokens[first][2]] + replacements[(first, last)] + sql[tokens[last][3]:]
+    return sql
+
+
+# Helper: Whether financials (at token `table`) is the null-supplying side of an outer join, where a
+# missing financials row still counts for COUNT(*) but has no rollup row to sum
+def _financials_outer_joined(tokens, words, table):
+    if "FULL" in words or any(words[j:j + 3] == ["(", "+", ")"] for j in range(len(words) - 2)):
+        return True
+    for j, word in enumerate(words):
+        if word == "RIGHT" and j > table:
+            return True  # Everything before a RIGHT JOIN is null-supplying
+        if word == "LEFT":
+            joined = j + 3 if _text(tokens, j + 1).upper() == "OUTER" else j + 2
+            if joined == table:
+                return True
+    return False
+
+
+# Helper: (first, last) token span in `inner` of the date argument of TRUNC(d, unit),
+# EXTRACT(YEAR|MONTH FROM d) or TO_CHAR(d, format) when the result is constant within a month, else None
+def _month_invariant_date(function, inner):
+    texts = [token[1].upper() for token in inner]
+    if function == "EXTRACT":
+        if len(inner) in (3, 5) and texts[0] in ("YEAR", "MONTH") and texts[1] == "FROM":
+            return 2, len(inner) - 1
+        return None
+    if len(inner) in (3, 5) and texts[-2] == "," and inner[-1][0] == "string":
+        unit = texts[-1]
+        if (function == "TRUNC" and unit in MONTH_TRUNC_UNITS) or (function == "TO_CHAR" and MONTH_FORMAT.match(unit)):
+            return 0, len(inner) - 3
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Refresh the {ROLLUP_TABLE} rollup of financials.")
+    parser.add_argument("--full", action="store_true", help="Recompute every month, not just the ones since the watermark")
+    args = parser.parse_args()
+
+    # Ensure environment variables are set
+    if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_SERVICE_NAME]):
+        raise ValueError("Missing one or more required environment variables for DB connection.")
+
+    logging.basicConfig(level=logging.INFO)
+    dsn_tns = cx_Oracle.makedsn(DB_HOST, DB_PORT, service_name=DB_SERVICE_NAME)
+    connection = cx_Oracle.connect(user=DB_USER, password=DB_PASSWORD, dsn=dsn_tns)
+    try:
+        cursor = connection.cursor()
+        ensure_tables(cursor)
+        cursor.close()
+        since, merged = refresh_rollup(connection, full=args.full)
+        print(f"Refreshed {ROLLUP_TABLE} from {since:%Y-%m-%d}: {merged} rows merged")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import re
+import threading
+
+import inflect
+from rapidfuzz import fuzz, process
+
+# Define stop words to exclude
+STOP_WORDS = {
+    "is", "as", "list", "all", "get", "retrieve", "find", "to", "for",
+    "on", "by", "in", "and", "of", "the", "from", "assigned"
+}
+
+# Minimum fuzzy score for a prompt word to link to a table or column
+MATCH_THRESHOLD = 60
+
+# Inflect engine for plural/singular variations
+inflect_engine = inflect.engine()
+
+
+# Helper: Generate variations for singular/plural forms
+def generate_variations(word):
+    return {word, inflect_engine.singular_noun(word) or word, inflect_engine.plural(word)}
+
+
+# Helper: Traverse relationships to find related tables
+def traverse_relationships(table, schema, relevant_tables):
+    if table not in schema:
+        return
+    foreign_keys = schema[table].get("foreign_keys", {})
+    for related_table in foreign_keys.values():
+        if related_table not in relevant_tables:
+            relevant_tables.add(related_table)
+            traverse_relationships(related_table, schema, relevant_tables)
+
+
+class SchemaIndex:
+    """
+    Schema-linking index over schema.json.
+
+    The table and column variation lists are built once and rebuilt only when
+    the schema file changes on disk, so a request only pays for scoring its
+    prompt words against the prebuilt choices.
+    """
+
+    def __init__(self, path="schema.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._index = ({}, [], [], 0)
+        self.refresh()
+
+    @property
+    def schema(self):
+        return self._index[0]
+
+    def refresh(self):
+        """Reload schema.json and rebuild the index if the file has changed."""
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            if mtime == self._mtime:
+                return False
+            with open(self.path, "r") as f:
+                schema = json.load(f)
+            self._build(schema)
+            self._mtime = mtime
+        logging.info(f"Schema index built for {len(self.schema)} tables from {self.path}")
+        return True
+
+    def _build(self, schema):
+        table_map = {}
+        column_map = {}
+        for table, details in schema.items():
+            for variation in generate_variations(table.lower()):
+                table_map[variation] = table
+            for column in details.get("columns", []):
+                for variation in generate_variations(column.lower()):
+                    column_map[variation] = table
+
+        # Table variations first, column variations after; split marks the boundary.
+        # Swap everything in one go so concurrent readers never see a half-built index.
+        choices = list(table_map.keys()) + list(column_map.keys())
+        targets = list(table_map.values()) + list(column_map.values())
+        self._index = (schema, choices, targets, len(table_map))
+
+    @staticmethod
+    def prompt_words(prompt):
+        return [word for word in re.findall(r'\w+', prompt.lower()) if word not in STOP_WORDS]
+
+    @staticmethod
+    def _best_matches(scores, targets, offset):
+        # Best variation per prompt word, first one wins on ties like extractOne
+        matched = set()
+        if scores.shape[1] == 0:
+            return matched
+        best = scores.argmax(axis=1)
+        for i, j in enumerate(best):
+            if scores[i, j] > MATCH_THRESHOLD:
+                matched.add(targets[offset + j])
+        return matched
+
+    def match_tables(self, prompt):
+        """Return the tables directly linked to the prompt words."""
+        self.refresh()
+        words = self.prompt_words(prompt)
+        _, choices, targets, split = self._index
+        if not words or not choices:
+            return set()
+        # One matrix call scores every prompt word against every table and column variation
+        scores = process.cdist(words, choices, scorer=fuzz.token_set_ratio, workers=1)
+        return (
+            self._best_matches(scores[:, :split], targets, 0)
+            | self._best_matches(scores[:, split:], targets, split)
+        )
+
+    def find_relevant_tables(self, prompt):
+        """Return the linked tables plus every table reachable through foreign keys."""
+        matched_tables = self.match_tables(prompt)
+        schema = self._index[0]
+        relevant_tables = set(matched_tables)
+        for table in matched_tables:
+            traverse_relationships(table, schema, relevant_tables)
+        return relevant_tables
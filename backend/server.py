@@ -1,33 +1,41 @@
 import cx_Oracle
 import json
-from flask import Flask, request, jsonify, send_file
-from transformers import T5ForConditionalGeneration, AutoTokenizer,T5Tokenizer
-from rapidfuzz import fuzz, process
-import inflect
+from flask import Flask, Response, g, request, jsonify, send_file
 import re
 from typing import Dict
+from batcher import GenerationBatcher
+from inference import ThreadLocalTokenizer, format_sql_prompt, load_model
+from sql_validator import SQLValidationError, validate_sql
+from prompt_cache import PromptCache, normalize_prompt
+from result_cache import ResultCache
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_column, page_query
+from query_log import QueryLog, read_prompts
+from db_pool import OraclePool, PoolTimeout, QueryTimeout
+from query_governor import QueryGovernor, is_select
+from rollups import ROLLUP_TABLE, FinancialsRollup
+from response_formats import ARROW_STREAM, dumps, negotiate_format, render
+from result_shaping import ResultShape, classify_column_types, determine_rendering_type
+from metrics import CONTENT_TYPE, POOL_SESSIONS, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, STAGE_SECONDS, render_metrics
 import logging
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
+import threading
 import time
-import torch
-import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 
-def timer_decorator(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        print(f"{func.__name__} took {end_time - start_time} seconds to execute")
-        return result
-    return wrapper
+# Record a function's latency as a pipeline stage in /metrics
+def timer_decorator(stage):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
 # Load environment variables from .env file
 load_dotenv()
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(device,'============')
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
@@ -38,113 +46,445 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_SERVICE_NAME = os.getenv("DB_SERVICE_NAME")
 
+# Session pool: sizes, milliseconds an acquire may wait and a single Oracle call may run (0 = no limit),
+# statement cache, fetch tuning, idle/ping seconds, and sessions opened and pinged at startup (0 = pool min)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_INCREMENT = int(os.getenv("DB_POOL_INCREMENT", "1"))
+DB_POOL_WAIT_TIMEOUT_MS = int(os.getenv("DB_POOL_WAIT_TIMEOUT_MS", "5000"))
+DB_CALL_TIMEOUT_MS = int(os.getenv("DB_CALL_TIMEOUT_MS", "30000"))
+DB_STMT_CACHE_SIZE = int(os.getenv("DB_STMT_CACHE_SIZE", "50"))
+DB_ARRAYSIZE = int(os.getenv("DB_ARRAYSIZE", "500"))
+DB_PREFETCH_ROWS = int(os.getenv("DB_PREFETCH_ROWS", "500"))
+DB_POOL_IDLE_TIMEOUT = int(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+DB_POOL_PING_INTERVAL = int(os.getenv("DB_POOL_PING_INTERVAL", "60"))
+DB_POOL_PREWARM = os.getenv("DB_POOL_PREWARM", "true").lower() in ("1", "true", "yes")
+DB_POOL_PREWARM_SESSIONS = int(os.getenv("DB_POOL_PREWARM_SESSIONS", "0"))
+
 # Model path and CORS origin
 MODEL_PATH =os.getenv("MODEL_PATH")
 CORS_ORIGIN = os.getenv("CORS_ORIGIN")
 print(f"Model Path: {MODEL_PATH}")
 
-# Load schema from a file
-with open("schema.json", "r") as f:
-    schema = json.load(f)
+# Inference backend: fp32, int8 (dynamic quantization), bf16 or onnx (ONNX Runtime graph)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "fp32")
+ONNX_EXPORT_DIR = os.getenv("ONNX_EXPORT_DIR") or None
+
+# Generate through inference_workers.py processes over local IPC instead of loading the model in this process
+INFERENCE_WORKERS_ADDRESS = os.getenv("INFERENCE_WORKERS_ADDRESS") or None
+INFERENCE_WORKERS_CONNECTIONS = int(os.getenv("INFERENCE_WORKERS_CONNECTIONS", "8"))
+
+# Micro-batching for concurrent generation requests
+GENERATION_MAX_BATCH_SIZE = int(os.getenv("GENERATION_MAX_BATCH_SIZE", "8"))
+GENERATION_MAX_WAIT_MS = float(os.getenv("GENERATION_MAX_WAIT_MS", "10"))
+
+# Decoding mode: "batched" (micro-batched greedy) or "speculative" (drafts from earlier successful SQL)
+DECODING_MODE = os.getenv("DECODING_MODE", "batched").lower()
+SPECULATIVE_DRAFT_TOKENS = int(os.getenv("SPECULATIVE_DRAFT_TOKENS", "10"))
+DRAFT_STORE_SIZE = int(os.getenv("DRAFT_STORE_SIZE", "500"))
+
+# Prompt-to-SQL cache; size 0 disables it, an empty path keeps it in memory only, otherwise the file is
+# rewritten at most every PROMPT_CACHE_SAVE_SECONDS
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "1024"))
+PROMPT_CACHE_TTL_SECONDS = float(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600"))
+PROMPT_CACHE_PATH = os.getenv("PROMPT_CACHE_PATH") or None
+PROMPT_CACHE_SAVE_SECONDS = float(os.getenv("PROMPT_CACHE_SAVE_SECONDS", "30"))
+
+# Semantic prompt index (opt-in, off with the default size 0): a prompt cache miss reuses the SQL of a stored
+# paraphrase for the same schema context with the same numbers, quoted values, negation/polarity and comparison
+# words whose T5 encoder embedding is at least PROMPT_INDEX_THRESHOLD cosine-similar. The threshold is
+# uncalibrated (see PromptIndex); an empty path keeps the index in memory only
+PROMPT_INDEX_SIZE = int(os.getenv("PROMPT_INDEX_SIZE", "0"))
+PROMPT_INDEX_THRESHOLD = float(os.getenv("PROMPT_INDEX_THRESHOLD", "0.95"))
+PROMPT_INDEX_PATH = os.getenv("PROMPT_INDEX_PATH") or None
+PROMPT_INDEX_SAVE_SECONDS = float(os.getenv("PROMPT_INDEX_SAVE_SECONDS", "60"))
+
+# Optional SELECT result cache, invalidated by writes through execute_sql_query
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "30"))
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "64"))
+
+# /generate-and-execute/batch: prompts per request, and how many of a batch's queries run at once
+BATCH_MAX_PROMPTS = int(os.getenv("BATCH_MAX_PROMPTS", "32"))
+BATCH_EXECUTE_CONCURRENCY = int(os.getenv("BATCH_EXECUTE_CONCURRENCY", "4"))
+
+# Rows per fetchmany round trip when streaming results as NDJSON
+STREAM_ARRAYSIZE = int(os.getenv("STREAM_ARRAYSIZE", "500"))
+
+# Local SQL validation against schema.json: "correct" fixes near-miss names, "reject" refuses them, "off" skips it
+SQL_VALIDATION_MODE = os.getenv("SQL_VALIDATION_MODE", "correct").lower()
+
+# Server-side pagination; set PAGINATION_SECRET so cursors survive restarts and work across workers
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "5000"))
+PAGINATION_SECRET = (os.getenv("PAGINATION_SECRET") or "").encode("utf-8") or os.urandom(32)
+
+# EXPLAIN PLAN governor: "limit" re-caps SELECTs whose plan is over a limit to GOVERNOR_LIMIT_ROWS and rejects
+# the rest, "reject" rejects anything over a limit, "off" skips EXPLAIN (row caps still apply); 0 disables a limit
+GOVERNOR_MODE = os.getenv("GOVERNOR_MODE", "limit").lower()
+GOVERNOR_MAX_COST = float(os.getenv("GOVERNOR_MAX_COST", "100000"))
+GOVERNOR_MAX_CARDINALITY = float(os.getenv("GOVERNOR_MAX_CARDINALITY", "1000000"))
+GOVERNOR_LIMIT_ROWS = int(os.getenv("GOVERNOR_LIMIT_ROWS", "1000"))
+# Rows a generated SELECT may return, per endpoint (0 = no cap): JSON responses, NDJSON streams, all pages together
+ROW_CAPS = {
+    "json": int(os.getenv("GOVERNOR_ROW_CAP", "5000")),
+    "stream": int(os.getenv("GOVERNOR_STREAM_ROW_CAP", "100000")),
+    "page": int(os.getenv("GOVERNOR_PAGED_ROW_CAP", "100000")),
+}
+
+# Monthly financials rollup (rollups.py), refreshed from recordDate in the background; matching
+# aggregate queries are answered from it once the first refresh has finished
+ROLLUP_ROUTING = os.getenv("ROLLUP_ROUTING", "true").lower() in ("1", "true", "yes")
+ROLLUP_REFRESH_SECONDS = float(os.getenv("ROLLUP_REFRESH_SECONDS", "3600"))
+
+# JSONL log of successfully executed generated queries, mined by index_advisor.py; unset disables it
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH") or None
+
+# Startup: torch thread counts (0 keeps torch's defaults) and a warm-up generate before reporting ready
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+WARMUP_PROMPT = os.getenv("WARMUP_PROMPT", "List all vessels")
+
+prompt_cache = PromptCache(
+    max_entries=PROMPT_CACHE_SIZE,
+    ttl_seconds=PROMPT_CACHE_TTL_SECONDS,
+    path=PROMPT_CACHE_PATH,
+    save_seconds=PROMPT_CACHE_SAVE_SECONDS,
+)
+
+result_cache = ResultCache(
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+) if RESULT_CACHE_ENABLED else None
+
+query_log = QueryLog(QUERY_LOG_PATH) if QUERY_LOG_PATH else None
+
+governor = QueryGovernor(
+    mode=GOVERNOR_MODE,
+    max_cost=GOVERNOR_MAX_COST,
+    max_cardinality=GOVERNOR_MAX_CARDINALITY,
+    limit_rows=GOVERNOR_LIMIT_ROWS,
+)
+
+# Fan-out for /generate-and-execute/batch: generation threads only wait on the batcher, one per batch slot,
+# while each execution thread holds a pooled session
+batch_generate_executor = ThreadPoolExecutor(max_workers=GENERATION_MAX_BATCH_SIZE, thread_name_prefix="batch-generate")
+batch_execute_executor = ThreadPoolExecutor(max_workers=BATCH_EXECUTE_CONCURRENCY, thread_name_prefix="batch-execute")
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": CORS_ORIGIN}})
 
-# Inflect engine for plural/singular variations
-inflect_engine = inflect.engine()
 
-# Define stop words to exclude
-STOP_WORDS = {
-    "is", "as", "list", "all", "get", "retrieve", "find", "to", "for",
-    "on", "by", "in", "and", "of", "the", "from", "assigned"
-}
+# Filled in by startup(); requests other than /ready get a 503 until `ready` is set
+schema_index = None
+pool = None
+model = tokenizer = None
+statement_complete = None
+batcher = None
+draft_store = None
+remote_generator = None
+financials_rollup = None
+prompt_index = None
+ready = threading.Event()
+startup_error = None
+
+
+def create_pool():
+    dsn_tns = cx_Oracle.makedsn(DB_HOST, DB_PORT, service_name=DB_SERVICE_NAME)
+    oracle_pool = OraclePool(
+        DB_USER,
+        DB_PASSWORD,
+        dsn_tns,
+        min_sessions=DB_POOL_MIN,
+        max_sessions=DB_POOL_MAX,
+        increment=DB_POOL_INCREMENT,
+        wait_timeout_ms=DB_POOL_WAIT_TIMEOUT_MS,
+        call_timeout_ms=DB_CALL_TIMEOUT_MS,
+        stmtcachesize=DB_STMT_CACHE_SIZE,
+        arraysize=DB_ARRAYSIZE,
+        prefetchrows=DB_PREFETCH_ROWS,
+        ping_interval=DB_POOL_PING_INTERVAL,
+        idle_timeout=DB_POOL_IDLE_TIMEOUT,
+    )
+    if DB_POOL_PREWARM:
+        # Cached generated queries are the likeliest next statements; parse them into each session's cache
+        statements = [query.strip().rstrip(";") for query in prompt_cache.values()
+                      if is_select(query)]
+        oracle_pool.warm(DB_POOL_PREWARM_SESSIONS or None, statements[:DB_STMT_CACHE_SIZE])
+    return oracle_pool
+
+
+def startup():
+    """
+    Load everything a request needs exactly once, then mark the server ready.
 
-dsn_tns = cx_Oracle.makedsn(DB_HOST, DB_PORT, service_name=DB_SERVICE_NAME)
-pool = cx_Oracle.SessionPool(DB_USER, DB_PASSWORD, dsn_tns, min=2, max=10, increment=1, threaded=True)
-# Load the model and tokenizer
-logging.info("Loading model and tokenizer...")
-model = T5ForConditionalGeneration.from_pretrained(MODEL_PATH)
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-logging.info("Model and tokenizer loaded successfully.")
-
-
-
-
-# Helper: Generate variations for singular/plural forms
-def generate_variations(word):
-    return {word, inflect_engine.singular_noun(word) or word, inflect_engine.plural(word)}
-
-# Helper: Traverse relationships to find related tables
-def traverse_relationships(table, schema, relevant_tables):
-    if table not in schema:
-        return
-    foreign_keys = schema[table].get("foreign_keys", {})
-    for related_table in foreign_keys.values():
-        if related_table not in relevant_tables:
-            relevant_tables.add(related_table)
-            traverse_relationships(related_table, schema, relevant_tables)
-
-# Main logic to find relevant tables
-def find_relevant_tables(prompt, schema):
-    prompt_words = [word for word in re.findall(r'\w+', prompt.lower()) if word not in STOP_WORDS]
-
-    table_map = {}
-    column_map = {}
-    for table, details in schema.items():
-        for variation in generate_variations(table.lower()):
-            table_map[variation] = table
-        for column in details.get("columns", []):
-            for variation in generate_variations(column.lower()):
-                column_map[variation] = table
-
-    matched_tables = set()
-    for word in prompt_words:
-        table_match = process.extractOne(word, table_map.keys(), scorer=fuzz.token_set_ratio)
-        if table_match and table_match[1] > 60:
-            matched_tables.add(table_map[table_match[0]])
-
-        column_match = process.extractOne(word, column_map.keys(), scorer=fuzz.token_set_ratio)
-        if column_match and column_match[1] > 60:
-            matched_tables.add(column_map[column_match[0]])
-
-    relevant_tables = set(matched_tables)
-    for table in matched_tables:
-        traverse_relationships(table, schema, relevant_tables)
-
-    return relevant_tables
-
-
-from datetime import datetime
-
-def format_if_date(value):
-    if value is None:
-        return value
-    if isinstance(value, (int, float)):
-        return value
-    if isinstance(value, datetime):
-        return value.strftime("%d %b %Y")  # Format as "DD Mon YYYY"
-    
-    # If the value is a string, try to parse it
+    The schema index and the session pool are built while the model loads, and
+    a warm-up generate pays for lazy kernel initialization before the first
+    real request does.
+    """
+    global schema_index, pool, model, tokenizer, statement_complete, batcher, draft_store, remote_generator
+    global financials_rollup, prompt_index
+    global DECODING_MODE, startup_error
+    start_time = time.time()
     try:
-        dt = datetime.strptime(value, "%a, %d %b %Y %H:%M:%S %Z")
-        return dt.strftime("%d %b %Y")
-    except ValueError:
-        return value  # Return the original value if parsing fails
+        import torch
+        from transformers import StoppingCriteriaList
+        from schema_index import SchemaIndex
+        from speculative import QueryDraftStore, StatementComplete
+
+        if TORCH_NUM_THREADS > 0:
+            torch.set_num_threads(TORCH_NUM_THREADS)
+        if TORCH_INTEROP_THREADS > 0:
+            torch.set_num_interop_threads(TORCH_INTEROP_THREADS)
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        logging.info(f"Starting up on {device} with {torch.get_num_threads()} torch threads")
+
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup") as executor:
+            schema_future = executor.submit(SchemaIndex, "schema.json")
+            pool_future = executor.submit(create_pool)
+            if INFERENCE_WORKERS_ADDRESS:
+                from transformers import AutoTokenizer
+                from inference_workers import INFERENCE_WORKERS_AUTHKEY, RemoteGenerator
+
+                # The workers hold the weights; this process only needs the tokenizer
+                tokenizer = ThreadLocalTokenizer(AutoTokenizer.from_pretrained(MODEL_PATH))
+                remote_generator = RemoteGenerator(
+                    INFERENCE_WORKERS_ADDRESS,
+                    authkey=INFERENCE_WORKERS_AUTHKEY,
+                    max_connections=INFERENCE_WORKERS_CONNECTIONS,
+                )
+                logging.info(f"Generating through inference workers at {INFERENCE_WORKERS_ADDRESS}")
+            else:
+                # Load the model and tokenizer
+                logging.info("Loading model and tokenizer...")
+                model, tokenizer = load_model(MODEL_PATH, INFERENCE_BACKEND, onnx_export_dir=ONNX_EXPORT_DIR)
+                # The batcher, draft store, speculative decoding, prompt index and descriptions all tokenize,
+                # from different threads
+                tokenizer = ThreadLocalTokenizer(tokenizer)
+                logging.info("Model and tokenizer loaded successfully.")
+            schema_index = schema_future.result()
+            pool = pool_future.result()
+        POOL_SESSIONS.set_function(pool.session_counts)
+        if ROLLUP_ROUTING:
+            financials_rollup = FinancialsRollup(pool, refresh_seconds=ROLLUP_REFRESH_SECONDS)
+            financials_rollup.start()
+
+        if remote_generator is not None:
+            if DECODING_MODE == "speculative":
+                logging.warning("Speculative decoding needs the model in this process, using the inference workers' batched decoding")
+                DECODING_MODE = "batched"
+            if PROMPT_INDEX_SIZE > 0:
+                logging.warning("The prompt index needs the model's encoder in this process, running without it")
+        else:
+            # Generation stops as soon as a complete statement (';') is emitted
+            statement_complete = StatementComplete(tokenizer)
+            batcher = GenerationBatcher(
+                model,
+                tokenizer,
+                max_batch_size=GENERATION_MAX_BATCH_SIZE,
+                max_wait_ms=GENERATION_MAX_WAIT_MS,
+                stopping_criteria=StoppingCriteriaList([statement_complete]),
+            )
+            if DECODING_MODE == "speculative" and INFERENCE_BACKEND == "onnx":
+                logging.warning("Speculative decoding needs a PyTorch model, using batched decoding with the onnx backend")
+                DECODING_MODE = "batched"
+            draft_store = QueryDraftStore(tokenizer, model.config.decoder_start_token_id, max_queries=DRAFT_STORE_SIZE)
+            for cached_query in prompt_cache.values():
+                draft_store.add(cached_query)
+            if PROMPT_INDEX_SIZE > 0:
+                prompt_index = create_prompt_index()
+
+        if STARTUP_WARMUP:
+            warm_up()
+        ready.set()
+        logging.info(f"Server ready after {time.time() - start_time:.1f} seconds")
+        if prompt_index is not None:
+            threading.Thread(target=rebuild_prompt_index, name="prompt-index", daemon=True).start()
+    except Exception as e:
+        startup_error = e
+        logging.exception(f"Startup failed: {e}")
 
-# Helper: Generate SQL query using T5 model
+
+def create_prompt_index():
+    from prompt_index import PromptIndex, T5PromptEncoder
+
+    encoder = T5PromptEncoder(model, tokenizer, fingerprint=f"{MODEL_PATH}|{INFERENCE_BACKEND}")
+    return PromptIndex(
+        encoder,
+        threshold=PROMPT_INDEX_THRESHOLD,
+        max_entries=PROMPT_INDEX_SIZE,
+        path=PROMPT_INDEX_PATH,
+        save_seconds=PROMPT_INDEX_SAVE_SECONDS,
+    )
+
+
+# Helper: Embed loaded entries left without vectors, then backfill prompts from the query log
+def rebuild_prompt_index():
+    def logged():
+        for prompt, generated_query in read_prompts(QUERY_LOG_PATH) if QUERY_LOG_PATH else ():
+            context = {table: schema_index.schema[table] for table in schema_index.find_relevant_tables(prompt)}
+            yield prompt, context, generated_query
+
+    try:
+        prompt_index.rebuild(logged())
+    except Exception as e:
+        logging.error(f"Rebuilding the prompt index failed: {e}")
+
+
+# Helper: One generate through the real decoding path, bypassing the prompt cache
+def warm_up():
+    start_time = time.time()
+    schema = schema_index.schema
+    context = {table: schema[table] for table in schema_index.find_relevant_tables(WARMUP_PROMPT)}
+    generated_query = _generate_sql_query(WARMUP_PROMPT, context)
+    try:
+        validate_generated_query(generated_query)
+    except SQLValidationError:
+        pass  # Only the code path matters here, not the warm-up output
+    logging.info(f"Warm-up generate took {time.time() - start_time:.2f} seconds")
+
+
+@app.before_request
+def require_ready():
+    if not ready.is_set() and request.method != "OPTIONS" and request.endpoint not in ("ready_check", "metrics"):
+        return jsonify({"error": "Server is starting up."}), 503
+
+
+@app.before_request
+def start_request_timer():
+    if request.endpoint != "metrics":
+        g.request_start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+
+@app.teardown_request
+def stop_request_timer(exc=None):
+    start = g.pop("request_start", None)
+    if start is not None:
+        REQUESTS_IN_FLIGHT.dec()
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint or "unknown")
+
+
+# Prometheus scrape endpoint; answers during startup too
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_metrics(), mimetype=CONTENT_TYPE)
+
+
+# Readiness probe: 200 only once the model is loaded and warmed up, the schema index built and the pool open
+@app.route("/ready", methods=["GET"])
+def ready_check():
+    if ready.is_set():
+        return jsonify({"status": "ready"})
+    if startup_error is not None:
+        return jsonify({"status": "failed", "error": str(startup_error)}), 503
+    return jsonify({"status": "starting"}), 503
+
+
+# Main logic to find relevant tables; the index rebuilds itself if schema.json changes
+def find_relevant_tables(prompt):
+    with STAGE_SECONDS.time(stage="schema_linking"):
+        return schema_index.find_relevant_tables(prompt)
+
+
+# Helper: Generate SQL query, reusing cached or in-flight results for the same prompt and context
 def generate_sql_query(prompt: str, context: Dict) -> str:
+    return prompt_cache.get_or_generate(prompt, context, lambda: _reuse_or_generate_sql_query(prompt, context))
+
+# Helper: The SQL of an indexed paraphrase when there is one, otherwise a fresh generate
+def _reuse_or_generate_sql_query(prompt: str, context: Dict) -> str:
+    if prompt_index is not None:
+        generated_query = prompt_index.lookup(prompt, context)
+        if generated_query is not None:
+            return generated_query
+    return _generate_sql_query(prompt, context)
+
+# Helper: Generate SQL query using T5 model
+def _generate_sql_query(prompt: str, context: Dict) -> str:
     logging.info(f"Prompt: {prompt} ")
     logging.info(f"Context: {context}")
-    input_text = f"Generate Oracle DB query for the prompt based on the prompt and context.{prompt} Context: {json.dumps(context)}"
+    input_text = format_sql_prompt(prompt, context)
     print(f"Input text: {input_text}")
-    inputs = tokenizer(input_text, return_tensors="pt", max_length=512, truncation=True)
-    outputs = model.generate(inputs["input_ids"], max_length=512)
-    generated_query = tokenizer.decode(outputs[0], skip_special_tokens=True)
+    with STAGE_SECONDS.time(stage="generate"):
+        if remote_generator is not None:
+            generated_query = remote_generator.generate(input_text)
+        elif DECODING_MODE == "speculative":
+            from speculative import speculative_generate
+
+            generated_query = speculative_generate(
+                model,
+                tokenizer,
+                input_text,
+                draft_store,
+                statement_complete,
+                num_draft_tokens=SPECULATIVE_DRAFT_TOKENS,
+            )
+        else:
+            # Concurrent requests are decoded together by the batcher's worker thread
+            generated_query = batcher.generate(input_text)
     logging.info(f"Generated SQL query: {generated_query}")
     return generated_query.strip()
 
-@timer_decorator
+# Helper: Remember a generated query that executed successfully
+def record_successful_query(prompt, context, generated_query, plan=None):
+    if draft_store is not None:
+        draft_store.add(generated_query)
+    if prompt_index is not None:
+        prompt_index.add(prompt, context, generated_query)
+    if query_log is not None:
+        query_log.append(prompt, generated_query, plan_cost=plan["cost"] if plan else None)
+
+
+# Helper: Forget SQL that failed so neither the prompt cache nor the prompt index hands it out again
+def forget_generated_query(prompt, context, generated_query):
+    prompt_cache.invalidate(prompt, context)
+    if prompt_index is not None:
+        prompt_index.discard(generated_query)
+
+# Helper: Check generated SQL against the schema before a pooled session is spent on it
+def validate_generated_query(generated_query: str) -> str:
+    if SQL_VALIDATION_MODE == "off":
+        return generated_query
+    validated_query, corrections = validate_sql(
+        generated_query,
+        schema_index.schema,
+        auto_correct=SQL_VALIDATION_MODE == "correct",
+    )
+    if corrections:
+        logging.info(f"Corrected generated SQL identifiers: {', '.join(corrections)}")
+    return validated_query
+
+# Helper: The SQL to run for a validated query: its rollup version when one answers it, else itself
+def route_to_rollup(prompt, generated_query):
+    routed = financials_rollup.route(generated_query) if financials_rollup is not None else None
+    if routed is None:
+        return generated_query, None
+    logging.info(f"Answering prompt {prompt!r} from {ROLLUP_TABLE}: {routed}")
+    return routed, ROLLUP_TABLE
+
+# Helper: EXPLAIN the validated SQL and apply the endpoint's row cap; raises QueryRejected (a SQLValidationError)
+@timer_decorator("governor")
+def govern_query(prompt, generated_query, endpoint):
+    try:
+        plan = governor.review(pool, generated_query, ROW_CAPS.get(endpoint))
+    except SQLValidationError as e:
+        logging.warning(f"Governor rejected SQL for prompt {prompt!r}: {e}")
+        raise
+    logging.info(
+        f"Plan cost {plan['cost']}, estimated rows {plan['cardinality']} ({plan['action']}) for prompt {prompt!r}"
+    )
+    return plan
+
+# Helper: Which ROW_CAPS entry applies to a /generate-and-execute request
+def row_cap_endpoint(data, streaming):
+    if streaming:
+        return "stream"
+    if data.get("page_size"):
+        return "page"
+    return "json"
+
+@timer_decorator("description")
 def create_desc_query_result(prompt, response):
     # res={}
     # keys = response['columns']
@@ -153,7 +493,9 @@ def create_desc_query_result(prompt, response):
     #     for j in range(len(response['rows'])):
     #         res[keys[i]].append(response['rows'][j][i])
 
-    input_text = f"instruction : give me a descriptive answer (at least three words) to prompt based on datasbase query result .prompt :  {prompt} , context:{json.dumps(response)}"
+    # Only columns and rows go to the model; column_types is for the renderer
+    context = {"columns": response.get("columns", []), "rows": response.get("rows", [])}
+    input_text = f"instruction : give me a descriptive answer (at least three words) to prompt based on datasbase query result .prompt :  {prompt} , context:{json.dumps(context, default=str)}"
     
     print(input_text, "@@@@")  # Debugging
 
@@ -176,104 +518,332 @@ def create_desc_query_result(prompt, response):
     return description.replace("\"", "").strip()
 
 
-import re
-
-def determine_rendering_type(response):
-    """
-    Determines the rendering type based on the structure of execution results after removing ID and UPDATEDAT columns.
-
-    Conditions:
-    - If there is one string column and the rest are numeric -> "graph"
-    - If there are 2 or fewer total columns -> "text"
-    - Otherwise -> "table"
-
-    :param response: Dictionary containing execution results
-    :return: Updated dictionary with rendering_type
-    """
-    execution_result = response.get("execution_result", {})
-    columns = execution_result.get("columns", [])
-    rows = execution_result.get("rows", [])
-
-    if not columns or not rows:
-        response["rendering_type"] = "text"  # Default fallback if data is empty
-        return response
-
-    # Identify ID columns and "UPDATEDAT"
-    id_columns = {col for col in columns if re.search(r'\bID\b', col, re.IGNORECASE)}
-    columns_to_remove = id_columns | {"UPDATEDAT"}  # Remove both ID columns and UPDATEDAT
-
-    # Filter columns and corresponding row values
-    filtered_columns = [col for col in columns if col not in columns_to_remove]
-    filtered_indexes = [i for i, col in enumerate(columns) if col not in columns_to_remove]
-    filtered_rows = [[format_if_date(row[i]) for i in filtered_indexes] for row in rows]
-
-    # Check if we have any valid columns left
-    if not filtered_columns:
-        response["rendering_type"] = "text"
-        return response
-
-    # Determine column types from the first row
-    string_columns = []
-    number_columns = []
-
-    first_row = filtered_rows[0]  # Assume all rows have the same structure
-    for i, value in enumerate(first_row):
-        if isinstance(value, (int, float)):
-            number_columns.append(filtered_columns[i])
-        else:
-            string_columns.append(filtered_columns[i])
-
-    # Apply conditions to determine rendering type
-    if len(string_columns) == 1 and len(number_columns) >= 1:
-        rendering_type = "graph"
-    elif len(filtered_columns) <= 1 and len(filtered_rows)<=1:
-        rendering_type = "text"
-    else:
-        print(string_columns,number_columns,'======================')
-        rendering_type = "table"
-
-    # Update response with filtered data and rendering type
-    response["execution_result"]["columns"] = filtered_columns
-    response["execution_result"]["rows"] = filtered_rows
-    response["type"] = rendering_type
-
-    return response
+def execute_sql_query(query: str):
+    query = query.strip()
+    if query.endswith(";"):  # Remove trailing semicolon
+        query = query[:-1]
+    select = is_select(query)
 
+    if result_cache is not None and select:
+        cached = result_cache.get(query)
+        if cached is not None:
+            logging.info(f"Result cache hit for SQL query: {query}")
+            return cached
 
+    try:
+        with pool.connection() as connection:  # Session back to the pool (or dropped) on exit
+            cursor = pool.cursor(connection)
+            try:
+                logging.info(f"Executing SQL query: {query}")
+                with STAGE_SECONDS.time(stage="execute"):
+                    cursor.execute(query)
+                if select:
+                    # ID/UPDATEDAT are dropped and dates formatted by the row factory while fetching
+                    shape = ResultShape(cursor.description)
+                    cursor.rowfactory = shape.rowfactory
+                    with STAGE_SECONDS.time(stage="fetch"):
+                        result = shape.result(cursor.fetchall())
+                    if result_cache is not None:
+                        result_cache.put(query, result)
+                    return result
+                else:
+                    connection.commit()
+                    if result_cache is not None:
+                        result_cache.invalidate_for(query)
+                    return {"message": "Query executed successfully"}
+            finally:
+                cursor.close()
+    except cx_Oracle.DatabaseError as e:
+        error, = e.args
+        logging.error(f"Database error: {error.message}")
+        raise Exception(f"Database error: {error.message}")
 
 
+# Helper: Execute one page of a SELECT, returning the result and a cursor token for the next page
+def execute_sql_page(query: str, page_size: int, state=None, row_cap=None):
+    query = query.strip()
+    if query.endswith(";"):  # Remove trailing semicolon
+        query = query[:-1]
+    if not is_select(query):
+        raise Exception("Only SELECT queries can be paginated.")
 
+    try:
+        with pool.connection() as connection:  # Session back to the pool (or dropped) on exit
+            cursor = pool.cursor(connection)
+            try:
+                if state is None:
+                    # Parse only (no execution) to learn the columns: keyset paging needs the table's own ID,
+                    # OFFSET paging orders by all of them
+                    cursor.parse(query)
+                    columns = [col[0] for col in cursor.description]
+                    state = {
+                        "sql": query,
+                        "page_size": page_size,
+                        "keyset": keyset_column(query, columns),
+                        "column_count": len(columns),
+                        "row_cap": row_cap,
+                        "offset": 0,
+                        "last_id": None,
+                    }
+
+                paged_sql, binds = page_query(
+                    state["sql"],
+                    state["page_size"],
+                    offset=state["offset"],
+                    last_id=state["last_id"],
+                    keyset=state["keyset"],
+                    column_count=state.get("column_count", 0),
+                    row_cap=state.get("row_cap"),
+                )
+                logging.info(f"Executing SQL page: {paged_sql} {binds}")
+                with STAGE_SECONDS.time(stage="execute"):
+                    cursor.execute(paged_sql, binds)
+                with STAGE_SECONDS.time(stage="fetch"):
+                    rows = cursor.fetchall()
+                columns = [col[0] for col in cursor.description]
+                shape = ResultShape(cursor.description)
+            finally:
+                cursor.close()
+    except cx_Oracle.DatabaseError as e:
+        error, = e.args
+        logging.error(f"Database error: {error.message}")
+        raise Exception(f"Database error: {error.message}")
 
+    next_cursor = None
+    if len(rows) > state["page_size"]:
+        rows = rows[:state["page_size"]]
+        next_state = dict(state, offset=state["offset"] + len(rows))
+        if state["keyset"]:
+            next_state["last_id"] = rows[-1][columns.index("ID")]
+        next_cursor = encode_cursor(next_state, PAGINATION_SECRET)
+    # Shaped after the fetch because the keyset needs the ID column dropped from the display
+    return shape.result(shape.shape_rows(rows)), next_cursor
+
+# Helper: Execute a SELECT and yield its ResultShape, then lists of at most `arraysize` display rows
+def stream_sql_query(query: str, arraysize: int = STREAM_ARRAYSIZE):
+    query = query.strip()
+    if query.endswith(";"):  # Remove trailing semicolon
+        query = query[:-1]
 
-def execute_sql_query(query: str):
-    connection = None
-    cursor = None
     try:
-        connection = pool.acquire()  # Acquire connection from the pool
-        cursor = connection.cursor()
-
-        query = query.strip()
-        if query.endswith(";"):  # Remove trailing semicolon
-            query = query[:-1]
-        logging.info(f"Executing SQL query: {query}")
-        cursor.execute(query)
-        if query.lower().startswith("select"):
-            result = cursor.fetchall()
-            columns = [col[0] for col in cursor.description]
-            return {"columns": columns, "rows": result}
-        else:
-            connection.commit()
-            return {"message": "Query executed successfully"}
+        with pool.connection() as connection:  # Session back to the pool (or dropped) on exit
+            cursor = pool.cursor(connection)
+            cursor.arraysize = arraysize
+            try:
+                logging.info(f"Streaming SQL query: {query}")
+                with STAGE_SECONDS.time(stage="execute"):
+                    cursor.execute(query)
+                shape = ResultShape(cursor.description)
+                cursor.rowfactory = shape.rowfactory
+                yield shape
+                while True:
+                    with STAGE_SECONDS.time(stage="fetch"):
+                        rows = cursor.fetchmany()
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
     except cx_Oracle.DatabaseError as e:
         error, = e.args
         logging.error(f"Database error: {error.message}")
         raise Exception(f"Database error: {error.message}")
+
+# Helper: JSON response for a pipeline result, timed as the serialization stage
+def serialize(response, media_type):
+    body, headers = render(response, media_type, request.headers.get("Accept-Encoding"))
+    return Response(body, headers=headers)
+
+# Helper: Response media type from the body's "format" field or the Accept header
+def response_format(data):
+    return negotiate_format(request.headers.get("Accept"), data.get("format"))
+
+# Helper: Stream execution results as newline-delimited JSON with flat memory use.
+# Only the first chunk is used for column typing and rendering-type detection.
+def stream_generate_and_execute(prompt, generated_query, context, plan):
+    chunks = stream_sql_query(plan["sql"])
+    try:
+        shape = next(chunks)  # Executes the query so errors surface before streaming starts
+        first_rows = next(chunks, [])
+    except PoolTimeout:
+        raise  # The pool was busy; the query itself may be fine
+    except Exception:
+        chunks.close()
+        forget_generated_query(prompt, context, generated_query)
+        raise
+    record_successful_query(prompt, context, generated_query, plan)
+
+    if not shape.columns or not first_rows:
+        rendering_type = "text"
+    else:
+        rendering_type = classify_column_types(shape.column_types, len(first_rows))
+    description = create_desc_query_result(prompt, {"columns": shape.columns, "rows": first_rows})
+
+    def generate():
+        try:
+            yield json.dumps({
+                "prompt": prompt,
+                "generated_query": generated_query,
+                "columns": shape.columns,
+                "type": rendering_type,
+                "description": description,
+                "row_limit": plan["row_limit"],
+            }) + "\n"
+            row_count = 0
+            for row in first_rows:
+                yield json.dumps(row, default=str) + "\n"
+            row_count += len(first_rows)
+            for rows in chunks:
+                yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+                row_count += len(rows)
+            yield json.dumps({"row_count": row_count}) + "\n"
+        finally:
+            chunks.close()  # Releases the pooled connection if the client goes away early
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+# Helper: A batch request's prompts keyed by normalized text, so duplicates are answered once; raises ValueError
+def batch_prompts(data):
+    prompts = data.get("prompts") if isinstance(data, dict) else None
+    if not isinstance(prompts, list) or not prompts:
+        raise ValueError("Missing 'prompts' list in the request body.")
+    if len(prompts) > BATCH_MAX_PROMPTS:
+        raise ValueError(f"At most {BATCH_MAX_PROMPTS} prompts per batch.")
+    if not all(isinstance(prompt, str) and prompt.strip() for prompt in prompts):
+        raise ValueError("Prompts must be non-empty strings.")
+    unique = {}
+    for prompt in prompts:
+        unique.setdefault(normalize_prompt(prompt), prompt.strip())
+    return prompts, unique
+
+# Helper: Validate, govern and execute one generated query of a batch, like /generate-and-execute does.
+# The description is added afterwards on the request thread
+def execute_batch_item(prompt, context, generated_query):
+    try:
+        generated_query = validate_generated_query(generated_query)
+        routed_query, rollup = route_to_rollup(prompt, generated_query)
+        plan = govern_query(prompt, routed_query, "json")
+        execution_result = execute_sql_query(plan["sql"])
+    except PoolTimeout:
+        raise  # The pool was busy; the query itself may be fine
+    except Exception:
+        forget_generated_query(prompt, context, generated_query)
+        raise
+    record_successful_query(prompt, context, generated_query, plan)
+    response = {
+        "prompt": prompt,
+        "generated_query": generated_query,
+        "execution_result": execution_result,
+    }
+    if plan["row_limit"] is not None:
+        response["row_limit"] = plan["row_limit"]
+    if rollup is not None:
+        response["rollup"] = rollup
+    return determine_rendering_type(response)
+
+# Helper: The HTTP status /generate-and-execute answers a pipeline error with
+def error_status(error):
+    if isinstance(error, SQLValidationError):
+        return 422
+    if isinstance(error, PoolTimeout):
+        return 503
+    if isinstance(error, QueryTimeout):
+        return 504
+    return 500
+
+# Helper: The per-prompt entry for a prompt of a batch that failed, with the status its own request would get
+def batch_error(prompt, error, generated_query=None):
+    logging.error(f"Error in batch prompt {prompt!r}: {error}")
+    result = {"prompt": prompt, "error": str(error), "status": error_status(error)}
+    if generated_query is not None:
+        result["generated_query"] = generated_query
+    return result
+
+# Helper: One server-sent event
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {dumps(payload).decode('utf-8')}\n\n"
+
+# Helper: Run the /generate-and-execute pipeline, yielding a server-sent event as each stage completes:
+# tables, sql, header (columns and render type), rows (one per fetch batch), description, then done.
+# A failure at any stage ends the stream with an error event carrying the status the JSON endpoint would use.
+# With `read_only` (GET requests, which any page can trigger cross-site) only SELECTs are executed.
+def pipeline_events(prompt, read_only=False):
+    generated_query = None
+    chunks = None
+    try:
+        # Step 1: Find relevant tables
+        relevant_tables = list(find_relevant_tables(prompt))
+        schema = schema_index.schema
+        context = {table: schema[table] for table in relevant_tables}
+        yield sse_event("tables", {"prompt": prompt, "tables": relevant_tables})
+
+        # Step 2: Generate, validate and govern the SQL query
+        generated_query = generate_sql_query(prompt, context)
+        if read_only and not is_select(generated_query):
+            raise SQLValidationError("Only SELECT queries run over GET; send the prompt with POST to run other statements.")
+        streaming = is_select(generated_query)
+        try:
+            generated_query = validate_generated_query(generated_query)
+            routed_query, rollup = route_to_rollup(prompt, generated_query)
+            plan = govern_query(prompt, routed_query, "stream" if streaming else "json")
+        except SQLValidationError:
+            forget_generated_query(prompt, context, generated_query)
+            raise
+        event = {"generated_query": generated_query, "row_limit": plan["row_limit"]}
+        if rollup is not None:
+            event["rollup"] = rollup
+        yield sse_event("sql", event)
+
+        # Step 3: Execute; rows go out one fetch batch at a time
+        try:
+            if streaming:
+                chunks = stream_sql_query(plan["sql"])
+                shape = next(chunks)
+                first_rows = next(chunks, [])
+            else:
+                message = execute_sql_query(plan["sql"])["message"]
+        except PoolTimeout:
+            raise  # The pool was busy; the query itself may be fine
+        except Exception:
+            forget_generated_query(prompt, context, generated_query)
+            raise
+        record_successful_query(prompt, context, generated_query, plan)
+        if not streaming:
+            yield sse_event("header", {"columns": [], "column_types": [], "type": "text"})
+            yield sse_event("done", {"row_count": 0, "message": message})
+            return
+
+        if not shape.columns or not first_rows:
+            rendering_type = "text"
+        else:
+            rendering_type = classify_column_types(shape.column_types, len(first_rows))
+        yield sse_event("header", {"columns": shape.columns, "column_types": shape.column_types, "type": rendering_type})
+        row_count = len(first_rows)
+        if first_rows:
+            yield sse_event("rows", {"rows": first_rows})
+        for rows in chunks:
+            yield sse_event("rows", {"rows": rows})
+            row_count += len(rows)
+
+        # Step 4: Describe the result from its first batch, like the NDJSON stream does
+        description = create_desc_query_result(prompt, {"columns": shape.columns, "rows": first_rows})
+        yield sse_event("description", {"description": description})
+        yield sse_event("done", {"row_count": row_count})
+    except Exception as e:
+        logging.error(f"Error in /generate-and-execute/events: {e}")
+        event = {"error": str(e), "status": error_status(e)}
+        if generated_query is not None:
+            event["generated_query"] = generated_query
+        yield sse_event("error", event)
     finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            pool.release(connection)  # Release connection back to the pool
+        if chunks is not None:
+            chunks.close()  # Releases the pooled connection if the client goes away early
 
+# Helper: Whether the client asked for an NDJSON stream instead of a single JSON document
+def wants_ndjson(data):
+    if data.get("stream"):
+        return True
+    return request.accept_mimetypes.best == "application/x-ndjson"
 
 
 # API endpoint to find relevant tables, generate query, and execute
@@ -289,40 +859,185 @@ def generate_and_execute():
         if not prompt:
             return jsonify({"error": "Prompt cannot be empty."}), 400
 
+        streaming = wants_ndjson(data)
+        try:
+            media_type = None if streaming else response_format(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 406
+
         # Step 1: Find relevant tables
-        relevant_tables = find_relevant_tables(prompt, schema)
+        relevant_tables = find_relevant_tables(prompt)
+        schema = schema_index.schema
         context = {table: schema[table] for table in relevant_tables}
 
         # Step 2: Generate SQL query using the T5 model
-        start_time = time.time()
         generated_query = generate_sql_query(prompt, context)
-        end_time = time.time()
 
-        print(f"Function took {end_time - start_time} seconds to execute")
-
-        
-
-        # Step 3: Execute the SQL query
-        execution_result = execute_sql_query(generated_query)
+        # Validate the SQL locally so malformed output never takes a session from the pool,
+        # then let the governor check its plan and cap its rows
+        streaming = streaming and is_select(generated_query)
+        try:
+            generated_query = validate_generated_query(generated_query)
+            routed_query, rollup = route_to_rollup(prompt, generated_query)
+            plan = govern_query(prompt, routed_query, row_cap_endpoint(data, streaming))
+        except SQLValidationError as e:
+            logging.error(f"Rejected generated SQL: {e}")
+            forget_generated_query(prompt, context, generated_query)
+            return jsonify({"error": str(e), "generated_query": generated_query}), 422
+
+        if streaming:
+            return stream_generate_and_execute(prompt, generated_query, context, plan)
+
+        # Step 3: Execute the SQL query; a query that fails is not kept in the prompt cache
+        next_cursor = None
+        try:
+            if data.get("page_size"):
+                page_size = max(1, min(int(data["page_size"]), PAGE_SIZE_MAX))
+                execution_result, next_cursor = execute_sql_page(plan["source_sql"], page_size, row_cap=plan["row_limit"])
+            else:
+                execution_result = execute_sql_query(plan["sql"])
+        except PoolTimeout:
+            raise  # The pool was busy; the query itself may be fine
+        except Exception:
+            forget_generated_query(prompt, context, generated_query)
+            raise
+        record_successful_query(prompt, context, generated_query, plan)
         print(execution_result,'======================')
         response={
             "prompt": prompt,
             "generated_query": generated_query,
             "execution_result": execution_result
         }
+        if plan["row_limit"] is not None:
+            response["row_limit"] = plan["row_limit"]
+        if rollup is not None:
+            response["rollup"] = rollup
+        if data.get("page_size"):
+            response["next_cursor"] = next_cursor
         response = determine_rendering_type(response)
         response["description"] = create_desc_query_result(prompt, execution_result)
 
         # Step 4: Return results
-        return jsonify(response)
+        return serialize(response, media_type)
         return jsonify({
             "prompt": prompt,
             "generated_query": generated_query
         })
+    except PoolTimeout as e:
+        logging.error(f"Error in /generate-and-execute: {e}")
+        return jsonify({"error": str(e)}), 503
+    except QueryTimeout as e:
+        logging.error(f"Error in /generate-and-execute: {e}")
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         logging.error(f"Error in /generate-and-execute: {e}")
         return jsonify({"error": str(e)}), 500
 
+# API endpoint streaming the /generate-and-execute pipeline as server-sent events, so a client can show the
+# tables, SQL and rows as they become available; GET with ?prompt= works with a plain EventSource
+@app.route("/generate-and-execute/events", methods=["GET", "POST"])
+def generate_and_execute_events():
+    data = request.args if request.method == "GET" else request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("prompt"), str):
+        return jsonify({"error": "Missing 'prompt' in the request."}), 400
+    prompt = data["prompt"].strip()
+    if not prompt:
+        return jsonify({"error": "Prompt cannot be empty."}), 400
+    return Response(
+        pipeline_events(prompt, read_only=request.method == "GET"),
+        mimetype="text/event-stream",
+        # Proxies must pass events through as they are written rather than buffer the response
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# API endpoint to fetch the next page of a previously generated query without calling the model
+@app.route("/generate-and-execute/next", methods=["POST"])
+def generate_and_execute_next():
+    try:
+        data = request.get_json()
+        if not data or not data.get("cursor"):
+            return jsonify({"error": "Missing 'cursor' in the request body."}), 400
+
+        try:
+            state = decode_cursor(data["cursor"], PAGINATION_SECRET)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            media_type = response_format(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 406
+
+        execution_result, next_cursor = execute_sql_page(state["sql"], state["page_size"], state)
+        response = {
+            "generated_query": state["sql"],
+            "execution_result": execution_result,
+            "next_cursor": next_cursor,
+        }
+        response = determine_rendering_type(response)
+        return serialize(response, media_type)
+    except PoolTimeout as e:
+        logging.error(f"Error in /generate-and-execute/next: {e}")
+        return jsonify({"error": str(e)}), 503
+    except QueryTimeout as e:
+        logging.error(f"Error in /generate-and-execute/next: {e}")
+        return jsonify({"error": str(e)}), 504
+    except Exception as e:
+        logging.error(f"Error in /generate-and-execute/next: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# API endpoint for several prompts at once, e.g. a dashboard: duplicates are answered once, cache misses are
+# decoded together by the batcher, and the queries run concurrently on pooled sessions
+@app.route("/generate-and-execute/batch", methods=["POST"])
+def generate_and_execute_batch():
+    try:
+        data = request.get_json()
+        try:
+            prompts, unique = batch_prompts(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            media_type = response_format(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 406
+        if media_type == ARROW_STREAM:
+            return jsonify({"error": "Arrow responses hold a single result; use json or columnar for batches."}), 406
+
+        # Step 1: Find relevant tables for every prompt
+        schema = schema_index.schema
+        contexts = {key: {table: schema[table] for table in find_relevant_tables(prompt)}
+                    for key, prompt in unique.items()}
+
+        # Step 2: Generate all queries at once, so the batcher decodes the cache misses as one batch
+        generations = {key: batch_generate_executor.submit(generate_sql_query, prompt, contexts[key])
+                       for key, prompt in unique.items()}
+
+        # Step 3: Execute each query as soon as its SQL is ready, BATCH_EXECUTE_CONCURRENCY at a time
+        generated_queries = {}
+        executions = {}
+        results = {}
+        for key, generation in generations.items():
+            try:
+                generated_queries[key] = generation.result()
+            except Exception as e:
+                results[key] = batch_error(unique[key], e)
+                continue
+            executions[key] = batch_execute_executor.submit(
+                execute_batch_item, unique[key], contexts[key], generated_queries[key]
+            )
+        for key, execution in executions.items():
+            try:
+                results[key] = execution.result()
+            except Exception as e:
+                results[key] = batch_error(unique[key], e, generated_queries[key])
+            else:
+                results[key]["description"] = create_desc_query_result(unique[key], results[key]["execution_result"])
+
+        # Step 4: One result per requested prompt, in request order
+        return serialize({"results": [results[normalize_prompt(prompt)] for prompt in prompts]}, media_type)
+    except Exception as e:
+        logging.error(f"Error in /generate-and-execute/batch: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/generate_oracledb_query", methods=["POST"])
 def generate_oracledb_query():
     try:
@@ -336,14 +1051,10 @@ def generate_oracledb_query():
             return jsonify({"error": "Prompt cannot be empty."}), 400
 
         # Step 2: Generate SQL query using the T5 model
-        start_time = time.time()
-        generated_query = generate_sql_query(prompt, schema)
-        end_time = time.time()
+        generated_query = generate_sql_query(prompt, schema_index.schema)
 
         print(generated_query,'[][][][][][][][]')
 
-        print(f"Function took {end_time - start_time} seconds to execute")
-
         # Step 4: Return results
         return jsonify({
             "prompt": prompt,
@@ -357,6 +1068,10 @@ def generate_oracledb_query():
 
 
 
+# Start loading in the background so /ready can answer while the model loads
+startup_thread = threading.Thread(target=startup, name="startup", daemon=True)
+startup_thread.start()
+
 # Run the Flask app
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
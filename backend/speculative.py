@@ -0,0 +1,151 @@
+import logging
+import threading
+from collections import deque
+
+import torch
+from transformers import StoppingCriteria
+from transformers.cache_utils import DynamicCache, EncoderDecoderCache
+
+from metrics import GENERATED_TOKENS, STAGE_SECONDS
+from sql_validator import has_terminator
+
+
+class StatementComplete(StoppingCriteria):
+    """Stop a sequence as soon as it emits a ';' that closes the SQL statement, not one inside a quoted value."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        tokens = tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))
+        # Tokens that can end the statement; the decoded text decides whether their ';' is outside quotes
+        self.stop_token_ids = torch.tensor(
+            [token_id for token_id, token in enumerate(tokens) if token and ";" in token],
+            dtype=torch.long,
+        )
+        self._stop_token_ids = set(self.stop_token_ids.tolist())
+
+    def ends(self, token_ids):
+        """Whether the last of `token_ids` (a list of decoder tokens) closes the statement."""
+        if not token_ids or token_ids[-1] not in self._stop_token_ids:
+            return False
+        return has_terminator(self.tokenizer.decode(token_ids, skip_special_tokens=True))
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = torch.isin(input_ids[:, -1], self.stop_token_ids)
+        for row in torch.nonzero(done).flatten().tolist():
+            done[row] = self.ends(input_ids[row].tolist())
+        return done
+
+
+class QueryDraftStore:
+    """
+    Token store of earlier successful SQL used to draft decoder tokens.
+
+    Drafting is prompt-lookup style: the last `ngram_size` generated tokens
+    are looked up among stored queries and the tokens that followed them
+    there become the draft.
+    """
+
+    def __init__(self, tokenizer, decoder_start_token_id, max_queries=500, ngram_size=3):
+        self.tokenizer = tokenizer
+        self.decoder_start_token_id = decoder_start_token_id
+        self.ngram_size = ngram_size
+        self._lock = threading.Lock()
+        self._queries = deque(maxlen=max_queries)
+        self._texts = set()
+        self._index = {}
+
+    def __len__(self):
+        return len(self._queries)
+
+    def add(self, generated_query):
+        if not generated_query or generated_query in self._texts:
+            return
+        token_ids = self.tokenizer(generated_query)["input_ids"]  # Ends with </s>
+        with self._lock:
+            evicting = len(self._queries) == self._queries.maxlen
+            if evicting:
+                self._texts.discard(self._queries[0][0])
+            tokens = [self.decoder_start_token_id] + token_ids
+            self._queries.append((generated_query, tokens))
+            self._texts.add(generated_query)
+            if evicting:
+                index = {}
+                for _, stored_tokens in self._queries:
+                    self._index_tokens(index, stored_tokens)
+                self._index = index
+            else:
+                self._index_tokens(self._index, tokens)
+
+    def _index_tokens(self, index, tokens):
+        # Most recent query wins for a shared n-gram
+        for end in range(1, len(tokens)):
+            for n in range(1, min(self.ngram_size, end) + 1):
+                index[tuple(tokens[end - n:end])] = (tokens, end)
+
+    def draft(self, generated, num_tokens):
+        index = self._index
+        for n in range(min(self.ngram_size, len(generated)), 0, -1):
+            match = index.get(tuple(generated[-n:]))
+            if match is not None:
+                tokens, end = match
+                return tokens[end:end + num_tokens]
+        return []
+
+
+def speculative_generate(model, tokenizer, input_text, store, stopping, max_length=512, num_draft_tokens=10):
+    """
+    Greedy decoding that verifies drafted tokens in one decoder forward pass.
+
+    Each step feeds the not-yet-cached tokens plus a draft from `store`, keeps
+    the longest draft prefix the model agrees with, appends the model's own
+    next token and crops the KV cache back to the accepted length. The output
+    is the same as plain greedy `generate`.
+    """
+    with STAGE_SECONDS.time(stage="tokenization"):
+        inputs = tokenizer(input_text, return_tensors="pt", max_length=512, truncation=True)
+    eos_token_id = model.config.eos_token_id
+    generated = [model.config.decoder_start_token_id]
+    cached = 0
+    drafted = accepted_total = 0
+
+    with torch.inference_mode():
+        encoder_outputs = model.get_encoder()(
+            input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"]
+        )
+        past_key_values = EncoderDecoderCache(DynamicCache(), DynamicCache())
+        while len(generated) < max_length:
+            draft = store.draft(generated, num_draft_tokens)[:max_length - len(generated) - 1]
+            new_tokens = generated[cached:] + draft
+            outputs = model(
+                encoder_outputs=encoder_outputs,
+                attention_mask=inputs["attention_mask"],
+                decoder_input_ids=torch.tensor([new_tokens]),
+                past_key_values=past_key_values,
+                use_cache=True,
+            )
+            predictions = outputs.logits[0].argmax(-1).tolist()
+            past_key_values = outputs.past_key_values
+
+            # predictions[i] is the model's choice for the token after new_tokens[i]
+            base = len(generated) - cached - 1
+            accepted = 0
+            while accepted < len(draft) and predictions[base + accepted] == draft[accepted]:
+                accepted += 1
+                if draft[accepted - 1] == eos_token_id or stopping.ends(generated + draft[:accepted]):
+                    break
+            drafted += len(draft)
+            accepted_total += accepted
+            generated += draft[:accepted]
+            if generated[-1] == eos_token_id or (accepted and stopping.ends(generated)):
+                break
+            generated.append(predictions[base + accepted])
+            if generated[-1] == eos_token_id or stopping.ends(generated):
+                break
+
+            # Everything except the newest token is now in the cache
+            cached = len(generated) - 1
+            past_key_values.crop(cached)
+
+    GENERATED_TOKENS.observe(len(generated) - 1)
+    logging.info(f"Speculative decode: {len(generated) - 1} tokens, {accepted_total}/{drafted} drafted tokens accepted")
+    return tokenizer.decode(generated, skip_special_tokens=True)
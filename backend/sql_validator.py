@@ -0,0 +1,271 @@
+import re
+
+TOKEN = re.compile(r"""
+    (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"[^"]*")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<ident>[A-Za-z_][\w$#]*)
+  | (?P<op><>|!=|>=|<=|\|\||[(),.;*=<>+\-/:%])
+  | (?P<space>\s+)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+KEYWORDS = {
+    "ALL", "AND", "ANY", "AS", "ASC", "BETWEEN", "BY", "CASE", "CROSS", "DELETE", "DESC", "DISTINCT",
+    "ELSE", "END", "ESCAPE", "EXISTS", "FETCH", "FIRST", "FOR", "FROM", "FULL", "GROUP", "HAVING", "IN",
+    "INNER", "INSERT", "INTERSECT", "INTO", "IS", "JOIN", "LAST", "LEFT", "LIKE", "MERGE", "MINUS", "NATURAL",
+    "NEXT", "NOT", "NULL", "NULLS", "OFFSET", "ON", "ONLY", "OR", "ORDER", "OUTER", "OVER", "PARTITION",
+    "PRIOR", "RIGHT", "ROW", "ROWS", "SELECT", "SET", "SOME", "THEN", "TIES", "UNION", "UPDATE", "USING",
+    "VALUES", "WHEN", "WHERE", "WITH", "PERCENT",
+    # Literal prefixes, interval units and type names (CAST(x AS NUMBER), DATE '2024-01-01')
+    "DATE", "TIMESTAMP", "INTERVAL", "YEAR", "MONTH", "DAY", "HOUR", "MINUTE", "SECOND", "TO",
+    "NUMBER", "VARCHAR2", "VARCHAR", "CHAR", "INTEGER", "INT", "FLOAT", "DECIMAL", "CLOB",
+}
+PSEUDO_COLUMNS = {
+    "rownum", "rowid", "sysdate", "systimestamp", "current_date", "current_timestamp", "level", "user", "dual",
+}
+STATEMENT_STARTS = {"SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "MERGE"}
+# Functions whose argument list uses FROM without naming a table
+FROM_FUNCTIONS = {"EXTRACT", "TRIM", "SUBSTRING"}
+
+# Minimum RapidFuzz score to auto-correct an unknown identifier to a schema name
+AUTO_CORRECT_THRESHOLD = 85
+
+
+class SQLValidationError(ValueError):
+    pass
+
+
+def tokenize(sql):
+    tokens = []
+    for match in TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind != "space":
+            tokens.append((kind, match.group(), match.start(), match.end()))
+    return tokens
+
+
+# Helper: Whether `sql` has a ';' outside string literals and quoted identifiers (an unclosed quote runs to the end)
+def has_terminator(sql):
+    for kind, text, _, _ in tokenize(sql):
+        if kind == "other" and text in ("'", '"'):
+            return False
+        if text == ";":
+            return True
+    return False
+
+
+def _is_ident(token):
+    return token is not None and token[0] == "ident" and token[1].upper() not in KEYWORDS
+
+
+def _at(tokens, i):
+    return tokens[i] if 0 <= i < len(tokens) else None
+
+
+def _text(tokens, i):
+    token = _at(tokens, i)
+    return token[1].upper() if token else None
+
+
+def _matching_paren(tokens, i):
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j][1] == "(":
+            depth += 1
+        elif tokens[j][1] == ")":
+            depth -= 1
+            if depth == 0:
+                return j
+    return len(tokens) - 1
+
+
+class _Analysis:
+    def __init__(self):
+        self.tables = []  # (token index, name as written)
+        self.aliases = {}  # lower alias -> lower table name, or None for derived tables / CTEs
+        self.ctes = set()
+        self.output_aliases = set()
+        self.skip = set()  # token indexes that are not column references
+
+
+def _parse_table_ref(tokens, i, analysis):
+    token = _at(tokens, i)
+    if token is None:
+        return i
+    if token[1] == "(":
+        end = _matching_paren(tokens, i)
+        i = end + 1
+        source = None
+    elif token[0] == "ident":
+        # schema.table: validate only the table part
+        if _text(tokens, i + 1) == "." and _at(tokens, i + 2) and tokens[i + 2][0] == "ident":
+            analysis.skip.add(i)
+            i += 2
+        analysis.tables.append((i, tokens[i][1]))
+        analysis.skip.add(i)
+        source = tokens[i][1].lower()
+        analysis.aliases[source] = source
+        i += 1
+    else:
+        return i
+
+    if _text(tokens, i) == "AS":
+        i += 1
+    if _is_ident(_at(tokens, i)):
+        analysis.aliases[tokens[i][1].lower()] = source
+        analysis.skip.add(i)
+        i += 1
+    return i
+
+
+def _analyze(tokens):
+    analysis = _Analysis()
+    func_stack = []
+    for i, (kind, text, _, _) in enumerate(tokens):
+        upper = text.upper()
+        previous = _at(tokens, i - 1)
+        if text == "(":
+            func_stack.append(previous[1].upper() if previous and previous[0] == "ident" else None)
+        elif text == ")":
+            if func_stack:
+                func_stack.pop()
+        elif kind != "ident":
+            continue
+        elif _is_ident((kind, text)) and _text(tokens, i + 1) == "AS" and _text(tokens, i + 2) == "(":
+            # WITH name AS (...)
+            analysis.ctes.add(text.lower())
+            analysis.aliases[text.lower()] = None
+            analysis.skip.add(i)
+        elif upper in ("FROM", "JOIN", "INTO", "UPDATE", "USING"):
+            if upper == "FROM" and func_stack and func_stack[-1] in FROM_FUNCTIONS:
+                continue
+            j = _parse_table_ref(tokens, i + 1, analysis)
+            while upper == "FROM" and _text(tokens, j) == ",":
+                j = _parse_table_ref(tokens, j + 1, analysis)
+        elif upper == "AS" and _is_ident(_at(tokens, i + 1)) and _text(tokens, i + 2) != "(":
+            analysis.output_aliases.add(tokens[i + 1][1].lower())
+            analysis.skip.add(i + 1)
+
+    # Implicit select-list aliases: "SUM(x) total," / "name n FROM"
+    for i, token in enumerate(tokens):
+        if i in analysis.skip or not _is_ident(token):
+            continue
+        previous = _at(tokens, i - 1)
+        following = _text(tokens, i + 1)
+        if previous is None or (following not in (",", "FROM") and following is not None):
+            continue
+        if previous[1] == ")" or previous[1].upper() == "END" or previous[0] in ("number", "string") or _is_ident(previous):
+            analysis.output_aliases.add(token[1].lower())
+            analysis.skip.add(i)
+    return analysis
+
+
+def _correct(name, choices):
+    from rapidfuzz import fuzz, process  # Only needed once a name fails to resolve
+
+    # Scored against lowercased names, returns the schema spelling (the dict key)
+    match = process.extractOne(name.lower(), {choice: choice.lower() for choice in choices},
+                               scorer=fuzz.ratio, score_cutoff=AUTO_CORRECT_THRESHOLD)
+    return match[2] if match else None
+
+
+def validate_sql(sql, schema, auto_correct=True):
+    """
+    Parse generated SQL and check table and column names against schema.json.
+
+    Near-miss identifiers are corrected with RapidFuzz when `auto_correct` is
+    set; anything else that does not resolve raises SQLValidationError so the
+    query never reaches Oracle.
+
+    :return: (validated_sql, corrections) where corrections lists "old -> new" strings
+    """
+    sql = sql.strip()
+    if sql.endswith(";"):
+        sql = sql[:-1].rstrip()
+    tokens = tokenize(sql)
+    if not tokens or tokens[0][1].upper() not in STATEMENT_STARTS:
+        raise SQLValidationError("Generated text is not a SQL statement.")
+    depth = 0
+    for kind, text, _, _ in tokens:
+        if kind == "other":
+            raise SQLValidationError(f"Unexpected character {text!r} in generated SQL.")
+        if text == ";":
+            raise SQLValidationError("Generated SQL contains more than one statement.")
+        depth += {"(": 1, ")": -1}.get(text, 0)
+        if depth < 0:
+            break
+    if depth != 0:
+        raise SQLValidationError("Unbalanced parentheses in generated SQL.")
+
+    schema_tables = {table.lower(): table for table in schema}
+    schema_columns = {
+        table.lower(): {column.lower(): column for column in details.get("columns", [])}
+        for table, details in schema.items()
+    }
+    analysis = _analyze(tokens)
+    replacements = {}
+    corrections = []
+    errors = []
+
+    def replace(i, new_text):
+        replacements[i] = new_text
+        corrections.append(f"{tokens[i][1]} -> {new_text}")
+
+    # Tables first so aliases resolve to corrected names
+    for i, name in analysis.tables:
+        lower = name.lower()
+        if lower in schema_tables or lower in analysis.ctes or lower == "dual":
+            continue
+        corrected = _correct(name, schema_tables.values()) if auto_correct else None
+        if corrected is None:
+            errors.append(f"unknown table '{name}'")
+            continue
+        replace(i, corrected)
+        for alias, source in analysis.aliases.items():
+            if source == lower:
+                analysis.aliases[alias] = corrected.lower()
+
+    real_sources = {source for source in analysis.aliases.values() if source in schema_columns}
+    has_opaque_source = any(source is None for source in analysis.aliases.values())
+    visible_columns = {}
+    for source in real_sources:
+        visible_columns.update(schema_columns[source])
+
+    for i, token in enumerate(tokens):
+        if token[0] != "ident" or i in analysis.skip:
+            continue
+        upper, lower = token[1].upper(), token[1].lower()
+        if upper in KEYWORDS or lower in PSEUDO_COLUMNS or lower in analysis.output_aliases:
+            continue
+        if _text(tokens, i + 1) == "(" or _text(tokens, i - 1) == ":":
+            continue  # Function call or bind variable
+        if _text(tokens, i + 1) == ".":
+            if lower not in analysis.aliases and lower not in schema_tables:
+                errors.append(f"unknown table or alias '{token[1]}'")
+            continue
+        if _text(tokens, i - 1) == ".":
+            qualifier = tokens[i - 2][1].lower() if i >= 2 else None
+            source = analysis.aliases.get(qualifier, qualifier if qualifier in schema_tables else None)
+            if source is None or source not in schema_columns:
+                continue
+            columns = schema_columns[source]
+        else:
+            if has_opaque_source or not real_sources:
+                continue  # Columns of derived tables and CTEs are not known up front
+            columns = visible_columns
+        if lower in columns:
+            continue
+        corrected = _correct(token[1], columns.values()) if auto_correct else None
+        if corrected is None:
+            errors.append(f"unknown column '{token[1]}'")
+        else:
+            replace(i, corrected)
+
+    if errors:
+        raise SQLValidationError("Generated SQL does not match the schema: " + ", ".join(errors))
+
+    for i in sorted(replacements, reverse=True):
+        _, _, start, end = tokens[i]
+        sql = sql[:start] + replacements[i] + sql[end:]
+    return sql, corrections
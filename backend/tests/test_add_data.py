@@ -0,0 +1,39 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from add_data import JSONTableStream, convert_value
+
+EXPORT = '{"assets": [{"id": "a1", "value": 1.5}, {"id": "a2", "note": "x, ]}"}], "empty": [], "vessels": [{"id": 12345}]}'
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1 << 20])
+def test_rows_in_file_order_for_any_chunk_size(chunk_size):
+    rows = list(JSONTableStream(io.StringIO(EXPORT), chunk_size=chunk_size))
+    assert rows == [
+        ("assets", {"id": "a1", "value": 1.5}),
+        ("assets", {"id": "a2", "note": "x, ]}"}),
+        ("vessels", {"id": 12345}),
+    ]
+
+
+def test_empty_export():
+    assert list(JSONTableStream(io.StringIO(" { } "))) == []
+
+
+def test_malformed_export():
+    with pytest.raises(ValueError):
+        list(JSONTableStream(io.StringIO('{"assets": {"id": 1}}')))
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-01-31", datetime(2024, 1, 31)),
+    ("2024-01-01T10:00:00.5+02:00", datetime(2024, 1, 1, 10, 0, 0, 500000)),
+    ("2024-01-01T10:00:00 note", "2024-01-01T10:00:00 note"),
+    ("2024-02-30", "2024-02-30"),
+    ("2024-13-01T10:00:00Z", "2024-13-01T10:00:00Z"),
+    (7, 7),
+])
+def test_convert_value(value, expected):
+    assert convert_value(value) == expected
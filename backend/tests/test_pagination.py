@@ -0,0 +1,46 @@
+import pytest
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_column, page_query
+
+
+@pytest.mark.parametrize("query, columns, expected", [
+    ("SELECT * FROM vessels", ["ID", "VESSELNAME"], "vessels.id"),
+    ("SELECT v.id, v.vesselName FROM vessels v WHERE v.status = 'x'", ["ID", "VESSELNAME"], "v.id"),
+    ("SELECT vesselName FROM vessels", ["VESSELNAME"], None),
+    ("SELECT v.vesselName, c.id FROM vessels v JOIN cradles c ON 1 = 1", ["VESSELNAME", "ID"], None),
+    ("SELECT * FROM vessels ORDER BY vesselName", ["ID", "VESSELNAME"], None),
+    ("SELECT cradleId AS id FROM vessels", ["ID"], None),
+])
+def test_keyset_column(query, columns, expected):
+    assert keyset_column(query, columns) == expected
+
+
+def test_keyset_page_filters_on_the_last_id():
+    sql, binds = page_query("SELECT * FROM vessels v WHERE a = 1 OR b = 2", 10, last_id=5, keyset="v.id")
+    assert sql == ("SELECT * FROM vessels v WHERE (a = 1 OR b = 2) AND v.id > :last_id "
+                   "ORDER BY v.id FETCH FIRST :page_rows ROWS ONLY")
+    assert binds == {"page_rows": 11, "last_id": 5}
+
+
+def test_offset_page_orders_by_every_column():
+    sql, binds = page_query("SELECT a, b FROM t ORDER BY b", 10, offset=20, column_count=2)
+    assert sql == "SELECT a, b FROM t ORDER BY b, 1, 2 OFFSET :page_offset ROWS FETCH NEXT :page_rows ROWS ONLY"
+    assert binds == {"page_rows": 11, "page_offset": 20}
+
+
+def test_query_with_its_own_limit_is_wrapped():
+    sql, _ = page_query("SELECT a FROM t FETCH FIRST 5 ROWS ONLY", 2, column_count=1)
+    assert sql.startswith("SELECT * FROM (SELECT a FROM t FETCH FIRST 5 ROWS ONLY) page_q ORDER BY 1 OFFSET")
+
+
+def test_row_cap_limits_the_last_page():
+    assert page_query("SELECT a FROM t", 4, offset=8, column_count=1, row_cap=9)[1]["page_rows"] == 1
+
+
+def test_cursor_round_trip_and_tampering():
+    token = encode_cursor({"offset": 10}, b"secret")
+    assert decode_cursor(token, b"secret") == {"offset": 10}
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, b"other")
+    with pytest.raises(InvalidCursor):
+        decode_cursor("garbage", b"secret")
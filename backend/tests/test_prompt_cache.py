@@ -0,0 +1,14 @@
+from prompt_cache import PromptCache, normalize_prompt
+
+
+def test_normalize_prompt_folds_case_and_whitespace_outside_quotes():
+    assert normalize_prompt("  List   ALL vessels?! ") == "list all vessels"
+    assert normalize_prompt("Assets with status 'Active' ") == "assets with status 'Active'"
+    assert normalize_prompt('Vessels named "Sea  Star".') == 'vessels named "Sea  Star"'
+
+
+def test_prompts_differing_only_inside_quotes_get_different_keys():
+    context = {"assets": {"columns": ["status"]}}
+    assert (PromptCache.make_key("status 'Active'", context)
+            != PromptCache.make_key("status 'active'", context))
+    assert PromptCache.make_key("List vessels", context) == PromptCache.make_key("list  vessels?", context)
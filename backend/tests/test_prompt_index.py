@@ -0,0 +1,26 @@
+import pytest
+
+from prompt_index import prompt_terms
+
+
+@pytest.mark.parametrize("prompt, paraphrase", [
+    ("show cradles under maintenance", "which cradles are in maintenance"),
+    ("List all vessels", "show me every vessel"),
+    ("Total profits per asset", "what is the total profit for each asset"),
+    ("vessels that are not active", "vessels that aren't active"),
+])
+def test_paraphrases_share_terms(prompt, paraphrase):
+    assert prompt_terms(prompt) == prompt_terms(paraphrase)
+
+
+@pytest.mark.parametrize("prompt, other", [
+    ("show active vessels", "show inactive vessels"),
+    ("show active vessels", "show vessels that are not active"),
+    ("assets with the highest revenue", "assets with the lowest revenue"),
+    ("revenue under 100", "revenue over 100"),
+    ("revenue in 2023", "revenue in 2024"),
+    ("assets with status 'Open'", "assets with status 'Closed'"),
+    ("total revenue per asset", "average revenue per asset"),
+])
+def test_different_questions_get_different_terms(prompt, other):
+    assert prompt_terms(prompt) != prompt_terms(other)
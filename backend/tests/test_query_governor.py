@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import cx_Oracle
+import pytest
+
+from query_governor import QueryGovernor, QueryRejected, existing_row_limit, is_select, limit_rows
+
+
+@pytest.mark.parametrize("sql, expected", [
+    # Joins keep their select list: a wrapper would fail with ORA-00918 on duplicate column names
+    ("SELECT * FROM vessels v JOIN cradles c ON c.id = v.cradleId;",
+     "SELECT * FROM vessels v JOIN cradles c ON c.id = v.cradleId FETCH FIRST 100 ROWS ONLY"),
+    ("SELECT * FROM v FETCH FIRST 10000 ROWS ONLY", "SELECT * FROM v FETCH FIRST 100 ROWS ONLY"),
+    ("SELECT * FROM v ORDER BY a FETCH NEXT 10 ROWS ONLY", "SELECT * FROM v ORDER BY a FETCH NEXT 10 ROWS ONLY"),
+    ("SELECT * FROM (SELECT * FROM v FETCH FIRST 9 ROWS ONLY) x",
+     "SELECT * FROM (SELECT * FROM v FETCH FIRST 9 ROWS ONLY) x FETCH FIRST 100 ROWS ONLY"),
+    ("SELECT * FROM v FETCH FIRST 5 PERCENT ROWS ONLY",
+     "SELECT * FROM (SELECT * FROM v FETCH FIRST 5 PERCENT ROWS ONLY) governed_q FETCH FIRST 100 ROWS ONLY"),
+])
+def test_limit_rows(sql, expected):
+    assert limit_rows(sql, 100) == expected
+
+
+def test_existing_row_limit_is_top_level_only():
+    assert existing_row_limit("SELECT * FROM v FETCH FIRST 7 ROWS ONLY") == 7
+    assert existing_row_limit("SELECT * FROM (SELECT * FROM v FETCH FIRST 7 ROWS ONLY) x") is None
+
+
+class FailingPool:
+    """A pool whose EXPLAIN fails with `error`; counts the sessions it hands out."""
+
+    def __init__(self, code, message):
+        self.error = SimpleNamespace(code=code, message=message)
+        self.explains = 0
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.explains += 1
+        raise cx_Oracle.DatabaseError(self.error)
+
+    def close(self):
+        pass
+
+
+def test_plan_errors_are_cached_rejections():
+    pool = FailingPool(904, 'ORA-00904: "NOPE": invalid identifier')
+    governor = QueryGovernor(mode="reject")
+    for _ in range(2):
+        with pytest.raises(QueryRejected, match="ORA-00904"):
+            governor.review(pool, "SELECT nope FROM vessels")
+    assert pool.explains == 1
+
+
+@pytest.mark.parametrize("code, message", [
+    (0, "DPI-1067: call timeout of 30000 ms exceeded with ORA-3156"),
+    (3113, "ORA-03113: end-of-file on communication channel"),
+    (4031, "ORA-04031: unable to allocate 4096 bytes of shared memory"),
+])
+def test_transient_errors_propagate_and_are_not_cached(code, message):
+    pool = FailingPool(code, message)
+    governor = QueryGovernor(mode="reject")
+    for _ in range(2):
+        with pytest.raises(cx_Oracle.DatabaseError) as raised:
+            governor.review(pool, "SELECT * FROM vessels")
+        assert not isinstance(raised.value, QueryRejected)
+    assert pool.explains == 2
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT 1 FROM dual", True),
+    ("  with v AS (SELECT * FROM vessels) SELECT * FROM v", True),
+    ("(SELECT 1 FROM dual)", False),
+    ("DELETE FROM vessels", False),
+    ("", False),
+])
+def test_is_select(sql, expected):
+    assert is_select(sql) is expected
@@ -0,0 +1,31 @@
+from result_cache import ResultCache, tables_read, table_written
+
+RESULT = {"columns": ["NAME"], "rows": [["a"]], "column_types": ["string"]}
+
+
+def test_tables_read():
+    assert tables_read("SELECT * FROM assets a JOIN app.financials f ON f.assetId = a.id") == {"assets", "financials"}
+    assert tables_read("SELECT * FROM assets a, vessels v WHERE a.name = 'from cradles'") == {"assets", "vessels"}
+
+
+def test_table_written():
+    assert table_written("UPDATE assets SET name = 'x'") == "assets"
+    assert table_written("DELETE FROM app.vessels") == "vessels"
+    assert table_written("SELECT 1 FROM dual") is None
+
+
+def test_hit_keeps_column_types_and_equivalent_sql_shares_an_entry():
+    cache = ResultCache()
+    cache.put("SELECT name FROM assets", RESULT)
+    assert cache.get("select  name\nfrom ASSETS;") == RESULT
+
+
+def test_invalidate_for_drops_only_readers_of_the_written_table():
+    cache = ResultCache()
+    cache.put("SELECT name FROM assets", RESULT)
+    cache.put("SELECT name FROM vessels", RESULT)
+    cache.invalidate_for("UPDATE assets SET name = 'x'")
+    assert cache.get("SELECT name FROM assets") is None
+    assert cache.get("SELECT name FROM vessels") == RESULT
+    cache.invalidate_for("CALL refresh_everything()")
+    assert cache.get("SELECT name FROM vessels") is None
@@ -0,0 +1,61 @@
+import pytest
+
+from rollups import rewrite_for_rollup
+
+
+@pytest.mark.parametrize("sql, expected", [
+    (
+        "SELECT TRUNC(f.recordDate, 'MM') AS month, SUM(f.totalRevenue) FROM financials f "
+        "GROUP BY TRUNC(f.recordDate, 'MM')",
+        "SELECT TRUNC(f.recordMonth, 'MM') AS month, SUM(f.totalRevenue) FROM financials_monthly f "
+        "GROUP BY TRUNC(f.recordMonth, 'MM')",
+    ),
+    (
+        "SELECT EXTRACT(YEAR FROM recordDate), AVG(totalRevenue - totalExpenses) FROM financials "
+        "GROUP BY EXTRACT(YEAR FROM recordDate)",
+        "SELECT EXTRACT(YEAR FROM recordMonth), (SUM(totalRevenue - totalExpenses) / SUM(recordCount)) "
+        "FROM financials_monthly financials GROUP BY EXTRACT(YEAR FROM recordMonth)",
+    ),
+    (
+        "SELECT assetId, SUM(totalRevenue) FROM financials GROUP BY assetId",
+        "SELECT assetId, SUM(totalRevenue) FROM financials_monthly financials GROUP BY assetId",
+    ),
+    (
+        "SELECT COUNT(*) FROM financials WHERE assetId = 'none'",
+        "SELECT NVL(SUM(recordCount), 0) FROM financials_monthly financials WHERE assetId = 'none'",
+    ),
+    (
+        "SELECT a.assetType, COUNT(f.id) FROM financials f LEFT JOIN assets a ON f.assetId = a.id GROUP BY a.assetType",
+        "SELECT a.assetType, NVL(SUM(recordCount), 0) FROM financials_monthly f LEFT JOIN assets a "
+        "ON f.assetId = a.id GROUP BY a.assetType",
+    ),
+    (
+        "SELECT SUM(1) FROM financials",
+        "SELECT SUM(recordCount) FROM financials_monthly financials",
+    ),
+])
+def test_month_grain_aggregates_are_rewritten(sql, expected):
+    assert rewrite_for_rollup(sql) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM financials",
+    "SELECT TRUNC(recordDate, 'DD'), SUM(totalRevenue) FROM financials GROUP BY TRUNC(recordDate, 'DD')",
+    "SELECT MAX(totalRevenue) FROM financials",
+    "SELECT SUM(totalRevenue) FROM financials WHERE totalRevenue > 100",
+    "SELECT SUM(totalRevenue * 2) FROM financials",
+    # A constant in the argument would be added once per asset-month, not once per row
+    "SELECT SUM(2) FROM financials",
+    "SELECT SUM(totalRevenue + 100) FROM financials",
+    "SELECT AVG(totalRevenue + 100) FROM financials",
+    "SELECT AVG(1) FROM financials",
+    "SELECT AVG(f.totalRevenue + a.id) FROM financials f JOIN assets a ON a.id = f.assetId",
+    "SELECT COUNT(DISTINCT assetId) FROM financials",
+    "SELECT SUM(totalRevenue) FROM financials WHERE id IN (SELECT id FROM financials)",
+    # financials is the null-supplying side: COUNT(*) counts assets without financials rows
+    "SELECT a.assetType, COUNT(*) FROM assets a LEFT JOIN financials f ON f.assetId = a.id GROUP BY a.assetType",
+    "SELECT a.assetType, COUNT(f.id) FROM financials f RIGHT JOIN assets a ON f.assetId = a.id GROUP BY a.assetType",
+    "SELECT a.assetType, COUNT(*) FROM assets a, financials f WHERE f.assetId(+) = a.id GROUP BY a.assetType",
+])
+def test_row_level_queries_are_left_alone(sql):
+    assert rewrite_for_rollup(sql) is None
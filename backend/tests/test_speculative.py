@@ -0,0 +1,29 @@
+import torch
+
+from speculative import StatementComplete
+
+
+class CharTokenizer:
+    """One token per printable ASCII character."""
+
+    def __len__(self):
+        return 95
+
+    def convert_ids_to_tokens(self, ids):
+        return [chr(32 + token_id) for token_id in ids]
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(chr(32 + token_id) for token_id in ids)
+
+    def encode(self, text):
+        return [ord(char) - 32 for char in text]
+
+
+def test_stops_only_on_a_semicolon_outside_quotes():
+    tokenizer = CharTokenizer()
+    stopping = StatementComplete(tokenizer)
+    assert not stopping.ends(tokenizer.encode("SELECT * FROM t WHERE note = 'a;"))
+    assert stopping.ends(tokenizer.encode("SELECT * FROM t WHERE note = 'a;b';"))
+    assert not stopping.ends(tokenizer.encode("SELECT 1"))
+    batch = torch.tensor([tokenizer.encode("SELECT 'ab;"), tokenizer.encode("SELECT 'a';")])
+    assert stopping(batch, None).tolist() == [False, True]
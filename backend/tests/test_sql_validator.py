@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+from sql_validator import SQLValidationError, has_terminator, validate_sql
+
+with open(os.path.join(os.path.dirname(__file__), "..", "schema.json")) as f:
+    SCHEMA = json.load(f)
+
+
+def test_valid_join_passes_unchanged():
+    sql = "SELECT a.name, f.totalRevenue FROM assets a JOIN financials f ON f.assetId = a.id;"
+    assert validate_sql(sql, SCHEMA) == (sql.rstrip(";"), [])
+
+
+@pytest.mark.parametrize("sql, corrected, correction", [
+    ("SELECT name FROM asets", "SELECT name FROM assets", "asets -> assets"),
+    ("SELECT nme FROM assets a", "SELECT name FROM assets a", "nme -> name"),
+])
+def test_near_misses_are_corrected(sql, corrected, correction):
+    assert validate_sql(sql, SCHEMA) == (corrected, [correction])
+
+
+def test_near_misses_are_rejected_without_auto_correct():
+    with pytest.raises(SQLValidationError, match="unknown table 'asets'"):
+        validate_sql("SELECT name FROM asets", SCHEMA, auto_correct=False)
+
+
+def test_output_aliases_and_literals_are_not_columns():
+    sql = "SELECT name AS n FROM assets WHERE status = 'nme' ORDER BY n"
+    assert validate_sql(sql, SCHEMA) == (sql, [])
+
+
+@pytest.mark.parametrize("sql, message", [
+    ("SELECT nosuchcolumnzzz FROM assets", "unknown column"),
+    ("DROP TABLE assets", "not a SQL statement"),
+    ("SELECT 1 FROM dual; DELETE FROM assets", "more than one statement"),
+    ("SELECT (1 FROM assets", "Unbalanced parentheses"),
+])
+def test_invalid_sql_is_rejected(sql, message):
+    with pytest.raises(SQLValidationError, match=message):
+        validate_sql(sql, SCHEMA)
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT 1;", True),
+    ("SELECT * FROM assets WHERE name = 'a;b';", True),
+    ("SELECT * FROM assets WHERE name = 'a;", False),
+    ('SELECT "a;', False),
+    ("SELECT 1", False),
+])
+def test_has_terminator(sql, expected):
+    assert has_terminator(sql) is expected